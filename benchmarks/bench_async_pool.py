@@ -0,0 +1,100 @@
+"""
+Throughput of SharedMemoryVecEnv (every batch step waits for all workers) against
+AsyncEnvPool (recv returns the first envs ready) when workers are unevenly slow.
+
+Every step of the benchmark env sleeps for a log-normally distributed time (median
+--delay, spread --sigma) on top of pomdp-mountain-car-v0, like workers that
+sometimes render or write a recording. The synchronous env goes at the pace of the
+slowest worker of each batch; the pool should stay close to the mean worker speed,
+reported as the ideal throughput.
+
+Usage:
+    python benchmarks/bench_async_pool.py --workers 8 --envs-per-worker 4
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+import gym
+import gym_custom
+from gym.envs.registration import register
+
+from gym_custom.vector import AsyncEnvPool, SharedMemoryVecEnv
+
+
+ENV_ID = 'bench-straggler-pomdp-mountain-car-v0'
+
+
+class StragglerEnv(gym.Wrapper):
+
+    def __init__(self, delay=0.001, sigma=1.0):
+        super().__init__(gym.make('gym_custom:pomdp-mountain-car-v0'))
+        self.delay = delay
+        self.sigma = sigma
+        self.rng = np.random.RandomState()
+
+    def step(self, action):
+        time.sleep(self.delay * self.rng.lognormal(0.0, self.sigma))
+        return self.env.step(action)
+
+
+def bench_sync(args, kwargs):
+    env = SharedMemoryVecEnv(ENV_ID, args.workers * args.envs_per_worker, num_workers=args.workers, **kwargs)
+    try:
+        env.reset()
+        actions = np.ones((env.num_envs, 1), dtype=np.float32)
+        start = time.perf_counter()
+        steps = 0
+        while time.perf_counter() - start < args.duration:
+            env.step(actions)
+            steps += env.num_envs
+        return steps / (time.perf_counter() - start)
+    finally:
+        env.close()
+
+
+def bench_async(args, kwargs):
+    num_envs = args.workers * args.envs_per_worker
+    pool = AsyncEnvPool(ENV_ID, num_envs, batch_size=args.batch_size or args.envs_per_worker,
+                        num_workers=args.workers, **kwargs)
+    try:
+        pool.async_reset()
+        start = time.perf_counter()
+        steps = 0
+        while time.perf_counter() - start < args.duration:
+            obs, _, _, info = pool.recv()
+            pool.send(np.ones((len(obs), 1), dtype=np.float32), info['env_id'])
+            steps += len(obs)
+        return steps / (time.perf_counter() - start)
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--envs-per-worker', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=None, help='default: --envs-per-worker')
+    parser.add_argument('--delay', type=float, default=0.001, help='median extra latency of a step, in seconds')
+    parser.add_argument('--sigma', type=float, default=1.0, help='spread of the log-normal latency')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per measurement')
+    args = parser.parse_args()
+
+    register(id=ENV_ID, entry_point=StragglerEnv, kwargs={'delay': args.delay, 'sigma': args.sigma})
+    # The workers inherit the registration above, which spawned processes would not.
+    kwargs = {'context': 'fork'}
+
+    mean_latency = args.delay * math.exp(args.sigma ** 2 / 2)
+    ideal = args.workers / mean_latency
+    sync = bench_sync(args, kwargs)
+    pool = bench_async(args, kwargs)
+    print('ideal (mean worker speed)  {:10.0f} steps/s'.format(ideal))
+    print('SharedMemoryVecEnv.step    {:10.0f} steps/s  {:5.1%} of ideal'.format(sync, sync / ideal))
+    print('AsyncEnvPool.recv/send     {:10.0f} steps/s  {:5.1%} of ideal'.format(pool, pool / ideal))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+Throughput benchmark for every env id registered by gym_custom.
+
+For each id and policy (random, scripted) this measures steps/sec, resets/sec and
+the p50/p99 latency of a step call:
+- single: one env made with gym.make;
+- vector: the in-process vector envs (*-vec-v0 ids) at growing batch sizes;
+- subprocess: SharedMemoryVecEnv with a growing number of workers.
+
+Steps/sec counts env steps (lanes x batch steps) and includes the resets needed to
+start new episodes. Results are written as JSON; with --baseline, the run fails
+(exit code 1) when a configuration is more than --tolerance slower than in the
+baseline file.
+
+The envs run on the compiled backend when Numba is installed (see
+gym_custom.backend). --speedup runs the same configurations a second time on the
+NumPy backend, in a subprocess, and reports the speedup of the compiled one.
+
+Usage:
+    python benchmarks/bench_envs.py --out bench.json
+    python benchmarks/bench_envs.py --out new.json --baseline bench.json --tolerance 0.2
+    python benchmarks/bench_envs.py --ids pomdp-mountain-car-opt-lower-vec-v0 --speedup
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import gym
+import gym_custom
+from gym.envs.registration import registry
+from gym.wrappers import TimeLimit
+
+from gym_custom import backend
+from gym_custom.policies import make_policy
+from gym_custom.vector import SharedMemoryVecEnv
+
+
+# The episodic ids never terminate on their own (see README and test_scripts).
+MAX_EPISODE_STEPS = {
+    'pomdp-mountain-car-episodic-v0': 200,
+    'pomdp-mountain-car-episodic-easy-v0': 15,
+}
+
+
+def gym_custom_ids():
+    return sorted(spec.id for spec in registry.all() if spec.entry_point.startswith('gym_custom.'))
+
+
+def is_vector_id(env_id):
+    return hasattr(gym.make(env_id).unwrapped, 'num_envs')
+
+
+def summarize(latencies, num_steps, num_lanes, elapsed, resets_per_sec):
+    latencies = np.asarray(latencies) * 1e6
+    return {
+        'steps_per_sec': num_steps * num_lanes / elapsed,
+        'resets_per_sec': resets_per_sec,
+        'step_latency_p50_us': float(np.percentile(latencies, 50)),
+        'step_latency_p99_us': float(np.percentile(latencies, 99)),
+    }
+
+
+def measure_resets(env, duration):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        env.reset()
+        count += 1
+    return count * getattr(env.unwrapped, 'num_envs', 1) / (time.perf_counter() - start)
+
+
+def bench_single(env_id, policy_name, num_steps, seed):
+    env = gym.make(env_id)
+    if env_id in MAX_EPISODE_STEPS:
+        env = TimeLimit(env, max_episode_steps=MAX_EPISODE_STEPS[env_id])
+    env.seed(seed)
+    policy = make_policy(policy_name, env, 1, seed)
+
+    latencies = np.empty(num_steps)
+    obs = env.reset()
+    # The first step loads (or compiles) the compiled kernels; it is not timed.
+    env.step(policy(np.asarray(obs)[None])[0])
+    obs = env.reset()
+    start = time.perf_counter()
+    for i in range(num_steps):
+        action = policy(np.asarray(obs)[None])[0]
+        step_start = time.perf_counter()
+        obs, reward, done, _ = env.step(action)
+        latencies[i] = time.perf_counter() - step_start
+        if done:
+            obs = env.reset()
+            policy.reset()
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, num_steps, 1, elapsed, measure_resets(env, 0.2))
+
+
+def bench_vector(env_id, policy_name, num_envs, num_steps, seed):
+    env = gym.make(env_id, num_envs=num_envs)
+    env.seed(seed)
+    policy = make_policy(policy_name, env, num_envs, seed)
+
+    latencies = np.empty(num_steps)
+    obs = env.reset()
+    env.step(policy(obs))
+    obs = env.reset()
+    start = time.perf_counter()
+    for i in range(num_steps):
+        actions = policy(obs)
+        step_start = time.perf_counter()
+        obs, rewards, dones, _ = env.step(actions)
+        latencies[i] = time.perf_counter() - step_start
+        if dones.any():
+            obs = env.reset(dones)
+            policy.reset(dones)
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, num_steps, num_envs, elapsed, measure_resets(env, 0.2))
+
+
+def bench_subprocess(env_id, policy_name, num_envs, num_workers, num_steps, seed):
+    env = SharedMemoryVecEnv(env_id, num_envs, num_workers=num_workers,
+                             max_episode_steps=MAX_EPISODE_STEPS.get(env_id), zero_copy=True)
+    try:
+        env.seed(seed)
+        # The scripted policies read the constants of every lane from the env.
+        policy_env = gym.make(env_id, num_envs=num_envs) if is_vector_id(env_id) else gym.make(env_id)
+        policy = make_policy(policy_name, policy_env, num_envs, seed)
+
+        latencies = np.empty(num_steps)
+        obs = env.reset()
+        env.step(policy(obs))
+        obs = env.reset()
+        start = time.perf_counter()
+        for i in range(num_steps):
+            actions = policy(obs)
+            step_start = time.perf_counter()
+            obs, rewards, dones, _ = env.step(actions)
+            latencies[i] = time.perf_counter() - step_start
+            # The workers reset finished envs within the step.
+            policy.reset(dones)
+        elapsed = time.perf_counter() - start
+        return summarize(latencies, num_steps, num_envs, elapsed, measure_resets(env, 0.2))
+    finally:
+        env.close()
+
+
+def key(result):
+    return (result['env_id'], result['mode'], result['policy'], result['num_envs'], result['num_workers'])
+
+
+def compare(results, baseline, tolerance):
+    """Returns the configurations that got slower than the baseline by more than tolerance."""
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is not None and result['steps_per_sec'] < (1 - tolerance) * old['steps_per_sec']:
+            regressions.append((result, old))
+    return regressions
+
+
+def numpy_results(args):
+    """Results of the same configurations on the NumPy backend, from a subprocess."""
+    with tempfile.TemporaryDirectory() as directory:
+        out = os.path.join(directory, 'numpy.json')
+        command = [sys.executable, os.path.abspath(__file__), '--out', out,
+                   '--policies'] + args.policies + [
+                   '--steps', str(args.steps), '--batch-steps', str(args.batch_steps),
+                   '--batch-sizes'] + [str(size) for size in args.batch_sizes] + [
+                   '--workers'] + [str(workers) for workers in args.workers] + [
+                   '--envs-per-worker', str(args.envs_per_worker), '--seed', str(args.seed)]
+        if args.ids:
+            command += ['--ids'] + args.ids
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL,
+                       env=dict(os.environ, GYM_CUSTOM_BACKEND='numpy'))
+        with open(out) as f:
+            return json.load(f)['results']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ids', nargs='*', default=None, help='env ids (default: all gym_custom ids)')
+    parser.add_argument('--policies', nargs='*', default=['random', 'scripted'])
+    parser.add_argument('--steps', type=int, default=20000, help='steps per single-env run')
+    parser.add_argument('--batch-steps', type=int, default=200, help='batch steps per vector/subprocess run')
+    parser.add_argument('--batch-sizes', type=int, nargs='*', default=[16, 256, 4096])
+    parser.add_argument('--workers', type=int, nargs='*', default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument('--envs-per-worker', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench.json')
+    parser.add_argument('--baseline', default=None, help='JSON file of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative drop in steps/sec')
+    parser.add_argument('--speedup', action='store_true',
+                        help='also run on the NumPy backend and report the speedup of the compiled one')
+    args = parser.parse_args()
+
+    results = []
+
+    def record(env_id, mode, policy_name, num_envs, num_workers, metrics):
+        result = dict(env_id=env_id, mode=mode, policy=policy_name, num_envs=num_envs,
+                      num_workers=num_workers, **metrics)
+        results.append(result)
+        print('{env_id:40s} {mode:10s} {policy:8s} envs={num_envs:<6d} workers={num_workers:<3d} '
+              '{steps_per_sec:12.0f} steps/s {resets_per_sec:10.0f} resets/s '
+              'p50={step_latency_p50_us:8.1f}us p99={step_latency_p99_us:8.1f}us'.format(**result))
+        sys.stdout.flush()
+
+    for env_id in args.ids or gym_custom_ids():
+        vectorized = is_vector_id(env_id)
+        for policy_name in args.policies:
+            if vectorized:
+                for num_envs in args.batch_sizes:
+                    record(env_id, 'vector', policy_name, num_envs, 0,
+                           bench_vector(env_id, policy_name, num_envs, args.batch_steps, args.seed))
+            else:
+                record(env_id, 'single', policy_name, 1, 0,
+                       bench_single(env_id, policy_name, args.steps, args.seed))
+            for num_workers in args.workers:
+                num_envs = num_workers * args.envs_per_worker
+                if vectorized:
+                    num_envs *= 64
+                record(env_id, 'subprocess', policy_name, num_envs, num_workers,
+                       bench_subprocess(env_id, policy_name, num_envs, num_workers, args.batch_steps, args.seed))
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'gym': gym.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'backend': backend.NAME,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+    if args.speedup:
+        if not backend.ENABLED:
+            print('--speedup: the compiled backend is not enabled (is numba installed?)')
+        else:
+            reference = {key(result): result for result in numpy_results(args)}
+            for result in results:
+                old = reference[key(result)]
+                result['numpy_steps_per_sec'] = old['steps_per_sec']
+                result['speedup'] = result['steps_per_sec'] / old['steps_per_sec']
+                print('{:40s} {:10s} {:8s} envs={:<6d} workers={:<3d} {:6.2f}x over numpy'.format(
+                    *key(result), result['speedup']))
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('wrote', args.out)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for result, old in regressions:
+            print('REGRESSION {}: {:.0f} -> {:.0f} steps/s'.format(
+                key(result), old['steps_per_sec'], result['steps_per_sec']))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Heap allocations and step time of the mountain-car envs with and without zero_copy.
+
+For every variant this reports:
+- retained: bytes per step still alive when the caller keeps every (obs, info) it
+  gets back, i.e. what step allocates for its results;
+- transient: the peak heap growth over the whole loop, i.e. whether the step
+  allocates temporaries at all;
+- us/step: wall-clock time per step.
+
+Usage: python benchmarks/bench_zero_copy.py [num_steps]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from gym_custom.envs import (
+    ContinuousMountainCarPomdpEnv,
+    ContinuousMountainCarPomdpEasyEnv,
+    ContinuousMountainCarPomdpEpisodicEnv,
+    ContinuousMountainCarPomdpEpisodicEasyEnv,
+)
+
+
+def make_actions(num_steps):
+    return [np.array([a], dtype=np.float32) for a in np.random.RandomState(0).uniform(-1, 1, num_steps)]
+
+
+def retained_bytes_per_step(env, actions):
+    kept_obs = [None] * len(actions)
+    kept_info = [None] * len(actions)
+    indices = list(range(len(actions)))
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    for i in indices:
+        obs, reward, done, info = env.step(actions[i])
+        kept_obs[i] = obs
+        kept_info[i] = info
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (end - start) / len(actions)
+
+
+def transient_bytes(env, actions):
+    step = env.step
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for action in actions:
+        step(action)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - start
+
+
+def seconds_per_step(env, actions):
+    step = env.step
+    start = time.perf_counter()
+    for action in actions:
+        step(action)
+    return (time.perf_counter() - start) / len(actions)
+
+
+def main():
+    num_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    actions = make_actions(num_steps)
+
+    # The episodic variants never terminate, so the loops measure step alone.
+    for env_class in [ContinuousMountainCarPomdpEpisodicEnv, ContinuousMountainCarPomdpEpisodicEasyEnv,
+                      ContinuousMountainCarPomdpEnv, ContinuousMountainCarPomdpEasyEnv]:
+        for zero_copy in [False, True]:
+            results = []
+            for measure in [retained_bytes_per_step, transient_bytes, seconds_per_step]:
+                env = env_class(zero_copy=zero_copy)
+                env.seed(0)
+                env.reset()
+                # Warm up the interpreter's free lists before measuring.
+                for action in actions[:100]:
+                    env.step(action)
+                results.append(measure(env, actions))
+            print('{:45s} zero_copy={!s:5s} retained={:7.1f} B/step  transient={:6d} B  {:5.2f} us/step'.format(
+                env_class.__name__, zero_copy, results[0], results[1], results[2] * 1e6))
+
+
+if __name__ == '__main__':
+    main()
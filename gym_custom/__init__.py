@@ -1,35 +1,56 @@
+# Entry points are strings, so no env module is imported until an env is made.
 from gym.envs.registration import register
 
 register(
     id='pomdp-mountain-car-v0',
-    entry_point='gym_custom.envs:ContinuousMountainCarPomdpEnv',
+    entry_point='gym_custom.envs.pomdp_mountain_car:ContinuousMountainCarPomdpEnv',
+)
+
+register(
+    id='pomdp-mountain-car-vec-v0',
+    entry_point='gym_custom.envs.pomdp_mountain_car_vec:ContinuousMountainCarPomdpVecEnv',
 )
 
 register(
     id='pomdp-mountain-car-easy-v0',
-    entry_point='gym_custom.envs:ContinuousMountainCarPomdpEasyEnv'
+    entry_point='gym_custom.envs.pomdp_mountain_car_easy:ContinuousMountainCarPomdpEasyEnv'
 )
 
 register(
     id='pomdp-mountain-car-episodic-easy-v0',
-    entry_point='gym_custom.envs:ContinuousMountainCarPomdpEpisodicEasyEnv'
+    entry_point='gym_custom.envs.pomdp_mountain_car_episodic_easy:ContinuousMountainCarPomdpEpisodicEasyEnv'
 )
 
 register(
     id='pomdp-mountain-car-episodic-v0',
-    entry_point='gym_custom.envs:ContinuousMountainCarPomdpEpisodicEnv'
+    entry_point='gym_custom.envs.pomdp_mountain_car_episodic:ContinuousMountainCarPomdpEpisodicEnv'
+)
+
+register(
+    id='pomdp-mountain-car-mixed-vec-v0',
+    entry_point='gym_custom.envs.pomdp_mountain_car_vec:ContinuousMountainCarPomdpMixedVecEnv',
 )
 
 register(
     id='pomdp-mountain-car-opt-lower-v0',
-    entry_point='gym_custom.envs:ContinuousMountainCarPomdpOptLowerEnv'
+    entry_point='gym_custom.envs.pomdp_mountain_car_opt_lower:ContinuousMountainCarPomdpOptLowerEnv'
+)
+
+register(
+    id='pomdp-mountain-car-opt-lower-vec-v0',
+    entry_point='gym_custom.envs.pomdp_mountain_car_vec:ContinuousMountainCarPomdpOptLowerVecEnv',
 )
 
 register(
     id='continuous-heaven-hell-opt-lower-v0',
-    entry_point='gym_custom.envs:ContinuousHeavenHellOptLower'
+    entry_point='gym_custom.envs.continuous_heaven_hell_opt_lower:ContinuousHeavenHellOptLower'
+)
+
+register(
+    id='heaven-hell-onehot-ls-v0',
+    entry_point='gym_custom.envs.heaven_hell_onehot_ls:HeavenHellOneHotLSEnv',
+)
+register(
+    id='heaven-hell-onehot-ls-vec-v0',
+    entry_point='gym_custom.envs.heaven_hell_vec:HeavenHellOneHotLSVecEnv',
 )
-# register(
-#     id='heaven-hell-onehot-ls-v0',
-#     entry_point='gym_custom.envs:HeavenHellOneHotLSEnv',
-# )
\ No newline at end of file
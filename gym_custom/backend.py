@@ -0,0 +1,37 @@
+"""
+Optional compiled backend for the env kernels.
+
+When Numba is installed, the kernels decorated with jit are compiled to machine
+code on their first call and cached on disk (in __pycache__ next to their module,
+or in NUMBA_CACHE_DIR), so later processes, e.g. the workers of SharedMemoryVecEnv
+or of the dataset generator, load them instead of compiling again. Without Numba,
+or with the environment variable GYM_CUSTOM_BACKEND=numpy, the envs keep their
+NumPy kernels; both backends return the same values.
+
+The backend is chosen when the first env module is imported.
+"""
+
+import os
+
+
+BACKENDS = ('numba', 'numpy')
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NAME = os.environ.get('GYM_CUSTOM_BACKEND', 'numba' if numba is not None else 'numpy')
+if NAME not in BACKENDS:
+    raise ValueError('GYM_CUSTOM_BACKEND must be one of {}, got {!r}'.format(BACKENDS, NAME))
+if NAME == 'numba' and numba is None:
+    raise ImportError('GYM_CUSTOM_BACKEND=numba but numba is not installed')
+
+ENABLED = NAME == 'numba'
+
+
+def jit(function):
+    """Compiles function with Numba (no Python objects, cached on disk) when the backend is enabled."""
+    if not ENABLED:
+        return function
+    return numba.njit(cache=True, nogil=True, error_model='numpy')(function)
@@ -1,10 +1,36 @@
-from gym_custom.envs.pomdp_mountain_car import ContinuousMountainCarPomdpEnv
+"""
+The env classes are imported lazily, on first access, so that `import gym_custom`
+and gym.make of one id only import the modules that id needs.
+"""
 
-from gym_custom.envs.pomdp_mountain_car_easy import ContinuousMountainCarPomdpEasyEnv
+import importlib
 
-from gym_custom.envs.pomdp_mountain_car_episodic_easy import ContinuousMountainCarPomdpEpisodicEasyEnv
-from gym_custom.envs.pomdp_mountain_car_episodic import ContinuousMountainCarPomdpEpisodicEnv
-# from gym_custom.envs.heaven_hell_onehot_ls import HeavenHellOneHotLSEnv
+_MODULES = {
+    'MountainCarVariant': 'gym_custom.envs.pomdp_mountain_car_core',
+    'ContinuousMountainCarPomdpBaseEnv': 'gym_custom.envs.pomdp_mountain_car_core',
+    'ContinuousMountainCarPomdpEnv': 'gym_custom.envs.pomdp_mountain_car',
+    'ContinuousMountainCarPomdpEasyEnv': 'gym_custom.envs.pomdp_mountain_car_easy',
+    'ContinuousMountainCarPomdpEpisodicEasyEnv': 'gym_custom.envs.pomdp_mountain_car_episodic_easy',
+    'ContinuousMountainCarPomdpEpisodicEnv': 'gym_custom.envs.pomdp_mountain_car_episodic',
+    'HeavenHellOneHotLSEnv': 'gym_custom.envs.heaven_hell_onehot_ls',
+    'HeavenHellOneHotLSVecEnv': 'gym_custom.envs.heaven_hell_vec',
+    'ContinuousMountainCarPomdpOptLowerEnv': 'gym_custom.envs.pomdp_mountain_car_opt_lower',
+    'ContinuousHeavenHellOptLower': 'gym_custom.envs.continuous_heaven_hell_opt_lower',
+    'ContinuousMountainCarPomdpVecEnv': 'gym_custom.envs.pomdp_mountain_car_vec',
+    'ContinuousMountainCarPomdpOptLowerVecEnv': 'gym_custom.envs.pomdp_mountain_car_vec',
+    'ContinuousMountainCarPomdpMixedVecEnv': 'gym_custom.envs.pomdp_mountain_car_vec',
+}
 
-from gym_custom.envs.pomdp_mountain_car_opt_lower import ContinuousMountainCarPomdpOptLowerEnv
-from gym_custom.envs.continuous_heaven_hell_opt_lower import ContinuousHeavenHellOptLower
\ No newline at end of file
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(_MODULES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
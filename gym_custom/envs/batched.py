@@ -0,0 +1,51 @@
+"""
+Episode bookkeeping shared by the vector envs: per-lane step counters, truncation
+after max_episode_steps, and automatic resets inside step.
+"""
+
+import numpy as np
+
+import gym
+
+
+class BatchedEnv(gym.Env):
+
+    """
+    Base class of the vector envs. Subclasses call _init_episodes in __init__, zero
+    the counters of the lanes they reset with _reset_episodes, and end step with
+    `return self._finish_step(obs, rewards, terminals)`.
+
+    Every step returns dones = terminal | truncated and an info holding both flags
+    ('terminal' and 'truncated', arrays of shape [N]); a lane is truncated when it
+    has run max_episode_steps steps without terminating. With auto_reset=True the
+    lanes that are done are reset within the same step: the returned observations
+    are the first ones of their next episodes, and info['final_observation'] holds
+    the observations the step produced before those resets (all lanes).
+    """
+
+    def _init_episodes(self, max_episode_steps=None, auto_reset=False):
+        self.max_episode_steps = max_episode_steps
+        self.auto_reset = auto_reset
+        self.elapsed_steps = np.zeros(self.num_envs, dtype=np.int64)
+        self._not_truncated = np.zeros(self.num_envs, dtype=bool)
+        self._not_truncated.flags.writeable = False
+
+    def _reset_episodes(self, mask):
+        self.elapsed_steps[mask] = 0
+
+    def _finish_step(self, obs, rewards, terminals):
+        self.elapsed_steps += 1
+        if self.max_episode_steps is None:
+            truncated = self._not_truncated
+        else:
+            truncated = (self.elapsed_steps >= self.max_episode_steps) & ~terminals
+        dones = terminals | truncated
+        info = {'terminal': terminals, 'truncated': truncated}
+        if self.auto_reset:
+            info['final_observation'] = obs
+            if dones.any():
+                # Read-only observations are views of buffers that the reset overwrites.
+                if not obs.flags.writeable:
+                    info['final_observation'] = obs.copy()
+                obs = self.reset(dones)
+        return obs, rewards, dones, info
@@ -1,12 +1,21 @@
 import numpy as np
 import gym
 from gym import spaces
+from gym.utils import seeding
+
+from gym_custom.envs.dtypes import observation_dtype
+from gym_custom.envs.pomdp_mountain_car_core import LOWER_LEVEL_OBSERVATIONS, lower_level_steps
+from gym_custom.history import History
 
 class ContinuousHeavenHellOptLower(gym.Env):
 
-    """No velocity; just position and direction bit."""
+    """
+    No velocity; just position and direction bit.
+
+    history_length, crossing and obs_dtype are as in ContinuousMountainCarPomdpOptLowerEnv.
+    """
 
-    def __init__(self):
+    def __init__(self, history_length=10, crossing='sampled', obs_dtype=None):
 
         self.min_position = -1.2
         self.max_position = 1.2
@@ -21,10 +30,16 @@ class ContinuousHeavenHellOptLower(gym.Env):
             dtype=np.float32
         )
 
-        num_obs_to_concatenate = 10
+        num_obs_to_concatenate = history_length
         single_obs_dim = 2
         concatenated_obs_dim = num_obs_to_concatenate * single_obs_dim
         self.concatenated_obs_dim = concatenated_obs_dim
+        self._steps = lower_level_steps(num_obs_to_concatenate)
+        self._lower_level_observation = LOWER_LEVEL_OBSERVATIONS[crossing]
+        self.obs_dtype = observation_dtype(obs_dtype)
+        self.history = History(num_obs_to_concatenate, shape=(single_obs_dim,), dtype=self.obs_dtype)
+        self._points = np.empty((num_obs_to_concatenate, single_obs_dim))
+        self._flat_points = self._points.reshape(-1)
 
         single_obs_min = [self.min_position, -1.0]  # -1 for direction bit
         single_obs_max = [self.max_position,  1.0]
@@ -35,37 +50,31 @@ class ContinuousHeavenHellOptLower(gym.Env):
         self.observation_space = spaces.Box(
             low=concatenated_obs_min,
             high=concatenated_obs_max,
-            dtype=np.float32
+            dtype=self.obs_dtype
         )
 
         self.priest_position = 0.5
         self.priest_delta = 0.1
 
+        self.seed()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
     def reset(self):
 
-        self.state = np.random.uniform(low=-0.2, high=0.2)
-        observation = np.zeros((self.concatenated_obs_dim, ))
-        observation[-2] = self.state  # -1 position is for position bit
+        self.state = self.np_random.uniform(low=-0.2, high=0.2)
+        self.history.reset((self.state, 0.0))  # zeros, then the start position with no direction
 
-        if (np.random.randint(2) == 0):
+        if (self.np_random.randint(2) == 0):
             self.heaven_position = 1.0
         else:
             self.heaven_position = -1.0
 
         self.hell_position = -self.heaven_position
 
-        return observation
-
-    def _get_direction(self, position):
-        direction = 0.0
-        if position >= self.priest_position - self.priest_delta and position <= self.priest_position + self.priest_delta:
-            if (self.heaven_position > self.hell_position):
-                # Heaven on the right
-                direction = 1.0
-            else:
-                # Heaven on the left
-                direction = -1.0
-        return direction
+        return self.history.flat(copy=True)
 
     def step(self, action):
 
@@ -73,10 +82,11 @@ class ContinuousHeavenHellOptLower(gym.Env):
         position = action[0]
         self.state = position
 
-        positions_along_the_way = np.linspace(prev_position, position, 10)  # imagining optimal lower level policy doing the work
-        directions = np.array([self._get_direction(pos) for pos in positions_along_the_way])
-
-        observation = np.vstack([positions_along_the_way, directions]).T.flatten()
+        # imagining optimal lower level policy doing the work
+        self._lower_level_observation(prev_position, position, self.heaven_position, self.hell_position,
+                                      self.priest_position, self.priest_delta, self._steps, self._flat_points)
+        self.history.extend(self._points)
+        observation = self.history.flat(copy=True)
 
         # Convert a possible numpy bool to a Python bool.
         max_position = max(self.heaven_position, self.hell_position)
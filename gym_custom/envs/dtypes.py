@@ -0,0 +1,29 @@
+"""
+The dtype of the observations of an env, which its observation_space declares.
+
+Every env returns float32 observations by default. Observations that only take a
+few values, like the direction bit (-1, 0 or 1) or the one-hot Heaven Hell
+observations, can also be returned as float16 or integers (e.g. int8) without loss.
+"""
+
+import numpy as np
+
+
+# The values of the direction bit, and of every entry of the Heaven Hell observations.
+DIRECTION_VALUES = (-1.0, 0.0, 1.0)
+
+
+def observation_dtype(dtype=None, values=None):
+    """
+    Checks and returns the observation dtype asked for (float32 when None).
+    Floating-point dtypes of 32 bits or more are always accepted; float16 and
+    integer dtypes only when the observations take the given `values`, and the
+    dtype represents every one of them exactly.
+    """
+    dtype = np.dtype(np.float32 if dtype is None else dtype)
+    if dtype.kind == 'f' and dtype.itemsize >= 4:
+        return dtype
+    if dtype.kind not in 'fiu' or values is None or \
+            not np.array_equal(np.asarray(values, dtype=dtype).astype(np.float64), values):
+        raise ValueError('Observations of this env cannot be represented exactly as {}'.format(dtype))
+    return dtype
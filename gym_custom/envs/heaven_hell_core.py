@@ -0,0 +1,121 @@
+"""
+Tabular Heaven Hell, the world behind HeavenHellOneHotLSEnv (and POMDP-heavenhell-episodic-v0).
+
+        Heaven  4  3  2  5  6  Hell
+                      1
+                      0
+                      7  8  9 Priest
+
+          Hell 14 13 12 15 16  Heaven
+                     11
+                     10
+                     17 18 19 Priest
+
+States 0 to 9 have heaven on the left and states 10 to 19 have heaven on the right;
+the robot starts in 0 or 10 with equal probability. Entering location 4 or 6 (the
+left and right ends of the top row) ends the episode with reward +1 if it is heaven
+and -1 if it is hell. Moving into a wall does nothing.
+
+These tables match POMDP-heavenhell-episodic-v0 of gym_pomdps, which
+HeavenHellOneHotLSEnv(world='gym_pomdps') steps instead;
+test_scripts/test_heaven_hell_tables.py compares them with the tables gym_pomdps
+reads from its heavenhell .pomdp file, and both worlds' trajectories.
+
+Everything is stored as NumPy tables, so a step is an indexed gather and many
+episodes can be advanced at once.
+"""
+
+import numpy as np
+
+
+NUM_LOCATIONS = 10
+NUM_STATES = 2 * NUM_LOCATIONS
+NORTH, SOUTH, EAST, WEST = range(4)
+NUM_ACTIONS = 4
+
+DISCOUNT = 0.99
+
+# The locations at the left and right ends of the top row.
+LEFT_END, RIGHT_END = 4, 6
+
+# Next location for each location (upper map) and action N, S, E, W.
+_MOVES = [
+    [1, 7, 0, 0],  # 0
+    [2, 0, 1, 1],  # 1
+    [2, 1, 5, 3],  # 2
+    [3, 3, 2, 4],  # 3
+    [4, 4, 3, 4],  # 4
+    [5, 5, 6, 2],  # 5
+    [6, 6, 6, 5],  # 6
+    [0, 7, 8, 7],  # 7
+    [8, 8, 9, 7],  # 8
+    [9, 9, 9, 8],  # 9
+]
+
+PRIEST_LOCATION = 9
+
+LOCATION_SIZE = NUM_LOCATIONS
+SIGNAL_SIZE = 1
+OBS_SIZE = LOCATION_SIZE + SIGNAL_SIZE
+
+
+def _build_tables():
+    transitions = np.zeros((NUM_STATES, NUM_ACTIONS, NUM_STATES))
+    rewards = np.zeros((NUM_STATES, NUM_ACTIONS))
+    for state in range(NUM_STATES):
+        heaven_on_left = state < NUM_LOCATIONS
+        offset = 0 if heaven_on_left else NUM_LOCATIONS
+        for action in range(NUM_ACTIONS):
+            location = _MOVES[state - offset][action]
+            transitions[state, action, location + offset] = 1.0
+            if location == LEFT_END:
+                rewards[state, action] = 1.0 if heaven_on_left else -1.0
+            elif location == RIGHT_END:
+                rewards[state, action] = -1.0 if heaven_on_left else 1.0
+
+    start = np.zeros(NUM_STATES)
+    start[0] = start[NUM_LOCATIONS] = 0.5
+
+    # One-hot location followed by the signal given by the priest.
+    observations = np.zeros((NUM_STATES, OBS_SIZE))
+    for state in range(NUM_STATES):
+        observations[state, state % NUM_LOCATIONS] = 1.0
+    observations[PRIEST_LOCATION, -1] = 1.0  # heaven on the left
+    observations[PRIEST_LOCATION + NUM_LOCATIONS, -1] = -1.0  # heaven on the right
+
+    return transitions, rewards, start, observations
+
+
+# TRANSITIONS[s, a, s'] = P(s' | s, a), REWARDS[s, a], START[s] = P(s_0 = s) and
+# OBSERVATIONS[s] = the observation emitted in s. The episode ends on a reward of +1 or -1.
+TRANSITIONS, REWARDS, START, OBSERVATIONS = _build_tables()
+TERMINALS = REWARDS != 0.0
+
+# Cumulative distributions used to sample with one uniform draw per transition.
+_TRANSITIONS_CDF = TRANSITIONS.cumsum(axis=-1)
+_START_CDF = START.cumsum()
+
+for _table in (TRANSITIONS, REWARDS, START, OBSERVATIONS, TERMINALS, _TRANSITIONS_CDF, _START_CDF):
+    _table.flags.writeable = False
+
+
+def sample_start(uniforms):
+    """Start states for uniform draws of any shape."""
+    return np.minimum(np.searchsorted(_START_CDF, uniforms, side='right'), NUM_STATES - 1)
+
+
+def sample_next(states, actions, uniforms):
+    """Next states for arrays of states, actions and uniform draws of the same shape [N]."""
+    cdf = _TRANSITIONS_CDF[states, actions]
+    return np.minimum((cdf <= uniforms[..., None]).sum(axis=-1), NUM_STATES - 1)
+
+
+def reset_functional(np_random) -> int:
+    return int(sample_start(np_random.uniform()))
+
+
+def step_functional(state:int, action:int, np_random):
+    """Returns (next_state, reward, done) for a single transition."""
+    cdf = _TRANSITIONS_CDF[state, action]
+    next_state = min(int(np.searchsorted(cdf, np_random.uniform(), side='right')), NUM_STATES - 1)
+    return next_state, float(REWARDS[state, action]), bool(TERMINALS[state, action])
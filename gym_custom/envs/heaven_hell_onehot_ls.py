@@ -1,7 +1,11 @@
 import gym
-import gym_pomdps
 import numpy as np
 from gym import spaces
+from gym.utils import seeding
+
+from gym_custom.envs import heaven_hell_core
+from gym_custom.envs.dtypes import DIRECTION_VALUES, observation_dtype
+from gym_custom.history import History
 
 # A robot will be rewarded +1 for attaining heaven in one
 # if it accidently reaches hell it will get -1
@@ -21,6 +25,9 @@ from gym import spaces
 
 """
 Location-signal version of Heaven Hell
+- The world is the tabular one in heaven_hell_core. world='gym_pomdps' steps
+  POMDP-heavenhell-episodic-v0 of gym_pomdps instead (which has to be installed),
+  with the same trajectories. The vector env always uses the tables.
 - The observation consists of two parts: location and signal.
 - There are 10 possible locations (0 to 9 inclusive) and 3 possible signals (0, 1, 2).
 - These two pieces of information will be encoded as a one-hot vector such that
@@ -28,80 +35,105 @@ Location-signal version of Heaven Hell
   
 Catches:
 - Added attribute self.ready to make sure that the user always reset the environment before using / after episode termination.
+- The last memory_size observations are concatenated, oldest first, padded with -1 right after reset.
+  memory_size can be given to the constructor or changed with set_memory.
+- The observations are float32; every entry is -1, 0 or 1, so obs_dtype='float16'
+  or 'int8' gives the same observations in less memory.
 """
 
 class HeavenHellOneHotLSEnv(gym.Env):
     metadata = {'render.modes': ['human']}
 
-    def __init__(self):
-        self.env = gym.make("POMDP-heavenhell-episodic-v0")
-        self.discount = self.env.discount
+    def __init__(self, memory_size=10, zero_copy=False, obs_dtype=None, world='native'):
+        if world not in ('gym_pomdps', 'native'):
+            raise ValueError("world must be 'gym_pomdps' or 'native', got {!r}".format(world))
+        self.world = world
+        self.env = None
+        self.discount = heaven_hell_core.DISCOUNT
+        if world == 'gym_pomdps':
+            import gym_pomdps  # registers the POMDP-* ids
+            self.env = gym.make('POMDP-heavenhell-episodic-v0')
+            self.discount = self.env.discount
+        self.obs_dtype = observation_dtype(obs_dtype, DIRECTION_VALUES)
+        self._observations = heaven_hell_core.OBSERVATIONS.astype(self.obs_dtype)
 
-        self.location_size = 10
-        self.signal_size = 1
-        self.memory_size = 10
+        self.location_size = heaven_hell_core.LOCATION_SIZE
+        self.signal_size = heaven_hell_core.SIGNAL_SIZE
+        self.zero_copy = zero_copy
 
-        self.action_space = self.env.action_space  # for external use
-        self.observation_space = spaces.Box(low=0.0, high=1.0, shape=((self.location_size + self.signal_size) * self.memory_size,),
-                                            dtype=np.float32)  # for external use
+        self.action_space = spaces.Discrete(heaven_hell_core.NUM_ACTIONS)  # for external use
+        self.set_memory(memory_size)
+
+        self.seed()
 
-        self.ready = False  # need to be reset before using at all
         self.info = {'episode' : None}  # for external use
 
+    def set_memory(self, memory_size:int):
+        """Keep the last memory_size observations; the env needs to be reset afterwards."""
+        self.memory_size = memory_size
+        obs_size = self.location_size + self.signal_size
+
+        # The signal and the padding of the history are -1.
+        self.observation_space = spaces.Box(low=-1.0, high=1.0, shape=(obs_size * memory_size,),
+                                            dtype=self.obs_dtype)  # for external use
+
+        self.history = History(memory_size, shape=(obs_size,), dtype=self.obs_dtype, fill=-1.0)
+
+        self.ready = False  # need to be reset before using at all
+
+    @property
+    def memory(self) -> np.array:
+        """The last memory_size observations, oldest first (a read-only view)."""
+        return self.history.window()
+
     def push_to_memory(self, obs):
-        self.memory.append(obs)
-        if len(self.memory) > self.memory_size:
-            self.memory = self.memory[1:]  # remove the oldest
+        self.history.push(obs)  # overwrites the oldest
+
+    def _get_memory_obs(self) -> np.array:
+        # With zero_copy the observation is a read-only view that the next step
+        # overwrites; copy it if you keep it.
+        return self.history.flat(copy=not self.zero_copy)
 
     def close(self):
         pass
 
-    def seed(self, seed):
-        self.env.seed(seed)
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        if self.env is not None:
+            self.env.seed(seed)
+        return [seed]
 
     def get_state(self):
         return self.state
 
     def reset(self) -> np.array:
-        self.state = self.env.reset_functional()
-        self.ready = True
-        self.memory = []
-        for i in range(self.memory_size - 1):
-            self.push_to_memory(np.ones((self.location_size + self.signal_size, )) * -1)
-        self.push_to_memory(np.array(self._generate_obs(self.state)))
-        return np.array(self.memory).flatten()
-
-    def _generate_obs(self, state:int) -> list:
-        return self._one_hot(self._get_location(state), self.location_size) + \
-               self._get_signal(state)
-
-    def _get_location(self, state:int) -> int:
-        if state >= 10:
-            state -= 10
-        return state
-
-    def _get_signal(self, state:int) -> int:
-        if state == 9:
-            return [1]  # heaven on the left
-        elif state == 19:
-            return [-1]  # heaven on the right
+        if self.env is not None:
+            self.state = self.env.reset_functional()
         else:
-            return [0]
+            self.state = heaven_hell_core.reset_functional(self.np_random)
+        self.ready = True
+        self.history.reset(self._generate_obs(self.state))
+        return self._get_memory_obs()
 
-    def _one_hot(self, target_index:int, size:int) -> list:
-        temp = [0] * size
-        temp[target_index] = 1.0
-        return temp
+    def _generate_obs(self, state:int) -> np.array:
+        # Precomputed one-hot location followed by the priest's signal
+        # (1 for heaven on the left, -1 for heaven on the right, 0 elsewhere).
+        return self._observations[state]
 
     def step(self, action:int) -> np.array:
         assert self.ready, "not ready yet / episode terminated, please reset"
-        # self.state, o, r_extrinsic, done, info = self.env.step_functional(self.state, action)
-        self.state, _, r_extrinsic, _, _ = self.env.step_functional(self.state, action)
-        done = False
-        if r_extrinsic in [-1, 1]:
-            done = True
+        if self.env is not None:
+            next_state, _, r_extrinsic, _, _ = self.env.step_functional(self.state, action)
+            done = r_extrinsic in [-1, 1]
+            # The episodic POMDP envs return the state -1 once the episode is over; the
+            # last state is then the end the robot entered (the moves are deterministic).
+            if next_state < 0:
+                next_state = int(heaven_hell_core.TRANSITIONS[self.state, action].argmax())
+            self.state = next_state
+        else:
+            self.state, r_extrinsic, done = heaven_hell_core.step_functional(self.state, action, self.np_random)
+        if done:  # r_extrinsic is -1 or 1
             self.ready = False
         # follows the gym template of state/obs, r, done, info
-        obs = np.array(self._generate_obs(self.state))
-        self.push_to_memory(obs)
-        return np.array(self.memory).flatten(), r_extrinsic, done, self.info
\ No newline at end of file
+        self.push_to_memory(self._generate_obs(self.state))
+        return self._get_memory_obs(), r_extrinsic, done, dict(self.info)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Batched version of HeavenHellOneHotLSEnv.
+
+N episodes advance together: next states for all lanes come from one vectorized
+draw over the transition tensor in heaven_hell_core, and rewards, terminations
+and observations are gathered by index.
+"""
+
+import numpy as np
+
+from gym import spaces
+from gym.utils import seeding
+
+from gym_custom.envs import heaven_hell_core
+from gym_custom.envs.batched import BatchedEnv
+from gym_custom.envs.dtypes import DIRECTION_VALUES, observation_dtype
+from gym_custom.history import History
+
+
+class HeavenHellOneHotLSVecEnv(BatchedEnv):
+
+    """
+    Lane i behaves like HeavenHellOneHotLSEnv(memory_size, world='native'): step takes actions of
+    shape [N] and returns observations of shape [N, 11 * memory_size], rewards of
+    shape [N] and dones of shape [N] (True on a reward of +1 or -1, or after
+    max_episode_steps steps). Lanes are reset within step with auto_reset=True,
+    otherwise use reset(mask) on the lanes that are done; see BatchedEnv for the
+    terminal/truncated flags and the final observations in the info.
+
+    With zero_copy=True the observations are a read-only view of the history
+    buffer that the next step/reset overwrites. obs_dtype is as in
+    HeavenHellOneHotLSEnv.
+    """
+
+    metadata = {'render.modes': []}
+
+    def __init__(self, num_envs=1, memory_size=10, zero_copy=False, max_episode_steps=None, auto_reset=False,
+                 obs_dtype=None):
+        self.num_envs = num_envs
+        self.obs_dtype = observation_dtype(obs_dtype, DIRECTION_VALUES)
+        self.memory_size = memory_size
+        self.zero_copy = zero_copy
+        self.discount = heaven_hell_core.DISCOUNT
+
+        obs_size = heaven_hell_core.OBS_SIZE
+        self.single_action_space = spaces.Discrete(heaven_hell_core.NUM_ACTIONS)
+        self.single_observation_space = spaces.Box(low=-1.0, high=1.0, shape=(obs_size * memory_size,),
+                                                   dtype=self.obs_dtype)
+        self.action_space = spaces.MultiDiscrete([heaven_hell_core.NUM_ACTIONS] * num_envs)
+        self.observation_space = spaces.Box(low=-1.0, high=1.0, shape=(num_envs, obs_size * memory_size),
+                                            dtype=self.obs_dtype)
+
+        self.state = np.zeros(num_envs, dtype=np.intp)
+        self._observations = heaven_hell_core.OBSERVATIONS.astype(self.obs_dtype)
+
+        # All lanes share the write index of the history; resetting a lane clears
+        # its whole history instead.
+        self.history = History(memory_size, shape=(obs_size,), dtype=self.obs_dtype, num_envs=num_envs,
+                               fill=-1.0)
+
+        self._init_episodes(max_episode_steps, auto_reset)
+        self.seed()
+        self.reset()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def _get_memory_obs(self):
+        return self.history.flat(copy=not self.zero_copy)
+
+    def reset(self, mask=None):
+        """Reset all lanes, or only the lanes selected by a boolean mask of shape [N]."""
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        mask = np.asarray(mask, dtype=bool)
+        self._reset_episodes(mask)
+
+        self.state[mask] = heaven_hell_core.sample_start(self.np_random.uniform(size=int(mask.sum())))
+        self.history.reset(self._observations[self.state[mask]], mask)
+
+        return self._get_memory_obs()
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.intp).reshape(self.num_envs)
+
+        rewards = heaven_hell_core.REWARDS[self.state, actions]
+        dones = heaven_hell_core.TERMINALS[self.state, actions]
+        self.state = heaven_hell_core.sample_next(self.state, actions, self.np_random.uniform(size=self.num_envs))
+
+        self.history.push(self._observations[self.state])
+        return self._finish_step(self._get_memory_obs(), rewards, dones)
+
+    def close(self):
+        pass
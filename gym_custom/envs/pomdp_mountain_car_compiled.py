@@ -0,0 +1,175 @@
+"""
+Compiled versions of the batched kernels of pomdp_mountain_car_core.
+
+Each kernel is one loop over the lanes that does all the work of the NumPy version
+in a single pass, without temporaries; the wrappers keep the signatures (and the
+results, bit for bit) of the NumPy kernels. The constants (power, max_speed, the
+priest zone) reach the loops as [N] arrays, so lanes may have different ones. pomdp_mountain_car_core uses them in
+place of its own when the compiled backend is enabled (see gym_custom.backend).
+
+The scalar mountain-car step is not compiled: with its sixteen arguments the call
+into compiled code costs as much as the Python arithmetic it would replace.
+"""
+
+import math
+
+import numpy as np
+
+from gym_custom.backend import jit
+
+
+def _lanes(value, position):
+    """value (a scalar or an array of shape [N]) as a float64 array of the shape of position."""
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), position.shape)
+
+
+@jit
+def _advance(position, velocity, force, power, max_speed, min_position, max_position):
+    for i in range(position.shape[0]):
+        v = velocity[i] + force[i] * power[i]
+        v = min(max(v, -max_speed[i]), max_speed[i])
+        p = min(max(position[i] + v, min_position), max_position)
+        if p == min_position and v < 0:
+            v = 0.0
+        position[i] = p
+        velocity[i] = v
+
+
+def advance(position, velocity, force, power, max_speed, min_position, max_position):
+    """Advance position and velocity in place by one step of the dynamics."""
+    _advance(position, velocity, _lanes(force, position), _lanes(power, position), _lanes(max_speed, position),
+             min_position, max_position)
+
+
+@jit
+def _reward_done(position, heaven_position, hell_position, reward_scale, terminates, reward, dones):
+    for i in range(position.shape[0]):
+        heaven_on_right = heaven_position[i] > hell_position[i]
+        at_upper = position[i] >= max(heaven_position[i], hell_position[i])
+        at_lower = position[i] <= min(heaven_position[i], hell_position[i])
+        r = 0.0
+        if at_upper:
+            r = reward_scale if heaven_on_right else -reward_scale
+        if at_lower:
+            r = -reward_scale if heaven_on_right else reward_scale
+        reward[i] = r
+        dones[i] = terminates and (at_upper or at_lower)
+
+
+def reward_done(position, heaven_position, hell_position, reward_scale, terminates):
+    reward = np.empty(position.shape)
+    dones = np.empty(position.shape, dtype=bool)
+    _reward_done(position, heaven_position, hell_position, float(reward_scale), bool(terminates), reward, dones)
+    return reward, dones
+
+
+@jit
+def _priest_direction(position, heaven_position, hell_position, low, high, out):
+    for i in range(position.shape[0]):
+        if low[i] <= position[i] <= high[i]:
+            out[i] = 1.0 if heaven_position[i] > hell_position[i] else -1.0
+        else:
+            out[i] = 0.0
+
+
+def priest_direction(position, heaven_position, hell_position, priest_position, priest_delta):
+    out = np.empty(position.shape)
+    _priest_direction(position, heaven_position, hell_position, _lanes(priest_position - priest_delta, position),
+                      _lanes(priest_position + priest_delta, position), out)
+    return out
+
+
+@jit
+def _sampled_row(a, b, step, right, low, high, steps, out):
+    last = steps.shape[0] - 1
+    direction = 1.0 if right else -1.0
+    for k in range(last + 1):
+        p = b if k == last else steps[k] * step + a
+        out[2 * k] = p
+        out[2 * k + 1] = direction if low <= p <= high else 0.0
+
+
+@jit
+def _sampled(prev_position, position, heaven_position, hell_position, low, high, steps, out):
+    last = steps.shape[0] - 1
+    for i in range(out.shape[0]):
+        a = prev_position[i]
+        b = position[i]
+        _sampled_row(a, b, (b - a) / last, heaven_position[i] > hell_position[i], low[i], high[i], steps, out[i])
+
+
+def lower_level_observation(prev_position, position, heaven_position, hell_position,
+                            priest_position, priest_delta, steps, out):
+    """See pomdp_mountain_car_core.lower_level_observation."""
+    low = priest_position - priest_delta
+    high = priest_position + priest_delta
+    if out.ndim == 1:
+        a = float(prev_position)
+        b = float(position)
+        _sampled_row(a, b, (b - a) / (len(steps) - 1), bool(heaven_position > hell_position),
+                     low, high, steps, out)
+    else:
+        _sampled(np.asarray(prev_position, dtype=np.float64), np.asarray(position, dtype=np.float64),
+                 heaven_position, hell_position, _lanes(low, heaven_position), _lanes(high, heaven_position),
+                 steps, out)
+    return out
+
+
+@jit
+def _exact_row(a, b, right, low, high, steps, out):
+    last = steps.shape[0] - 1
+    delta = b - a
+    step = delta / last
+    for k in range(last + 1):
+        out[2 * k] = steps[k] * step + a
+        out[2 * k + 1] = 0.0
+    out[2 * last] = b
+
+    if min(a, b) > high or max(a, b) < low:
+        return
+    direction = 1.0 if right else -1.0
+    if delta == 0:
+        for k in range(last + 1):
+            out[2 * k + 1] = direction
+        return
+
+    t_low = (low - a) / delta
+    t_high = (high - a) / delta
+    t_enter = min(max(min(t_low, t_high), 0.0), 1.0)
+    t_exit = min(max(max(t_low, t_high), 0.0), 1.0)
+
+    enter = 0
+    if t_enter > 0:
+        enter = min(int(math.ceil(t_enter * last)), last - 1)
+        out[2 * enter] = low if delta > 0 else high
+    exit = last
+    if t_exit < 1:
+        exit = max(min(int(math.floor(t_exit * last)) + 1, last - 1), enter)
+        if exit != enter:
+            out[2 * exit] = high if delta > 0 else low
+    for k in range(enter, exit + 1):
+        out[2 * k + 1] = direction
+
+
+@jit
+def _exact(prev_position, position, heaven_position, hell_position, low, high, steps, out):
+    for i in range(out.shape[0]):
+        _exact_row(prev_position[i], position[i], heaven_position[i] > hell_position[i], low[i], high[i], steps,
+                   out[i])
+
+
+def lower_level_observation_exact(prev_position, position, heaven_position, hell_position,
+                                  priest_position, priest_delta, steps, out):
+    """See pomdp_mountain_car_core.lower_level_observation_exact."""
+    if len(steps) < 3:
+        raise ValueError('exact crossing needs a history of at least 3 points')
+    low = priest_position - priest_delta
+    high = priest_position + priest_delta
+    if out.ndim == 1:
+        _exact_row(float(prev_position), float(position), bool(heaven_position > hell_position),
+                   low, high, steps, out)
+    else:
+        _exact(np.asarray(prev_position, dtype=np.float64), np.asarray(position, dtype=np.float64),
+               heaven_position, hell_position, _lanes(low, heaven_position), _lanes(high, heaven_position),
+               steps, out)
+    return out
@@ -0,0 +1,750 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Olivier Sigaud
+
+A merge between two sources:
+
+* Adaptation of the MountainCar Environment from the "FAReinforcement" library
+of Jose Antonio Martin H. (version 1.0), adapted by  'Tom Schaul, tom@idsia.ch'
+and then modified by Arnaud de Broissia
+
+* the OpenAI/gym MountainCar environment
+itself from
+http://incompleteideas.net/sutton/MountainCar/MountainCar1.cp
+permalink: https://perma.cc/6Z2N-PFWC
+
+The dynamics shared by every pomdp-mountain-car variant live here. A variant is
+described by a MountainCarVariant spec; the registered env classes are thin
+presets over ContinuousMountainCarPomdpBaseEnv, and the batched kernels below
+serve every variant at once.
+"""
+
+import math
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+
+import gym
+from gym import spaces
+from gym.utils import seeding
+
+from gym_custom import backend
+from gym_custom.envs.dtypes import DIRECTION_VALUES, observation_dtype
+
+if backend.ENABLED:
+    from gym_custom.envs import pomdp_mountain_car_compiled
+
+
+MountainCarVariant = namedtuple('MountainCarVariant', [
+    'min_action',
+    'max_action',
+    'max_speed',
+    'priest_position',
+    'priest_delta',
+    'priest_reveals',   # whether the direction is observed near the priest
+    'reveal_on_reset',  # whether the direction is observed right after reset
+    'reward_scale',
+    'terminates',       # whether reaching heaven or hell ends the episode
+    'observation',      # 'full' for (position, velocity, direction), 'direction' for the direction bit only
+    'random_start',     # whether the start position is drawn from [-0.2, 0.2] rather than fixed at 0
+])
+
+DEFAULT = MountainCarVariant(
+    min_action=-5.0,
+    max_action=5.0,
+    max_speed=0.2,
+    priest_position=0.5,
+    priest_delta=0.1,
+    priest_reveals=True,
+    reveal_on_reset=False,
+    reward_scale=1.0,
+    terminates=True,
+    observation='full',
+    random_start=True,
+)
+
+# Reset gives the direction but subsequent steps do not give directions, even near priest.
+EASY = DEFAULT._replace(
+    min_action=-15.0,
+    max_action=15.0,
+    max_speed=0.5,
+    priest_position=0.0,  # doesn't matter
+    priest_reveals=False,
+    reveal_on_reset=True,
+    observation='direction',
+)
+
+# Needs to be wrapped with a TimeLimit wrapper (see README).
+EPISODIC = DEFAULT._replace(
+    min_action=-10.0,
+    max_action=10.0,
+    terminates=False,
+)
+
+EPISODIC_EASY = EASY._replace(
+    priest_delta=0.2,  # doesn't matter
+    reward_scale=1.0 / 7,
+    terminates=False,
+    random_start=False,
+)
+
+# The action is the target position, reached by an optimal lower-level policy.
+OPT_LOWER = DEFAULT._replace(
+    min_action=-1.2,
+    max_action=1.2,
+)
+
+VARIANTS = {
+    'default': DEFAULT,
+    'easy': EASY,
+    'episodic': EPISODIC,
+    'episodic-easy': EPISODIC_EASY,
+}
+
+
+# The info returned by every env in zero-copy mode. It is shared and read-only, so
+# returning it allocates nothing.
+EMPTY_INFO = MappingProxyType({})
+
+
+def get_variant(variant):
+    """Accept either a MountainCarVariant or the name of one of the presets in VARIANTS."""
+    if isinstance(variant, str):
+        return VARIANTS[variant]
+    return variant
+
+
+# Batched kernels; every argument may be a scalar or an array broadcastable to [N].
+# With the compiled backend (see gym_custom.backend) the kernels marked with
+# _kernel are replaced by their compiled versions, for the scalar and the vector
+# envs alike. NUMPY_KERNELS keeps the NumPy versions under either backend.
+
+NUMPY_KERNELS = {}
+
+
+def _kernel(function):
+    NUMPY_KERNELS[function.__name__] = function
+    if backend.ENABLED:
+        return getattr(pomdp_mountain_car_compiled, function.__name__)
+    return function
+
+
+@_kernel
+def advance(position, velocity, force, power, max_speed, min_position, max_position):
+    """Advance position and velocity in place by one step of the dynamics."""
+    velocity += force * power
+    # np.clip with array bounds (per-lane max_speed) is twice as slow as this.
+    np.minimum(np.maximum(velocity, -max_speed, out=velocity), max_speed, out=velocity)
+    position += velocity
+    np.minimum(np.maximum(position, min_position, out=position), max_position, out=position)
+    velocity[(position == min_position) & (velocity < 0)] = 0
+
+
+@_kernel
+def reward_done(position, heaven_position, hell_position, reward_scale, terminates):
+    heaven_on_right = heaven_position > hell_position
+    at_upper = position >= np.maximum(heaven_position, hell_position)
+    at_lower = position <= np.minimum(heaven_position, hell_position)
+
+    # Same precedence as the scalar env: the lower bound is checked last.
+    reward = np.where(at_upper, np.where(heaven_on_right, reward_scale, -reward_scale), 0.0)
+    reward = np.where(at_lower, np.where(heaven_on_right, -reward_scale, reward_scale), reward)
+
+    if terminates:
+        dones = at_upper | at_lower
+    else:
+        dones = np.zeros(np.shape(position), dtype=bool)
+    return reward, dones
+
+
+def heaven_direction(heaven_position, hell_position):
+    """1.0 where heaven is on the right, -1.0 where it is on the left."""
+    return np.where(heaven_position > hell_position, 1.0, -1.0)
+
+
+@_kernel
+def priest_direction(position, heaven_position, hell_position, priest_position, priest_delta):
+    near_priest = (position >= priest_position - priest_delta) & \
+                  (position <= priest_position + priest_delta)
+    return np.where(near_priest, heaven_direction(heaven_position, hell_position), 0.0)
+
+
+def lower_level_steps(num_points):
+    """The index grid used by lower_level_observation, computed once per env."""
+    return np.arange(num_points, dtype=np.float64)
+
+
+@_kernel
+def lower_level_observation(prev_position, position, heaven_position, hell_position,
+                            priest_position, priest_delta, steps, out):
+    """
+    The observation of an optimal lower-level policy driving the car from
+    prev_position to position: len(steps) evenly spaced positions, each followed by
+    the direction observed there, written interleaved into out.
+
+    The positions are the values of np.linspace(prev_position, position, len(steps))
+    with both ends taken as float64, whatever their dtype (NumPy 2 would interpolate
+    float32 ends in float32).
+
+    prev_position, position, heaven_position, hell_position, priest_position and
+    priest_delta are scalars or arrays of shape [N]; out has shape [2 * K] or
+    [N, 2 * K] accordingly.
+    """
+    num_points = len(steps)
+    grid = out.reshape(out.shape[:-1] + (num_points, 2))
+    positions = grid[..., 0]
+    prev_position = np.asarray(prev_position, dtype=np.float64)[..., None]
+    position = np.asarray(position, dtype=np.float64)[..., None]
+
+    np.multiply(steps, (position - prev_position) / (num_points - 1), out=positions)
+    positions += prev_position
+    positions[..., -1:] = position
+
+    low = np.asarray(priest_position - priest_delta)[..., None]
+    high = np.asarray(priest_position + priest_delta)[..., None]
+    near_priest = (positions >= low) & (positions <= high)
+    direction = heaven_direction(np.asarray(heaven_position)[..., None], np.asarray(hell_position)[..., None])
+    np.copyto(grid[..., 1], np.where(near_priest, direction, 0.0))
+    return out
+
+
+@_kernel
+def lower_level_observation_exact(prev_position, position, heaven_position, hell_position,
+                                  priest_position, priest_delta, steps, out):
+    """
+    Like lower_level_observation, but whether the car meets the priest is decided
+    analytically from the segment [prev_position, position], so a crossing is never
+    missed whatever the number of points K. The direction of sample i is set when
+    the car was near the priest at some point since sample i - 1, and the first and
+    last of those samples are moved onto the points where the car enters and leaves
+    the priest zone. The start and end samples always stay at prev_position and
+    position, so K must be at least 3.
+
+    The Python-level work is the same for every K; only the array fills grow.
+    """
+    num_points = len(steps)
+    if num_points < 3:
+        raise ValueError('exact crossing needs a history of at least 3 points')
+    if out.ndim == 1:
+        return _lower_level_observation_exact_single(prev_position, position, heaven_position, hell_position,
+                                                     priest_position, priest_delta, steps, out)
+    last = num_points - 1
+    grid = out.reshape(out.shape[:-1] + (num_points, 2))
+    positions = grid[..., 0]
+    a = np.asarray(prev_position, dtype=np.float64)
+    b = np.asarray(position, dtype=np.float64)
+    delta = b - a
+
+    np.multiply(steps, (delta / last)[..., None], out=positions)
+    positions += a[..., None]
+    positions[..., -1] = b
+
+    low = priest_position - priest_delta
+    high = priest_position + priest_delta
+    crosses = (np.minimum(a, b) <= high) & (np.maximum(a, b) >= low)
+
+    # Fractions of the segment at which the car enters and leaves the priest zone.
+    moving = delta != 0
+    moving_right = delta > 0
+    safe_delta = np.where(moving, delta, 1.0)
+    t_low = (low - a) / safe_delta
+    t_high = (high - a) / safe_delta
+    t_enter = np.where(moving, np.clip(np.minimum(t_low, t_high), 0.0, 1.0), 0.0)
+    t_exit = np.where(moving, np.clip(np.maximum(t_low, t_high), 0.0, 1.0), 1.0)
+
+    enter = np.where(t_enter > 0, np.minimum(np.ceil(t_enter * last), last - 1), 0).astype(np.intp)
+    exit = np.where(t_exit < 1, np.minimum(np.floor(t_exit * last) + 1, last - 1), last).astype(np.intp)
+    exit = np.maximum(exit, enter)
+
+    enter_position = np.where(moving_right, low, high)
+    exit_position = np.where(moving_right, high, low)
+    snap_enter = crosses & (t_enter > 0)
+    snap_exit = crosses & (t_exit < 1) & (exit != enter)
+
+    enter, exit = enter[..., None], exit[..., None]
+    np.put_along_axis(positions, enter, np.where(
+        snap_enter, enter_position, np.take_along_axis(positions, enter, -1)[..., 0])[..., None], -1)
+    np.put_along_axis(positions, exit, np.where(
+        snap_exit, exit_position, np.take_along_axis(positions, exit, -1)[..., 0])[..., None], -1)
+
+    near_priest = crosses[..., None] & (steps >= enter) & (steps <= exit)
+    direction = heaven_direction(np.asarray(heaven_position)[..., None], np.asarray(hell_position)[..., None])
+    np.copyto(grid[..., 1], np.where(near_priest, direction, 0.0))
+    return out
+
+
+def _lower_level_observation_exact_single(prev_position, position, heaven_position, hell_position,
+                                         priest_position, priest_delta, steps, out):
+    """lower_level_observation_exact for a single env, with the crossing computed on Python floats."""
+    last = len(steps) - 1
+    a = float(prev_position)
+    b = float(position)
+    delta = b - a
+
+    positions = out[0::2]
+    directions = out[1::2]
+    np.multiply(steps, delta / last, out=positions)
+    positions += a
+    positions[-1] = b
+    directions.fill(0.0)
+
+    low = priest_position - priest_delta
+    high = priest_position + priest_delta
+    if min(a, b) > high or max(a, b) < low:
+        return out
+
+    if delta == 0:
+        directions.fill(1.0 if heaven_position > hell_position else -1.0)
+        return out
+
+    t_low = (low - a) / delta
+    t_high = (high - a) / delta
+    t_enter = min(max(min(t_low, t_high), 0.0), 1.0)
+    t_exit = min(max(max(t_low, t_high), 0.0), 1.0)
+
+    enter = 0
+    if t_enter > 0:
+        enter = min(math.ceil(t_enter * last), last - 1)
+        positions[enter] = low if delta > 0 else high
+    exit = last
+    if t_exit < 1:
+        exit = max(min(math.floor(t_exit * last) + 1, last - 1), enter)
+        if exit != enter:
+            positions[exit] = high if delta > 0 else low
+
+    directions[enter:exit + 1] = 1.0 if heaven_position > hell_position else -1.0
+    return out
+
+
+# How the opt-lower envs decide whether the car meets the priest on its way.
+LOWER_LEVEL_OBSERVATIONS = {
+    'sampled': lower_level_observation,
+    'exact': lower_level_observation_exact,
+}
+
+
+# Functional API, for planners that simulate many futures without touching an env.
+# A state is a row (position, velocity, observed direction, heaven position), with
+# heaven at +1 (on the right) or -1 and hell opposite; a batch of states is [N, 4].
+
+POSITION, VELOCITY, DIRECTION, HEAVEN = range(4)
+STATE_SIZE = 4
+
+MIN_POSITION = -1.2
+MAX_POSITION = 1.2
+POWER = 0.0015
+
+
+def _observations(states, variant, dtype):
+    if variant.observation == 'direction':
+        return states[:, DIRECTION:DIRECTION + 1].astype(dtype)
+    return states[:, :HEAVEN].astype(dtype)
+
+
+def _coin_flips(np_random, size):
+    """0/1 draws from a RandomState (as made by env.seed) or a Generator."""
+    integers = getattr(np_random, 'integers', None) or np_random.randint
+    return integers(2, size=size)
+
+
+def reset_functional(np_random, num_states=1, variant=DEFAULT, dtype=np.float32):
+    """
+    num_states start states drawn from np_random as the envs draw them, and their
+    observations (of the given dtype): ([num_states, 4], [num_states, obs_dim]).
+    """
+    variant = get_variant(variant)
+    states = np.zeros((num_states, STATE_SIZE))
+    if variant.random_start:
+        states[:, POSITION] = np_random.uniform(low=-0.2, high=0.2, size=num_states)
+    states[:, HEAVEN] = np.where(_coin_flips(np_random, num_states) == 0, 1.0, -1.0)
+    if variant.reveal_on_reset:
+        states[:, DIRECTION] = heaven_direction(states[:, HEAVEN], -states[:, HEAVEN])
+    return states, _observations(states, variant, dtype)
+
+
+def step_functional(states, actions, variant=DEFAULT, dtype=np.float32):
+    """
+    One step of every state in a batch [N, 4] under actions [N, 1] (or [N]), without
+    side effects: returns (next_states, observations, rewards, dones). Row i is what
+    an env of the variant in state i returns for action i. The states stay float64;
+    the observations have the given dtype.
+    """
+    variant = get_variant(variant)
+    next_states = np.array(states, dtype=np.float64)
+    position = next_states[:, POSITION]
+    velocity = next_states[:, VELOCITY]
+    heaven_position = next_states[:, HEAVEN]
+    hell_position = -heaven_position
+
+    force = np.clip(np.asarray(actions, dtype=np.float64).reshape(len(next_states), -1)[:, 0],
+                    variant.min_action, variant.max_action)
+    advance(position, velocity, force, POWER, variant.max_speed, MIN_POSITION, MAX_POSITION)
+    rewards, dones = reward_done(position, heaven_position, hell_position, variant.reward_scale,
+                                 variant.terminates)
+    if variant.priest_reveals:
+        next_states[:, DIRECTION] = priest_direction(position, heaven_position, hell_position,
+                                                     variant.priest_position, variant.priest_delta)
+    else:
+        next_states[:, DIRECTION] = 0.0
+    return next_states, _observations(next_states, variant, dtype), rewards, dones
+
+
+class ContinuousMountainCarPomdpBaseEnv(gym.Env):
+
+    """
+    Scalar mountain-car env configured by the MountainCarVariant in `variant`.
+
+    The observations are float32 arrays, as the observation space declares; the
+    state stays float64. obs_dtype='float16' or 'int8' is accepted for the
+    direction-only variants, whose observations are -1, 0 or 1.
+
+    With zero_copy=True the env owns preallocated float32 state and observation
+    buffers and step/reset write into them in place, so the hot loop does not
+    allocate. The contract in that mode:
+
+    * the observation returned by step/reset is a read-only view of the env's
+      observation buffer. It is overwritten by the next step/reset of the same env;
+      call np.array(obs) if you need it afterwards (e.g. to store it in a replay
+      buffer that does not copy on insertion, or to keep a trajectory).
+    * the info is the shared, immutable EMPTY_INFO mapping; copy it with dict(info)
+      before adding keys.
+    * self.state is updated in place; it stays float64, so both modes give the same
+      trajectories.
+    """
+
+    metadata = {
+        'render.modes': ['human', 'rgb_array'],
+        'video.frames_per_second': 30
+    }
+
+    variant = DEFAULT
+
+    def __init__(self, zero_copy=False, obs_dtype=None):
+        self.zero_copy = zero_copy
+        variant = self.variant
+        self.obs_dtype = observation_dtype(
+            obs_dtype, DIRECTION_VALUES if variant.observation == 'direction' else None)
+        self.min_action = variant.min_action
+        self.max_action = variant.max_action
+        self.min_position = -1.2
+        self.max_position = 1.2
+        self.max_speed = variant.max_speed
+        self.heaven_position = 1.0 # was 0.5 in gym, 0.45 in Arnaud de Broissia's version
+        self.hell_position = -1.0 # was 0.5 in gym, 0.45 in Arnaud de Broissia's version
+        self.priest_position = variant.priest_position
+        self.power = 0.0015
+
+        # When the cart is within this vicinity, it observes the direction given
+        # by the priest
+        self.priest_delta = variant.priest_delta
+
+        self.low_state = np.array(
+            [self.min_position, -self.max_speed, -1.0], dtype=np.float32
+        )
+        self.high_state = np.array(
+            [self.max_position, self.max_speed, 1.0], dtype=np.float32
+        )
+
+        self.viewer = None
+        self._rasterizer = None
+        self._flags = None
+
+        self.action_space = spaces.Box(
+            low=self.min_action,
+            high=self.max_action,
+            shape=(1,),
+            dtype=np.float32
+        )
+        self.observation_space = self._make_observation_space()
+
+        if zero_copy:
+            self._init_zero_copy()
+
+        self.seed()
+        self.reset()
+
+    def _init_zero_copy(self):
+        """Zero-copy mode: the state and observation buffers that step and reset write in place."""
+        self.state = np.zeros(3)
+        self._obs = np.zeros(self.observation_space.shape, dtype=self.obs_dtype)
+        self._obs_view = self._obs.view()
+        self._obs_view.flags.writeable = False
+
+    def _make_observation_space(self):
+        if self.variant.observation == 'direction':
+            return spaces.Box(low=-1.0, high=1.0, shape=(1,), dtype=self.obs_dtype)
+        return spaces.Box(
+            low=self.low_state,
+            high=self.high_state,
+            dtype=self.obs_dtype
+        )
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def functional_state(self):
+        """The current state as a row of the functional API (see step_functional)."""
+        return np.array([self.state[0], self.state[1], self.state[2], self.heaven_position], dtype=np.float64)
+
+    def reset_functional(self, np_random, num_states=1):
+        """reset_functional for the variant of this env; the env itself is left untouched."""
+        return reset_functional(np_random, num_states, self.variant, self.obs_dtype)
+
+    def step_functional(self, states, actions):
+        """step_functional for the variant of this env; the env itself is left untouched."""
+        return step_functional(states, actions, self.variant, self.obs_dtype)
+
+    def _get_obs(self):
+        if self.variant.observation == 'direction':
+            return self.state[2:].astype(self.obs_dtype)
+        return self.state.astype(self.obs_dtype)
+
+    def _heaven_direction(self):
+        if (self.heaven_position > self.hell_position):
+            # Heaven on the right
+            return 1.0
+        else:
+            # Heaven on the left
+            return -1.0
+
+    def _priest_direction(self, position):
+        if position >= self.priest_position - self.priest_delta and position <= self.priest_position + self.priest_delta:
+            return self._heaven_direction()
+        return 0.0
+
+    def _reward_done(self, position):
+        # Convert a possible numpy bool to a Python bool.
+        max_position = max(self.heaven_position, self.hell_position)
+        min_position = min(self.heaven_position, self.hell_position)
+
+        done = self.variant.terminates and bool(
+            position >= max_position or position <= min_position
+        )
+
+        reward = 0.0
+        if (self.heaven_position > self.hell_position):
+            if (position >= self.heaven_position):
+                reward = 1.0
+
+            if (position <= self.hell_position):
+                reward = -1.0
+
+        if (self.heaven_position < self.hell_position):
+            if (position >= self.hell_position):
+                reward = -1.0
+
+            if (position <= self.heaven_position):
+                reward = 1.0
+
+        return reward * self.variant.reward_scale, done
+
+    def _write_state(self, position, velocity, direction):
+        """Zero-copy mode: update the state and observation buffers in place."""
+        state = self.state
+        state[0] = position
+        state[1] = velocity
+        state[2] = direction
+
+        obs = self._obs
+        if self.variant.observation == 'direction':
+            obs[0] = direction
+        else:
+            obs[0] = position
+            obs[1] = velocity
+            obs[2] = direction
+        return self._obs_view
+
+    def step(self, action):
+
+        if self.zero_copy:
+            # item() returns Python floats without creating NumPy scalars.
+            position = self.state.item(0)
+            velocity = self.state.item(1)
+        else:
+            position = self.state[0]
+            velocity = self.state[1]
+        # The dynamics run in float64 whatever the action dtype, as in the vector and functional kernels.
+        force = float(action[0])
+        force = min(max(force, self.min_action), self.max_action)
+
+        # velocity += force * self.power - 0.0025 * math.cos(3 * position)
+        velocity += force * self.power
+        if (velocity > self.max_speed): velocity = self.max_speed
+        if (velocity < -self.max_speed): velocity = -self.max_speed
+        position += velocity
+        if (position > self.max_position): position = self.max_position
+        if (position < self.min_position): position = self.min_position
+        if (position == self.min_position and velocity < 0): velocity = 0
+
+        reward, done = self._reward_done(position)
+
+        direction = 0.0
+        if self.variant.priest_reveals:
+            direction = self._priest_direction(position)
+
+        if self.zero_copy:
+            return self._write_state(position, velocity, direction), reward, done, EMPTY_INFO
+
+        self.state = np.array([position, velocity, direction])
+
+        return self._get_obs(), reward, done, {}
+
+    def _reset_heaven(self):
+        # Randomize the heaven/hell location
+        if (self.np_random.randint(2) == 0):
+            self.heaven_position = 1.0
+        else:
+            self.heaven_position = -1.0
+
+        self.hell_position = -self.heaven_position
+
+        if self.viewer is not None:
+            self.draw_flags(self._scale())
+
+    def reset(self):
+        position = 0.0
+        if self.variant.random_start:
+            position = self.np_random.uniform(low=-0.2, high=0.2)
+
+        self._reset_heaven()
+
+        direction = 0.0
+        if self.variant.reveal_on_reset:
+            direction = self._heaven_direction()
+
+        if self.zero_copy:
+            return self._write_state(position, 0.0, direction)
+
+        self.state = np.array([position, 0, direction])
+        return self._get_obs()
+
+    def _height(self, xs):
+        return .55 * np.ones_like(xs)
+
+    def _scale(self):
+        screen_width = 800
+        world_width = self.max_position - self.min_position
+        return screen_width/world_width
+
+    def _car_position(self):
+        return self.state[0]
+
+    def _observed_direction(self):
+        return self.state[2]
+
+    def _render_rgb_array(self):
+        """Frame drawn with NumPy (no display needed); a view of the env's frame buffer with zero_copy."""
+        if self._rasterizer is None:
+            from gym_custom.envs.pomdp_mountain_car_raster import MountainCarRasterizer
+            self._rasterizer = MountainCarRasterizer(self.min_position, self.max_position, self.priest_position,
+                                                     track_height=float(self._height(0.0)))
+            self._frame = np.empty((self._rasterizer.height, self._rasterizer.width, 3), dtype=np.uint8)
+            self._frame_view = self._frame.view()
+            self._frame_view.flags.writeable = False
+        if not self.zero_copy:
+            return self._rasterizer.render(self._car_position(), self.heaven_position, self._observed_direction())
+        self._rasterizer.render(self._car_position(), self.heaven_position, self._observed_direction(),
+                                out=self._frame)
+        return self._frame_view
+
+    def render(self, mode='human'):
+        if mode == 'rgb_array':
+            return self._render_rgb_array()
+
+        from gym.envs.classic_control import rendering
+
+        screen_width = 800
+        screen_height = 600
+
+        scale = self._scale()
+        carwidth = 40
+        carheight = 20
+
+        if self.viewer is None:
+
+            self.viewer = rendering.Viewer(screen_width, screen_height)
+            xs = np.linspace(self.min_position, self.max_position, 100)
+            ys = self._height(xs)
+            xys = list(zip((xs-self.min_position)*scale, ys*scale))
+
+            self.track = rendering.make_polyline(xys)
+            self.track.set_linewidth(4)
+            self.viewer.add_geom(self.track)
+
+            clearance = 10
+
+            l, r, t, b = -carwidth / 2, carwidth / 2, carheight, 0
+            car = rendering.FilledPolygon([(l, b), (l, t), (r, t), (r, b)])
+            car.add_attr(rendering.Transform(translation=(0, clearance)))
+            self.cartrans = rendering.Transform()
+            car.add_attr(self.cartrans)
+            self.viewer.add_geom(car)
+            frontwheel = rendering.make_circle(carheight / 2.5)
+            frontwheel.set_color(.5, .5, .5)
+            frontwheel.add_attr(
+                rendering.Transform(translation=(carwidth / 4, clearance))
+            )
+            frontwheel.add_attr(self.cartrans)
+            self.viewer.add_geom(frontwheel)
+            backwheel = rendering.make_circle(carheight / 2.5)
+            backwheel.add_attr(
+                rendering.Transform(translation=(-carwidth / 4, clearance))
+            )
+            backwheel.add_attr(self.cartrans)
+            backwheel.set_color(.5, .5, .5)
+            self.viewer.add_geom(backwheel)
+
+            self.draw_flags(scale)
+
+            # Flag Priest (blue)
+            self._make_flag(scale, self.priest_position, (0.0, 0.0, 1.0))
+
+        pos = self._car_position()
+        self.cartrans.set_translation(
+            (pos-self.min_position) * scale, self._height(pos) * scale
+        )
+        # self.cartrans.set_rotation(math.cos(3 * pos))
+
+        return self.viewer.render()
+
+    def _make_flag(self, scale, position, color):
+        """Adds a flagpole and its flag to the viewer; returns the flag and the transform placing both."""
+        from gym.envs.classic_control import rendering
+
+        transform = rendering.Transform()
+        flagpole = rendering.Line((0, 0), (0, 50))
+        flagpole.add_attr(transform)
+        self.viewer.add_geom(flagpole)
+        flag = rendering.FilledPolygon([(0, 50), (0, 40), (25, 45)])
+        flag.set_color(*color)
+        flag.add_attr(transform)
+        self.viewer.add_geom(flag)
+        self._place_flag(transform, scale, position)
+        return flag, transform
+
+    def _place_flag(self, transform, scale, position):
+        transform.set_translation((position - self.min_position) * scale, self._height(position) * scale)
+
+    def draw_flags(self, scale):
+        # The heaven and hell flags are added to the viewer once; later calls only
+        # move and recolor them, so the scene does not grow with every episode.
+        if self._flags is None:
+            self._flags = [self._make_flag(scale, 0.0, (0.0, 0.0, 0.0)) for _ in range(2)]
+
+        # GREEN for heaven, RED for hell
+        heaven_on_right = self.heaven_position > self.hell_position
+        right_color, left_color = ((0.0, 1.0, 0), (1.0, 0.0, 0)) if heaven_on_right else ((1.0, 0.0, 0), (0.0, 1.0, 0))
+        (right_flag, right_transform), (left_flag, left_transform) = self._flags
+
+        self._place_flag(right_transform, scale, abs(self.heaven_position))
+        right_flag.set_color(*right_color)
+        self._place_flag(left_transform, scale, -abs(self.heaven_position))
+        left_flag.set_color(*left_color)
+
+    def close(self):
+        if self.viewer:
+            self.viewer.close()
+            self.viewer = None
+            self._flags = None
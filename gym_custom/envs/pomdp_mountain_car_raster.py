@@ -0,0 +1,217 @@
+"""
+Headless rgb_array rendering of the mountain-car envs with NumPy only (no pyglet or
+OpenGL, so it works without a display).
+
+The scene is the one drawn by the pyglet viewer: the track, the heaven (green) and
+hell (red) flags, the priest's (blue) flag and the car with its wheels, plus an
+arrow at the top of the frame showing the direction the car currently observes.
+For given flag positions everything but the car depends on two discrete values,
+the side of heaven and the observed direction, so the six possible backgrounds are
+drawn once and a frame is a copy of one of them with the car sprite stamped on it.
+render_batch does that for N cars at once with one gather and one scatter. Lanes
+with their own flag positions (the lane parameters of the vector envs) get the
+backgrounds of their layout, which are drawn on first use and cached.
+"""
+
+import numpy as np
+
+
+VIEWER_WIDTH = 800
+VIEWER_HEIGHT = 600
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GREY = (128, 128, 128)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+
+CAR_WIDTH = 40
+CAR_HEIGHT = 20
+CLEARANCE = 10
+FLAG_HEIGHT = 50
+# Flag layouts other than the rasterizer's own whose backgrounds are kept.
+MAX_CACHED_LAYOUTS = 16
+
+
+def _convex_mask(xs, ys, points):
+    """Pixels with centres (xs, ys) inside the convex polygon given by its vertices."""
+    inside_left = np.ones(np.broadcast(xs, ys).shape, dtype=bool)
+    inside_right = inside_left.copy()
+    for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]):
+        cross = (x1 - x0) * (ys - y0) - (y1 - y0) * (xs - x0)
+        inside_left &= cross >= 0
+        inside_right &= cross <= 0
+    return inside_left | inside_right
+
+
+def _circle_mask(xs, ys, centre, radius):
+    return (xs - centre[0]) ** 2 + (ys - centre[1]) ** 2 <= radius ** 2
+
+
+def _segment_mask(xs, ys, start, end, width):
+    """Pixels within width / 2 of the segment."""
+    start = np.asarray(start, dtype=np.float64)
+    direction = np.asarray(end, dtype=np.float64) - start
+    t = ((xs - start[0]) * direction[0] + (ys - start[1]) * direction[1]) / max(direction.dot(direction), 1e-12)
+    t = np.clip(t, 0.0, 1.0)
+    distance2 = (xs - start[0] - t * direction[0]) ** 2 + (ys - start[1] - t * direction[1]) ** 2
+    return distance2 <= (width / 2.0) ** 2
+
+
+class MountainCarRasterizer(object):
+
+    """
+    Draws mountain-car frames of width x height pixels (default: the 800 x 600 of
+    the pyglet viewer; other sizes scale the whole scene).
+
+    render(position, heaven_position, direction) returns one [height, width, 3]
+    uint8 frame; render_batch does the same for arrays of N cars and returns
+    [N, height, width, 3]. Both write into `out` when given. render_batch also
+    takes the flag positions of every car (right_flags, left_flags,
+    priest_positions); the ones left out are those given here.
+    """
+
+    def __init__(self, min_position=-1.2, max_position=1.2, priest_position=0.5, track_height=0.55,
+                 width=VIEWER_WIDTH, height=None, right_flag=1.0, left_flag=-1.0):
+        self.min_position = min_position
+        self.max_position = max_position
+        self.priest_position = priest_position
+        self.right_flag = right_flag
+        self.left_flag = left_flag
+        self.width = width
+        self.height = int(round(VIEWER_HEIGHT * width / VIEWER_WIDTH)) if height is None else height
+        self.zoom = width / VIEWER_WIDTH
+        # Viewer pixels per world unit, and the track height in viewer pixels.
+        self.scale = VIEWER_WIDTH / (max_position - min_position)
+        self.track_y = track_height * self.scale
+
+        self._layout = (float(priest_position), float(right_flag), float(left_flag))
+        self._backgrounds = self._draw_backgrounds(*self._layout)
+        self._cached_backgrounds = {}
+        self._car_rows, self._car_columns, self._car_colors = self._draw_car()
+        # Row of the frame on which the car sits.
+        self._car_row = int(round(self.height - self.track_y * self.zoom))
+
+    def _viewer_coordinates(self):
+        """Viewer coordinates (y up) of the centres of the frame's pixels."""
+        xs = (np.arange(self.width) + 0.5) / self.zoom
+        ys = (self.height - np.arange(self.height) - 0.5) / self.zoom
+        return xs[None, :], ys[:, None]
+
+    def _line_width(self, width):
+        """Line widths are at least one pixel of the frame, so thin lines survive downscaling."""
+        return max(width, 1.0 / self.zoom)
+
+    def _world_x(self, position):
+        return (position - self.min_position) * self.scale
+
+    def _draw_flag(self, frame, xs, ys, position, color):
+        flag_x = self._world_x(position)
+        top = self.track_y + FLAG_HEIGHT
+        frame[_segment_mask(xs, ys, (flag_x, self.track_y), (flag_x, top), self._line_width(1.0))] = BLACK
+        frame[_convex_mask(xs, ys, [(flag_x, top), (flag_x, top - 10), (flag_x + 25, top - 5)])] = color
+
+    def _draw_arrow(self, frame, xs, ys, direction):
+        x, y = VIEWER_WIDTH / 2.0, VIEWER_HEIGHT - 40.0
+        frame[_segment_mask(xs, ys, (x - 30, y), (x + 30, y), self._line_width(6.0))] = BLUE
+        tip = x + 45 * direction
+        base = x + 25 * direction
+        frame[_convex_mask(xs, ys, [(tip, y), (base, y + 12), (base, y - 12)])] = BLUE
+
+    def _draw_backgrounds(self, priest_position, right_flag, left_flag):
+        """The six static layers, indexed by 3 * (heaven on the right) + direction + 1."""
+        xs, ys = self._viewer_coordinates()
+        scene = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        scene[...] = WHITE
+        scene[_segment_mask(xs, ys, (0.0, self.track_y), (VIEWER_WIDTH, self.track_y),
+                                self._line_width(4.0))] = BLACK
+        self._draw_flag(scene, xs, ys, priest_position, BLUE)
+
+        backgrounds = np.empty((6, self.height, self.width, 3), dtype=np.uint8)
+        for heaven_on_right in (0, 1):
+            flags = scene.copy()
+            # The right flag is heaven's when heaven is on the right, as in draw_flags.
+            self._draw_flag(flags, xs, ys, right_flag, GREEN if heaven_on_right else RED)
+            self._draw_flag(flags, xs, ys, left_flag, RED if heaven_on_right else GREEN)
+            for direction in (-1, 0, 1):
+                frame = backgrounds[3 * heaven_on_right + direction + 1]
+                frame[...] = flags
+                if direction:
+                    self._draw_arrow(frame, xs, ys, direction)
+        backgrounds.flags.writeable = False
+        return backgrounds
+
+    def _draw_car(self):
+        """Pixel offsets (from the car's position on the track) and colors of the car sprite."""
+        radius = int(np.ceil((CAR_WIDTH / 2 + 2) * self.zoom))
+        top = int(np.ceil((CLEARANCE + CAR_HEIGHT + 2) * self.zoom))
+        rows = np.arange(-top, radius // 2 + 1)
+        columns = np.arange(-radius, radius + 1)
+        xs = (columns[None, :]) / self.zoom
+        ys = (-rows[:, None]) / self.zoom
+
+        sprite = np.zeros(rows.shape + columns.shape + (3,), dtype=np.uint8)
+        body = _convex_mask(xs, ys, [(-CAR_WIDTH / 2, CLEARANCE), (-CAR_WIDTH / 2, CLEARANCE + CAR_HEIGHT),
+                                     (CAR_WIDTH / 2, CLEARANCE + CAR_HEIGHT), (CAR_WIDTH / 2, CLEARANCE)])
+        sprite[body] = BLACK
+        wheels = np.zeros_like(body)
+        for wheel_x in (CAR_WIDTH / 4, -CAR_WIDTH / 4):
+            wheels |= _circle_mask(xs, ys, (wheel_x, CLEARANCE), CAR_HEIGHT / 2.5)
+        sprite[wheels] = GREY
+
+        drawn = body | wheels
+        row_offsets, column_offsets = np.nonzero(drawn)
+        return rows[row_offsets], columns[column_offsets], sprite[drawn]
+
+    def _layout_backgrounds(self, layout):
+        """The backgrounds of a (priest_position, right_flag, left_flag) layout."""
+        if layout == self._layout:
+            return self._backgrounds
+        backgrounds = self._cached_backgrounds.pop(layout, None)
+        if backgrounds is None:
+            backgrounds = self._draw_backgrounds(*layout)
+            if len(self._cached_backgrounds) >= MAX_CACHED_LAYOUTS:
+                del self._cached_backgrounds[next(iter(self._cached_backgrounds))]
+        # Most recently used last, so the least recently used layout is dropped first.
+        self._cached_backgrounds[layout] = backgrounds
+        return backgrounds
+
+    def render_batch(self, positions, heaven_positions, directions, out=None,
+                     right_flags=None, left_flags=None, priest_positions=None):
+        """Frames for arrays of N positions, heaven positions, observed directions and flag positions."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1)
+        num_frames = len(positions)
+        if out is None:
+            out = np.empty((num_frames, self.height, self.width, 3), dtype=np.uint8)
+        layouts = np.empty((num_frames, 3))
+        for column, (flags, default) in enumerate([(priest_positions, self.priest_position),
+                                                   (right_flags, self.right_flag),
+                                                   (left_flags, self.left_flag)]):
+            layouts[:, column] = default if flags is None else np.reshape(flags, -1)
+        heaven_on_right = np.reshape(heaven_positions, -1) > (layouts[:, 1] + layouts[:, 2]) / 2
+        indices = 3 * heaven_on_right + np.sign(np.reshape(directions, -1)).astype(np.intp) + 1
+
+        distinct, lane_layout = np.unique(layouts, axis=0, return_inverse=True)
+        if len(distinct) == 1:
+            # mode='clip' (the indices are always valid) lets take write into out without buffering.
+            np.take(self._layout_backgrounds(tuple(distinct[0])), indices, axis=0, out=out, mode='clip')
+        else:
+            lane_layout = lane_layout.reshape(-1)
+            for k, layout in enumerate(distinct):
+                lanes = np.flatnonzero(lane_layout == k)
+                out[lanes] = self._layout_backgrounds(tuple(layout))[indices[lanes]]
+
+        columns = np.rint(self._world_x(positions) * self.zoom).astype(np.intp)[:, None] + self._car_columns
+        rows = np.broadcast_to(self._car_row + self._car_rows, columns.shape)
+        frames = np.broadcast_to(np.arange(num_frames)[:, None], columns.shape)
+        colors = np.broadcast_to(self._car_colors, columns.shape + (3,))
+        visible = (columns >= 0) & (columns < self.width) & (rows >= 0) & (rows < self.height)
+        out[frames[visible], rows[visible], columns[visible]] = colors[visible]
+        return out
+
+    def render(self, position, heaven_position, direction, out=None):
+        if out is None:
+            out = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.render_batch([position], [heaven_position], [direction], out=out[None])
+        return out
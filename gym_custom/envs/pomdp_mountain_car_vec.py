@@ -0,0 +1,399 @@
+"""
+Batched version of the pomdp-mountain-car envs.
+
+N cars are kept in contiguous arrays and advanced together by a single set of
+array operations per step, so the cost per step is dominated by a handful of
+NumPy calls instead of N Python-level env objects.
+"""
+
+import numpy as np
+
+from gym import spaces
+from gym.utils import seeding
+
+from gym_custom.envs.batched import BatchedEnv
+from gym_custom.envs.dtypes import DIRECTION_VALUES, observation_dtype
+from gym_custom.envs.pomdp_mountain_car_core import DEFAULT, OPT_LOWER, VARIANTS, get_variant, advance, \
+    reward_done, heaven_direction, priest_direction, LOWER_LEVEL_OBSERVATIONS, lower_level_steps
+from gym_custom.history import History
+
+
+# The constants of the scalar env that may differ from lane to lane. right_flag and
+# left_flag are the positions of the two flags; every reset makes one of them heaven
+# and the other hell.
+LANE_PARAMETERS = ('power', 'max_speed', 'min_action', 'max_action', 'priest_position', 'priest_delta',
+                   'right_flag', 'left_flag')
+
+
+def default_parameters(variant):
+    """The values of LANE_PARAMETERS in the scalar env of the variant."""
+    return {
+        'power': 0.0015,
+        'max_speed': variant.max_speed,
+        'min_action': variant.min_action,
+        'max_action': variant.max_action,
+        'priest_position': variant.priest_position,
+        'priest_delta': variant.priest_delta,
+        'right_flag': 1.0,
+        'left_flag': -1.0,
+    }
+
+
+class ContinuousMountainCarPomdpVecEnv(BatchedEnv):
+
+    """
+    Lane i of this env reproduces the scalar env of the same variant exactly, given
+    the same state and the same actions. `variant` is a MountainCarVariant
+    or the name of a preset ('default', 'easy', 'episodic', 'episodic-easy').
+
+    step takes actions of shape [N, 1] and returns observations of shape [N, obs_dim],
+    rewards of shape [N] and dones of shape [N]. max_episode_steps truncates the
+    episodes (200 stands for the TimeLimit of pomdp-mountain-car-episodic-v0). Lanes
+    are reset within step with auto_reset=True, otherwise use reset(mask) on the
+    lanes that are done; see BatchedEnv for the terminal/truncated flags and the
+    final observations in the info.
+
+    Every lane has its own constants (LANE_PARAMETERS): the attributes power,
+    max_speed, min_action, max_action, priest_position, priest_delta, right_flag and
+    left_flag are arrays of shape [N], by default filled with the values of the
+    variant. `parameters` overrides some of them with scalars or [N] arrays, and
+    `parameter_sampler(np_random, n)`, if given, is called on every reset and returns
+    a dict of new values (scalars or [n] arrays) for the n lanes being reset, e.g. for
+    domain randomization. The kernels take the arrays as they are, so a randomized
+    batch steps as fast as a homogeneous one. The action space follows the per-lane
+    bounds (the single action space spans all of them), the velocity bound of the
+    observation space is the largest max_speed at construction, and render draws the
+    variant's priest and flags.
+
+    The observations are float32 (obs_dtype, as in the scalar envs, allows float16 or
+    int8 for the direction-only variants).
+
+    render('rgb_array') returns the frames of all lanes, [N, height, width, 3], drawn
+    with NumPy (see pomdp_mountain_car_raster).
+    """
+
+    metadata = {'render.modes': ['rgb_array']}
+
+    def __init__(self, num_envs=1, variant=DEFAULT, max_episode_steps=None, auto_reset=False, parameters=None,
+                 parameter_sampler=None, obs_dtype=None):
+        self.num_envs = num_envs
+        self.variant = variant = get_variant(variant)
+        self.obs_dtype = observation_dtype(obs_dtype, self._observation_values())
+
+        self.min_position = -1.2
+        self.max_position = 1.2
+        # power, max_speed, ..., as [N] arrays. Within priest_delta of the priest, the
+        # cart observes the direction given by the priest.
+        parameters = dict(default_parameters(variant), **(parameters or {}))
+        unknown = set(parameters) - set(LANE_PARAMETERS)
+        if unknown:
+            raise ValueError('Unknown lane parameters {}, expected some of {}'.format(sorted(unknown),
+                                                                                     LANE_PARAMETERS))
+        for name in LANE_PARAMETERS:
+            setattr(self, name, np.array(np.broadcast_to(np.asarray(parameters[name], dtype=np.float64),
+                                                         (num_envs,))))
+        self.parameter_sampler = parameter_sampler
+
+        self.single_action_space = spaces.Box(
+            low=self.min_action.min(),
+            high=self.max_action.max(),
+            shape=(1,),
+            dtype=np.float32
+        )
+        self.single_observation_space = self._make_single_observation_space()
+        self.action_space = spaces.Box(
+            low=self.min_action[:, None],
+            high=self.max_action[:, None],
+            dtype=np.float32
+        )
+        self.observation_space = spaces.Box(
+            low=np.tile(self.single_observation_space.low, (num_envs, 1)),
+            high=np.tile(self.single_observation_space.high, (num_envs, 1)),
+            dtype=self.obs_dtype
+        )
+
+        self.position = np.zeros(num_envs)
+        self.velocity = np.zeros(num_envs)
+        self.direction = np.zeros(num_envs)
+        self.heaven_position = np.ones(num_envs)
+        self.hell_position = -self.heaven_position
+
+        self._rasterizer = None
+
+        self._init_episodes(max_episode_steps, auto_reset)
+        self.seed()
+        self.reset()
+
+    def _observation_values(self):
+        """The values the observations take, if there are only a few (see observation_dtype)."""
+        return DIRECTION_VALUES if self.variant.observation == 'direction' else None
+
+    def _make_single_observation_space(self):
+        if self.variant.observation == 'direction':
+            return spaces.Box(low=-1.0, high=1.0, shape=(1,), dtype=self.obs_dtype)
+        max_speed = self.max_speed.max()
+        return spaces.Box(
+            low=np.array([self.min_position, -max_speed, -1.0], dtype=np.float32),
+            high=np.array([self.max_position, max_speed, 1.0], dtype=np.float32),
+            dtype=self.obs_dtype
+        )
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, -1)
+
+        force = np.clip(actions[:, 0], self.min_action, self.max_action)
+        advance(self.position, self.velocity, force, self.power, self.max_speed,
+                self.min_position, self.max_position)
+
+        reward, dones = reward_done(self.position, self.heaven_position, self.hell_position,
+                                    self.variant.reward_scale, self.variant.terminates)
+
+        if self.variant.priest_reveals:
+            self.direction[:] = priest_direction(self.position, self.heaven_position, self.hell_position,
+                                                 self.priest_position, self.priest_delta)
+        else:
+            self.direction[:] = 0.0
+
+        return self._finish_step(self._get_obs(), reward, dones)
+
+    def reset(self, mask=None):
+        """Reset all lanes, or only the lanes selected by a boolean mask of shape [N]."""
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        mask = np.asarray(mask, dtype=bool)
+        n = int(mask.sum())
+        self._reset_episodes(mask)
+        if self.parameter_sampler is not None:
+            self._sample_parameters(mask, n)
+
+        self.position[mask] = self._start_positions(mask, n)
+        self.velocity[mask] = 0.0
+
+        # Randomize the heaven/hell location
+        heaven_on_right = self.np_random.randint(2, size=n) == 0
+        right_flag = self.right_flag[mask]
+        left_flag = self.left_flag[mask]
+        self.heaven_position[mask] = np.where(heaven_on_right, right_flag, left_flag)
+        self.hell_position[mask] = np.where(heaven_on_right, left_flag, right_flag)
+
+        if self.variant.reveal_on_reset:
+            self.direction[mask] = heaven_direction(self.heaven_position[mask], self.hell_position[mask])
+        else:
+            self.direction[mask] = 0.0
+
+        return self._get_obs()
+
+    def _start_positions(self, mask, n):
+        """Start positions of the n lanes in mask."""
+        if self.variant.random_start:
+            return self.np_random.uniform(low=-0.2, high=0.2, size=n)
+        return np.zeros(n)
+
+    def _sample_parameters(self, mask, n):
+        """Draws new lane parameters for the lanes in mask from parameter_sampler."""
+        for name, values in self.parameter_sampler(self.np_random, n).items():
+            if name not in LANE_PARAMETERS:
+                raise ValueError('parameter_sampler returned unknown lane parameter {!r}'.format(name))
+            # In place, so that the arrays handed out (e.g. to policies) stay current.
+            getattr(self, name)[mask] = values
+        self.action_space.low[mask, 0] = self.min_action[mask]
+        self.action_space.high[mask, 0] = self.max_action[mask]
+
+    def _get_obs(self):
+        if self.variant.observation == 'direction':
+            return self.direction[:, None].astype(self.obs_dtype)
+        obs = np.empty((self.num_envs, 3), dtype=self.obs_dtype)
+        obs[:, 0] = self.position
+        obs[:, 1] = self.velocity
+        obs[:, 2] = self.direction
+        return obs
+
+    def _observed_direction(self):
+        return self.direction
+
+    def render(self, mode='rgb_array'):
+        if mode != 'rgb_array':
+            raise ValueError('unsupported render mode: {!r}'.format(mode))
+        if self._rasterizer is None:
+            from gym_custom.envs.pomdp_mountain_car_raster import MountainCarRasterizer
+            self._rasterizer = MountainCarRasterizer(self.min_position, self.max_position,
+                                                     self.variant.priest_position)
+        return self._rasterizer.render_batch(self.position, self.heaven_position, self._observed_direction(),
+                                             right_flags=self.right_flag, left_flags=self.left_flag,
+                                             priest_positions=self.priest_position)
+
+    def close(self):
+        pass
+
+
+class ContinuousMountainCarPomdpOptLowerVecEnv(ContinuousMountainCarPomdpVecEnv):
+
+    """
+    Batched ContinuousMountainCarPomdpOptLowerEnv. The actions are the target
+    positions and the observations, of shape [N, 2 * history_length], are built for all lanes at
+    once from an [N, history_length] grid of interpolated positions. Of the lane
+    parameters, power, max_speed and the action bounds play no part (the targets
+    are not clipped, as in the scalar env).
+    """
+
+    def __init__(self, num_envs=1, history_length=10, crossing='sampled', max_episode_steps=None,
+                 auto_reset=False, parameters=None, parameter_sampler=None, obs_dtype=None):
+        self.num_obs_to_concatenate = history_length
+        self._steps = lower_level_steps(history_length)
+        self._lower_level_observation = LOWER_LEVEL_OBSERVATIONS[crossing]
+        self.history = History(history_length, shape=(2,), dtype=observation_dtype(obs_dtype), num_envs=num_envs)
+        self._points = np.empty((num_envs, history_length, 2))
+        self._flat_points = self._points.reshape(num_envs, -1)
+        super().__init__(num_envs, variant=OPT_LOWER, max_episode_steps=max_episode_steps,
+                         auto_reset=auto_reset, parameters=parameters, parameter_sampler=parameter_sampler,
+                         obs_dtype=obs_dtype)
+
+    def _make_single_observation_space(self):
+        single_obs_min = [self.min_position, -1.0]  # -1 for direction bit
+        single_obs_max = [self.max_position,  1.0]
+        return spaces.Box(
+            low=np.array(single_obs_min * self.num_obs_to_concatenate, dtype=np.float32),
+            high=np.array(single_obs_max * self.num_obs_to_concatenate, dtype=np.float32),
+            dtype=self.obs_dtype
+        )
+
+    def step(self, actions):
+        position = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, -1)[:, 0]
+
+        self._lower_level_observation(self.position, position, self.heaven_position, self.hell_position,
+                                      self.priest_position, self.priest_delta, self._steps, self._flat_points)
+        self.history.extend(self._points)
+        self.position[:] = position
+
+        reward, dones = reward_done(self.position, self.heaven_position, self.hell_position,
+                                    self.variant.reward_scale, self.variant.terminates)
+
+        return self._finish_step(self.history.flat(copy=True), reward, dones)
+
+    def reset(self, mask=None):
+        super().reset(mask)
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        mask = np.asarray(mask, dtype=bool)
+
+        # zeros, then the start position with no direction
+        self.history.reset(np.stack([self.position[mask], np.zeros(int(mask.sum()))], axis=1), mask)
+        return self.history.flat(copy=True)
+
+    def _observed_direction(self):
+        return priest_direction(self.position, self.heaven_position, self.hell_position,
+                                self.priest_position, self.priest_delta)
+
+
+class ContinuousMountainCarPomdpMixedVecEnv(ContinuousMountainCarPomdpVecEnv):
+
+    """
+    Lanes of different variants (e.g. pomdp-mountain-car-v0, -easy-v0, -episodic-v0
+    and -episodic-easy-v0 side by side) in one vector env, stepped together by the
+    same kernels. `variants` lists the variants (MountainCarVariant or preset names)
+    assigned to the lanes in turn: lane i runs variants[(first_lane + i) %
+    len(variants)], so the default of one lane per preset becomes an even mix for
+    any num_envs. first_lane is the index of lane 0 in a larger batch split over
+    several envs (SharedMemoryVecEnv passes it to the env of every worker).
+
+    Lane i of a variant behaves as lane i of the vector env of that variant. The
+    variants differ only in constants (the lane parameters of the base class),
+    reward scale, termination and what is observed, which are per-lane arrays here.
+    Observations are padded to the common shape [N, 3]: direction-only lanes give
+    (0, 0, direction), so the last column is the direction in every lane.
+    lane_variant [N] indexes each lane's variant in self.variants (the distinct
+    variants, in the order of `variants`), and is returned
+    in info['variant'] by every step. max_episode_steps may be a dict from preset
+    name (or variant) to steps, e.g. {'episodic': 200, 'episodic-easy': 15}; lanes
+    of the variants left out are never truncated. float16 or int8 observations
+    (obs_dtype) need every lane to be direction-only.
+    """
+
+    def __init__(self, num_envs=None, variants=tuple(VARIANTS), max_episode_steps=None, auto_reset=False,
+                 parameters=None, parameter_sampler=None, obs_dtype=None, first_lane=0):
+        if isinstance(variants, str):
+            variants = [variants]
+        self._variant_list = [get_variant(variant) for variant in variants]
+        self.first_lane = first_lane
+        self.variants = tuple(dict.fromkeys(self._variant_list))
+        num_envs = len(self._variant_list) if num_envs is None else num_envs
+        self.lane_variant = self.lane_layout(num_envs, first_lane)
+        self.lane_variant.flags.writeable = False
+        lane_variants = [self.variants[index] for index in self.lane_variant]
+
+        def per_lane(field, dtype):
+            return np.array([getattr(variant, field) for variant in self.variants], dtype=dtype)[self.lane_variant]
+
+        self.reward_scale = per_lane('reward_scale', np.float64)
+        self.terminates = per_lane('terminates', bool)
+        self.priest_reveals = per_lane('priest_reveals', bool)
+        self.reveal_on_reset = per_lane('reveal_on_reset', bool)
+        self.random_start = per_lane('random_start', bool)
+        self.full_observation = np.array([variant.observation == 'full' for variant in lane_variants])
+
+        lane_parameters = {name: np.array([default_parameters(variant)[name] for variant in lane_variants])
+                           for name in LANE_PARAMETERS}
+        lane_parameters.update(parameters or {})
+
+        if isinstance(max_episode_steps, dict):
+            steps = {get_variant(variant): limit for variant, limit in max_episode_steps.items()}
+            max_episode_steps = np.array([steps.get(variant, np.inf) for variant in lane_variants])
+
+        # The base class uses the variant for the observation space (full) and render.
+        super().__init__(num_envs, variant=DEFAULT, max_episode_steps=max_episode_steps, auto_reset=auto_reset,
+                         parameters=lane_parameters, parameter_sampler=parameter_sampler, obs_dtype=obs_dtype)
+
+    def lane_layout(self, num_envs, first_lane=0):
+        """The index in self.variants of the variant of every lane of a batch of num_envs lanes."""
+        variants = [self.variants.index(variant) for variant in self._variant_list]
+        return np.array([variants[(first_lane + i) % len(variants)] for i in range(num_envs)], dtype=np.int64)
+
+    def _observation_values(self):
+        return None if self.full_observation.any() else DIRECTION_VALUES
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, -1)
+
+        force = np.clip(actions[:, 0], self.min_action, self.max_action)
+        advance(self.position, self.velocity, force, self.power, self.max_speed,
+                self.min_position, self.max_position)
+
+        reward, dones = reward_done(self.position, self.heaven_position, self.hell_position, 1.0, True)
+        reward *= self.reward_scale
+        dones &= self.terminates
+
+        self.direction[:] = priest_direction(self.position, self.heaven_position, self.hell_position,
+                                             self.priest_position, self.priest_delta)
+        self.direction[~self.priest_reveals] = 0.0
+
+        obs, reward, dones, info = self._finish_step(self._get_obs(), reward, dones)
+        info['variant'] = self.lane_variant
+        return obs, reward, dones, info
+
+    def reset(self, mask=None):
+        """Reset all lanes, or only the lanes selected by a boolean mask of shape [N]."""
+        super().reset(mask)
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        mask = np.asarray(mask, dtype=bool)
+
+        # The base class resets as the default variant, which keeps the direction hidden.
+        reveal = mask & self.reveal_on_reset
+        self.direction[reveal] = heaven_direction(self.heaven_position[reveal], self.hell_position[reveal])
+        return self._get_obs()
+
+    def _start_positions(self, mask, n):
+        # The same draws as the vector env of each variant.
+        positions = np.zeros(n)
+        random_start = self.random_start[mask]
+        positions[random_start] = self.np_random.uniform(low=-0.2, high=0.2, size=int(random_start.sum()))
+        return positions
+
+    def _get_obs(self):
+        obs = super()._get_obs()
+        obs[~self.full_observation, :2] = 0
+        return obs
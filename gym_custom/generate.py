@@ -0,0 +1,238 @@
+"""
+Generates offline datasets of gym_custom transitions in parallel.
+
+    gym-custom-generate pomdp-mountain-car-v0 --policy scripted --episodes 1000000 --out data/mc
+    python -m gym_custom.generate heaven-hell-onehot-ls-v0 --policy random --episodes 100000 --out data/hh
+
+Every worker process runs its share of the episodes on a batch of lanes (the
+vector env of the id when there is one) and records them with its own
+ShardedRecorder in <out>/worker_XXX, so the shards are written in parallel.
+Worker i seeds its env and policy from the i-th child of SeedSequence(--seed),
+so a dataset is reproducible for a given seed and number of workers.
+<out>/dataset.json lists the workers' datasets; load_dataset reads them back.
+
+The recorded fields are observations, actions, rewards, dones, heaven,
+next_observations and timeouts (episodes cut by --max-episode-steps have
+timeouts=True and dones=False on their last transition).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import numpy as np
+
+import gym
+
+from gym_custom.seeds import spawn, spawn_seeds
+
+
+# Vector env (id and kwargs) stepping many episodes of a single-env id at once.
+VECTOR_IDS = {
+    'pomdp-mountain-car-v0': ('pomdp-mountain-car-vec-v0', {'variant': 'default'}),
+    'pomdp-mountain-car-easy-v0': ('pomdp-mountain-car-vec-v0', {'variant': 'easy'}),
+    'pomdp-mountain-car-episodic-v0': ('pomdp-mountain-car-vec-v0', {'variant': 'episodic'}),
+    'pomdp-mountain-car-episodic-easy-v0': ('pomdp-mountain-car-vec-v0', {'variant': 'episodic-easy'}),
+    'pomdp-mountain-car-opt-lower-v0': ('pomdp-mountain-car-opt-lower-vec-v0', {}),
+    'heaven-hell-onehot-ls-v0': ('heaven-hell-onehot-ls-vec-v0', {}),
+}
+
+# The episodic ids never terminate on their own (see README and test_scripts), and
+# a Heaven Hell robot walking into a wall (e.g. under a constant policy) never does.
+MAX_EPISODE_STEPS = {
+    'pomdp-mountain-car-episodic-v0': 200,
+    'pomdp-mountain-car-episodic-easy-v0': 15,
+    'heaven-hell-onehot-ls-v0': 1000,
+}
+
+MANIFEST_FILE = 'dataset.json'
+
+
+class _SingleLane(object):
+
+    """A single env behind the interface of the vector envs, for ids without one."""
+
+    def __init__(self, env):
+        self.env = env
+        self.num_envs = 1
+        self.unwrapped = env.unwrapped
+        self.single_observation_space = env.observation_space
+        self.single_action_space = env.action_space
+        self.observation_space = env.observation_space
+        self.action_space = env.action_space
+
+    def seed(self, seed=None):
+        return self.env.seed(seed)
+
+    def reset(self, mask=None):
+        return np.asarray(self.env.reset())[None]
+
+    def step(self, actions):
+        obs, reward, done, info = self.env.step(actions[0])
+        return np.asarray(obs)[None], np.array([reward]), np.array([done]), info
+
+
+def _make_lanes(env_id, num_lanes):
+    env_id = env_id.split(':')[-1]
+    if env_id in VECTOR_IDS:
+        vector_id, kwargs = VECTOR_IDS[env_id]
+        return gym.make(vector_id, num_envs=num_lanes, **kwargs)
+    env = gym.make(env_id)
+    if hasattr(env.unwrapped, 'num_envs'):
+        return gym.make(env_id, num_envs=num_lanes)
+    return _SingleLane(env)
+
+
+def _worker(worker, env_id, policy_name, policy_value, num_episodes, seed_sequence, directory, num_lanes,
+            max_episode_steps, shard_size, progress):
+    import gym_custom  # registers the ids in spawned workers
+    from gym_custom.policies import make_policy
+    from gym_custom.recorder import ShardedRecorder, heaven_side
+
+    env_seed, policy_seed = spawn_seeds(seed_sequence, 2)
+    env = _make_lanes(env_id, min(num_lanes, num_episodes))
+    env.seed(env_seed)
+    num_lanes = env.num_envs
+    policy = make_policy(policy_name, env, num_lanes, policy_seed, policy_value)
+    recorder = ShardedRecorder.for_env(directory, env, shard_size=shard_size, next_observations=True, timeouts=True)
+
+    # Lanes stop recording once every episode of this worker has been started.
+    active = np.arange(num_lanes) < num_episodes
+    started = int(active.sum())
+    lengths = np.zeros(num_lanes, dtype=int)
+    rows = episodes = 0
+    last_report = time.time()
+
+    obs = env.reset()
+    while active.any():
+        actions = policy(obs)
+        heaven = heaven_side(env)
+        next_obs, rewards, dones, _ = env.step(actions)
+        dones = np.asarray(dones, dtype=bool).reshape(num_lanes)
+        lengths += 1
+        timeouts = (lengths >= max_episode_steps) & ~dones if max_episode_steps else np.zeros(num_lanes, bool)
+
+        recorder.add_batch(obs[active], actions[active], np.asarray(rewards).reshape(num_lanes)[active],
+                           dones[active], np.broadcast_to(heaven, (num_lanes,))[active],
+                           next_observations=next_obs[active], timeouts=timeouts[active])
+        rows += int(active.sum())
+
+        ended = dones | timeouts
+        if ended.any():
+            episodes += int((ended & active).sum())
+            # Finished lanes start one of the remaining episodes, if any.
+            for lane in np.flatnonzero(ended & active):
+                if started < num_episodes:
+                    started += 1
+                else:
+                    active[lane] = False
+            lengths[ended] = 0
+            policy.reset(ended)
+            next_obs = np.array(next_obs)
+            next_obs[ended] = env.reset(ended)[ended]
+        obs = next_obs
+
+        if time.time() - last_report > 0.5:
+            progress.put((worker, rows, episodes))
+            rows = episodes = 0
+            last_report = time.time()
+
+    recorder.close()
+    progress.put((worker, rows, episodes))
+    progress.put((worker, None, None))
+
+
+def generate(env_id, out, policy='random', num_episodes=1000, num_workers=None, seed=0, lanes_per_worker=1024,
+             max_episode_steps=None, shard_size=1000000, policy_value=None, verbose=True, context=None):
+    """Writes num_episodes episodes of env_id to the directory out; returns the total number of transitions."""
+    env_id = env_id.split(':')[-1]
+    if max_episode_steps is None:
+        max_episode_steps = MAX_EPISODE_STEPS.get(env_id)
+    num_workers = max(1, min(num_workers or os.cpu_count() or 1, num_episodes))
+    episodes_per_worker = [len(chunk) for chunk in np.array_split(np.arange(num_episodes), num_workers)]
+    seeds = spawn(seed, num_workers)
+
+    os.makedirs(out, exist_ok=True)
+    parts = ['worker_{:03d}'.format(i) for i in range(num_workers)]
+    with open(os.path.join(out, MANIFEST_FILE), 'w') as f:
+        json.dump({'env_id': env_id, 'policy': policy, 'episodes': num_episodes, 'seed': seed,
+                   'max_episode_steps': max_episode_steps, 'parts': parts}, f, indent=1)
+
+    context = multiprocessing.get_context(context)
+    progress = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(i, env_id, policy, policy_value, episodes_per_worker[i], seeds[i],
+                                              os.path.join(out, parts[i]), lanes_per_worker, max_episode_steps,
+                                              shard_size, progress), daemon=True)
+        for i in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+
+    start = time.time()
+    running = set(range(num_workers))
+    total_rows = total_episodes = 0
+    last_print = start
+    while running:
+        try:
+            worker, rows, episodes = progress.get(timeout=1.0)
+        except queue.Empty:
+            dead = [i for i in running if not processes[i].is_alive()]
+            if dead:
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError('Dataset worker {} died (exit code {})'.format(dead[0], processes[dead[0]].exitcode))
+            continue
+        if rows is None:
+            running.discard(worker)
+        else:
+            total_rows += rows
+            total_episodes += episodes
+        now = time.time()
+        if verbose and (now - last_print > 1.0 or not running):
+            print('{:12d} transitions {:10d}/{} episodes {:12.0f} transitions/s'.format(
+                total_rows, total_episodes, num_episodes, total_rows / max(now - start, 1e-9)))
+            sys.stdout.flush()
+            last_print = now
+    for process in processes:
+        process.join()
+    return total_rows
+
+
+def load_dataset(directory):
+    """The shards of all the workers of a generated dataset (see recorder.load_shards)."""
+    from gym_custom.recorder import load_shards
+
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    return [shard for part in manifest['parts'] for shard in load_shards(os.path.join(directory, part))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('env_id')
+    parser.add_argument('--policy', choices=['random', 'constant', 'scripted'], default='random')
+    parser.add_argument('--value', type=float, default=None,
+                        help='action of the constant policy (default: the largest force/target, or action 0)')
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--workers', type=int, default=None, help='default: one per CPU')
+    parser.add_argument('--lanes', type=int, default=1024, help='envs stepped together by each worker')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-episode-steps', type=int, default=None,
+                        help='default: 200 for pomdp-mountain-car-episodic-v0, 15 for -episodic-easy-v0, '
+                             '1000 for heaven-hell-onehot-ls-v0')
+    parser.add_argument('--shard-size', type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    generate(args.env_id, args.out, policy=args.policy, num_episodes=args.episodes, num_workers=args.workers,
+             seed=args.seed, lanes_per_worker=args.lanes, max_episode_steps=args.max_episode_steps,
+             shard_size=args.shard_size, policy_value=args.value)
+
+
+if __name__ == '__main__':
+    main()
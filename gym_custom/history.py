@@ -0,0 +1,150 @@
+"""
+Observation history of a fixed length, kept in a circular buffer.
+
+Every row is written twice, `length` rows apart, so the last `length` rows are
+always the contiguous slice [index, index + length) of the buffer: a push writes
+two rows whatever the length, and a window is a view of the buffer, not a copy.
+The same object holds one history or a batch of N histories that advance together
+(e.g. the lanes of a vector env).
+
+    history = History(10, shape=(11,), num_envs=N, fill=-1.0)
+    history.reset(first_obs)            # [N, 11]; reset(obs, mask) for some lanes
+    history.push(obs)                   # [N, 11]
+    obs = history.flat()                # [N, 110] read-only view, oldest first
+"""
+
+import numpy as np
+
+
+class History(object):
+
+    """
+    The last `length` observations of shape `shape`, for one env or for `num_envs`
+    lanes, in a buffer of the given dtype. Before the first observations the history
+    holds `fill`.
+
+    window, flat and the other accessors return read-only views that the next
+    push/reset overwrites, or copies with copy=True.
+    """
+
+    def __init__(self, length, shape=(), dtype=np.float32, num_envs=None, fill=0.0):
+        if length < 1:
+            raise ValueError('length must be at least 1, got {}'.format(length))
+        self.length = length
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.num_envs = num_envs
+        self.fill = fill
+
+        batch = () if num_envs is None else (num_envs,)
+        self.buffer = np.full(batch + (2 * length,) + self.shape, fill, dtype=self.dtype)
+        # Row of the oldest observation, and of the next one written.
+        self.index = 0
+        # Read-only views of the full window/flat window for every index, made on
+        # first use, so that reading the history does not allocate.
+        self._windows = [None] * length
+        self._flats = [None] * length
+
+    def _rows(self):
+        """The buffer with the row axis first (a view)."""
+        return self.buffer if self.num_envs is None else self.buffer.swapaxes(0, 1)
+
+    def reset(self, first=None, mask=None):
+        """
+        Clears the history (of the lanes selected by the boolean mask, if given) and,
+        if first is given, makes it the newest observation.
+        """
+        length = self.length
+        newest = (self.index - 1) % length
+        if self.num_envs is None or mask is None:
+            self.buffer.fill(self.fill)
+            if first is not None:
+                rows = self._rows()
+                rows[newest] = first
+                rows[newest + length] = first
+            return
+
+        mask = np.asarray(mask, dtype=bool)
+        self.buffer[mask] = self.fill
+        if first is not None:
+            first = np.asarray(first)
+            if first.shape[:1] == (self.num_envs,):
+                first = first[mask]
+            self.buffer[mask, newest] = first
+            self.buffer[mask, newest + length] = first
+
+    def push(self, obs):
+        """Appends one observation (of shape [N, *shape] for a batch), dropping the oldest."""
+        index = self.index
+        rows = self._rows()
+        rows[index] = obs
+        rows[index + self.length] = obs
+        self.index = (index + 1) % self.length
+
+    def extend(self, observations):
+        """Appends k observations at once: [k, *shape], or [N, k, *shape] for a batch."""
+        observations = np.asarray(observations)
+        if self.num_envs is not None:
+            observations = observations.swapaxes(0, 1)
+        count = len(observations)
+        length = self.length
+        rows = self._rows()
+        if count >= length:
+            # With index 0 the window is the first half. The second half needs no copy:
+            # row length + i is only read once the index has passed i, i.e. after the
+            # push that writes it.
+            rows[:length] = observations[count - length:]
+            self.index = 0
+            return
+        positions = (self.index + np.arange(count)) % length
+        rows[positions] = observations
+        rows[positions + length] = observations
+        self.index = (self.index + count) % length
+
+    def window(self, size=None, copy=False):
+        """
+        The last `size` (default: length) observations, oldest first:
+        [size, *shape], or [N, size, *shape] for a batch.
+        """
+        if size is None and not copy:
+            window = self._windows[self.index]
+            if window is None:
+                window = self._windows[self.index] = self.window(self.length)
+            return window
+        size = self.length if size is None else size
+        if not 0 < size <= self.length:
+            raise ValueError('size must be between 1 and {}, got {}'.format(self.length, size))
+        stop = self.index + self.length
+        if self.num_envs is None:
+            window = self.buffer[stop - size:stop]
+        else:
+            window = self.buffer[:, stop - size:stop]
+        if copy:
+            return window.copy()
+        window = window.view()
+        window.flags.writeable = False
+        return window
+
+    def flat(self, size=None, copy=False):
+        """window() with the observations concatenated: [size * obs_size], or [N, size * obs_size]."""
+        if size is None and not copy:
+            flat = self._flats[self.index]
+            if flat is None:
+                flat = self._flats[self.index] = self.flat(self.length)
+            return flat
+        window = self.window(size)
+        if self.num_envs is None:
+            flat = window.reshape(-1)
+        else:
+            flat = window.reshape(self.num_envs, -1)
+        return flat.copy() if copy else flat
+
+    def newest(self, copy=False):
+        """The last observation: [*shape], or [N, *shape] for a batch."""
+        newest = (self.index - 1) % self.length
+        row = self.buffer[newest] if self.num_envs is None else self.buffer[:, newest]
+        if copy:
+            return row.copy()
+        row = row.view()
+        row.flags.writeable = False
+        return row
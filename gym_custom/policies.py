@@ -0,0 +1,152 @@
+"""
+Reference policies for the gym_custom envs, used by the benchmarks and the dataset tools.
+
+Every policy acts on a batch: __call__ takes observations of shape [N, ...] and
+returns actions of shape [N, ...], and reset(mask) is called for the lanes whose
+episode starts over. make_policy builds the right one for an env.
+"""
+
+import numpy as np
+
+from gym import spaces
+
+
+class RandomPolicy(object):
+
+    def __init__(self, action_space, num_envs=1, seed=None):
+        self.action_space = action_space
+        self.num_envs = num_envs
+        self.np_random = np.random.RandomState(seed)
+
+    def reset(self, mask=None):
+        pass
+
+    def __call__(self, obs):
+        if isinstance(self.action_space, spaces.Discrete):
+            return self.np_random.randint(self.action_space.n, size=self.num_envs)
+        low = np.broadcast_to(self.action_space.low, (self.num_envs,) + self.action_space.shape)
+        high = np.broadcast_to(self.action_space.high, (self.num_envs,) + self.action_space.shape)
+        return self.np_random.uniform(low, high).astype(self.action_space.dtype)
+
+
+class ConstantPolicy(object):
+
+    """Always the same action: a force/target position for Box actions, an action index for Discrete ones."""
+
+    def __init__(self, action_space, value, num_envs=1):
+        self.num_envs = num_envs
+        if isinstance(action_space, spaces.Discrete):
+            self.action = np.full(num_envs, int(value))
+        else:
+            self.action = np.full((num_envs,) + action_space.shape, value, dtype=action_space.dtype)
+
+    def reset(self, mask=None):
+        pass
+
+    def __call__(self, obs):
+        return self.action.copy()
+
+
+class _DirectionMemory(object):
+
+    """Remembers, per lane, the last non-zero direction the priest gave (0 while unknown)."""
+
+    def __init__(self, num_envs):
+        self.direction = np.zeros(num_envs)
+
+    def reset(self, mask=None):
+        if mask is None:
+            self.direction[:] = 0.0
+        else:
+            self.direction[np.asarray(mask, dtype=bool)] = 0.0
+
+    def _remember(self, seen):
+        self.direction = np.where(seen != 0, seen, self.direction)
+
+
+class MountainCarScriptedPolicy(_DirectionMemory):
+
+    """Full force towards the priest until the direction is known, then towards heaven."""
+
+    def __init__(self, env, num_envs=1):
+        super().__init__(num_envs)
+        env = env.unwrapped
+        self.priest_position = env.priest_position
+        self.max_action = env.max_action
+        self.full_observation = env.variant.observation == 'full'
+
+    def __call__(self, obs):
+        obs = np.asarray(obs).reshape(len(self.direction), -1)
+        self._remember(obs[:, -1])
+        to_priest = np.sign(self.priest_position - obs[:, 0]) if self.full_observation else 0.0
+        target = np.where(self.direction != 0, self.direction, to_priest)
+        return (target * self.max_action)[:, None]
+
+
+class TargetPositionScriptedPolicy(_DirectionMemory):
+
+    """For the opt-lower envs: go to the priest, then to heaven."""
+
+    def __init__(self, env, num_envs=1):
+        super().__init__(num_envs)
+        env = env.unwrapped
+        self.priest_position = env.priest_position
+        self.max_action = env.max_position
+
+    def __call__(self, obs):
+        obs = np.asarray(obs).reshape(len(self.direction), -1)
+        directions = obs[:, 1::2]
+        self._remember(directions[np.arange(len(directions)), np.abs(directions).argmax(axis=1)])
+        target = np.where(self.direction != 0, self.direction * self.max_action, self.priest_position)
+        return target[:, None]
+
+
+class HeavenHellScriptedPolicy(_DirectionMemory):
+
+    """Walks to the priest (0, 7, 8, 9), back up to 2 and then towards heaven."""
+
+    N, S, E, W = range(4)
+    # Action per location while heaven is unknown, on the left and on the right.
+    UNKNOWN = np.array([S, S, S, E, E, W, W, E, E, W])
+    LEFT = np.array([N, N, W, W, W, W, W, N, W, W])
+    RIGHT = np.array([N, N, E, E, E, E, E, N, W, W])
+
+    def __init__(self, env, num_envs=1):
+        super().__init__(num_envs)
+
+    def __call__(self, obs):
+        obs = np.asarray(obs).reshape(len(self.direction), -1)
+        current = obs[:, -11:]
+        self._remember(current[:, -1])  # 1 for heaven on the left, -1 on the right
+        location = current[:, :-1].argmax(axis=1)
+        return np.where(self.direction > 0, self.LEFT[location],
+                        np.where(self.direction < 0, self.RIGHT[location], self.UNKNOWN[location]))
+
+
+def _single_action_space(env):
+    return getattr(env.unwrapped, 'single_action_space', env.action_space)
+
+
+def make_policy(name, env, num_envs=1, seed=None, value=None):
+    """
+    name is 'random', 'constant' (the action `value`, by default the largest force
+    or target position, or action 0) or 'scripted'; env is any gym_custom env
+    (single or vector) that the policy's observations come from, used to read its
+    constants.
+    """
+    action_space = _single_action_space(env)
+    if name == 'random':
+        return RandomPolicy(action_space, num_envs, seed)
+    if name == 'constant':
+        if value is None:
+            value = 0 if isinstance(action_space, spaces.Discrete) else action_space.high.flat[0]
+        return ConstantPolicy(action_space, value, num_envs)
+    if name != 'scripted':
+        raise ValueError('Unknown policy {!r}'.format(name))
+
+    if isinstance(action_space, spaces.Discrete):
+        return HeavenHellScriptedPolicy(env, num_envs)
+    # The opt-lower envs, whose actions are target positions, concatenate a history.
+    if hasattr(env.unwrapped, 'num_obs_to_concatenate') or hasattr(env.unwrapped, 'concatenated_obs_dim'):
+        return TargetPositionScriptedPolicy(env, num_envs)
+    return MountainCarScriptedPolicy(env, num_envs)
@@ -0,0 +1,310 @@
+"""
+Step-level timing and allocation instrumentation for the gym_custom envs.
+
+ProfiledEnv wraps any env (single, vector or SharedMemoryVecEnv) and records:
+- a latency histogram for every step/reset/render call;
+- latency histograms for the internal parts of the step that the env exposes as
+  methods (observation construction, reward logic, priest direction, flags, ...),
+  and for the unwrapped step when the env is itself wrapped (e.g. in a TimeLimit),
+  so that step minus env.step is the wrapper overhead;
+- optionally (track_allocations=True, uses tracemalloc and is slow) the net and
+  peak bytes allocated per step;
+- step, reset and episode counters.
+
+A snapshot is a plain dict (JSON-serializable); export writes it to a file and a
+callback can receive one every report_every steps and on close. With enabled=False
+the wrapper only forwards calls.
+
+    env = ProfiledEnv(TimeLimit(gym.make('gym_custom:pomdp-mountain-car-episodic-v0'), 200),
+                      path='profile.json', report_every=10000)
+"""
+
+import bisect
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+import gym
+
+
+# Methods of the unwrapped env that are timed when present.
+SECTIONS = (
+    '_get_obs',
+    '_reward_done',
+    '_priest_direction',
+    '_write_state',
+    '_reset_heaven',
+    '_lower_level_observation',
+    'draw_flags',
+    'push_to_memory',
+    '_get_memory_obs',
+)
+
+# Bucket upper edges: latencies from 100 ns to 10 s, allocations from 1 B to 1 GB.
+TIME_EDGES = np.geomspace(1e-7, 10.0, 71).tolist()
+BYTES_EDGES = np.geomspace(1.0, 1e9, 55).tolist()
+
+
+class Histogram(object):
+
+    """Counts per log-spaced bucket, plus the exact count, total, min and max."""
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)  # the last bucket is the overflow
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile (an upper bound)."""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.edges[i], self.max) if i < len(self.edges) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'edges': self.edges,
+            'counts': self.counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(list(data['edges']))
+        histogram.counts = list(data['counts'])
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min'] if data['count'] else float('inf')
+        histogram.max = data['max']
+        return histogram
+
+    def merge(self, other):
+        assert self.edges == other.edges
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+
+class Profiler(object):
+
+    """Histograms by name and counters; shared by ProfiledEnv and the workers of SharedMemoryVecEnv."""
+
+    def __init__(self):
+        self.timings = {}
+        self.allocations = {}
+        self.counters = {'steps': 0, 'resets': 0, 'episodes': 0, 'renders': 0}
+
+    def record_time(self, name, seconds):
+        histogram = self.timings.get(name)
+        if histogram is None:
+            histogram = self.timings[name] = Histogram(TIME_EDGES)
+        histogram.add(seconds)
+
+    def record_bytes(self, name, num_bytes):
+        histogram = self.allocations.get(name)
+        if histogram is None:
+            histogram = self.allocations[name] = Histogram(BYTES_EDGES)
+        histogram.add(num_bytes)
+
+    def timed(self, name, function):
+        """function, timed under name."""
+        clock = time.perf_counter
+        record_time = self.record_time
+
+        def timed_function(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record_time(name, clock() - start)
+
+        return timed_function
+
+    def snapshot(self):
+        return {
+            'time': time.time(),
+            'counters': dict(self.counters),
+            'timings': {name: histogram.to_dict() for name, histogram in self.timings.items()},
+            'allocations': {name: histogram.to_dict() for name, histogram in self.allocations.items()},
+        }
+
+
+def merge_snapshots(snapshots):
+    """One snapshot summing the counters and histograms of several (e.g. one per worker)."""
+    merged = Profiler()
+    for snapshot in snapshots:
+        for name, count in snapshot['counters'].items():
+            merged.counters[name] = merged.counters.get(name, 0) + count
+        for table, histograms in ((merged.timings, snapshot['timings']),
+                                  (merged.allocations, snapshot['allocations'])):
+            for name, data in histograms.items():
+                if name in table:
+                    table[name].merge(Histogram.from_dict(data))
+                else:
+                    table[name] = Histogram.from_dict(data)
+    return merged.snapshot()
+
+
+def export(snapshot, path):
+    with open(path, 'w') as f:
+        json.dump(snapshot, f, indent=2)
+
+
+def format_snapshot(snapshot):
+    """A short human-readable table of a snapshot."""
+    lines = ['  '.join('{}={}'.format(name, count) for name, count in sorted(snapshot['counters'].items()))]
+    for name, data in sorted(snapshot['timings'].items()):
+        lines.append('{:32s} n={:<9d} mean={:9.2f}us p50<={:9.2f}us p99<={:9.2f}us'.format(
+            name, data['count'], data['mean'] * 1e6, data['p50'] * 1e6, data['p99'] * 1e6))
+    for name, data in sorted(snapshot['allocations'].items()):
+        lines.append('{:32s} n={:<9d} mean={:9.0f}B  max={:9.0f}B'.format(
+            name, data['count'], data['mean'], data['max']))
+    return '\n'.join(lines)
+
+
+class ProfiledEnv(gym.Wrapper):
+
+    """
+    Records timings and counters for env, see the module docstring.
+
+    sections are method names of env.unwrapped to time (default: those of SECTIONS
+    the env has). path and callback receive a snapshot every report_every steps (if
+    given) and on close.
+    """
+
+    def __init__(self, env, enabled=True, sections=None, track_allocations=False,
+                 path=None, callback=None, report_every=None):
+        super().__init__(env)
+        self.profiler = Profiler()
+        self.track_allocations = track_allocations
+        self.path = path
+        self.callback = callback
+        self.report_every = report_every
+        self.sections = [name for name in (SECTIONS if sections is None else sections)
+                         if callable(getattr(env.unwrapped, name, None))]
+        self.enabled = False
+        self._patched = []
+        if enabled:
+            self.enable()
+        else:
+            self.disable()
+
+    def enable(self):
+        """Start recording; patches the timed sections onto the unwrapped env."""
+        if self.enabled:
+            return
+        for name in ('step', 'reset', 'render'):
+            self.__dict__.pop(name, None)
+        unwrapped = self.env.unwrapped
+        names = list(self.sections)
+        if unwrapped is not self.env:
+            names.append('step')
+        self._patched = []
+        for name in names:
+            label = 'env.step' if name == 'step' else name
+            # Some methods are instance attributes already (the opt-lower envs keep
+            # _lower_level_observation there); remember them to restore them.
+            self._patched.append((name, unwrapped.__dict__.get(name)))
+            setattr(unwrapped, name, self.profiler.timed(label, getattr(unwrapped, name)))
+        if self.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording; the env's own methods are restored."""
+        unwrapped = self.env.unwrapped
+        for name, original in self._patched:
+            if original is None:
+                delattr(unwrapped, name)
+            else:
+                setattr(unwrapped, name, original)
+        self._patched = []
+        # Calls then go straight to the wrapped env, without a frame of this wrapper.
+        self.step = self.env.step
+        self.reset = self.env.reset
+        self.render = self.env.render
+        self.enabled = False
+
+    def step(self, action):
+        profiler = self.profiler
+        if self.track_allocations:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        observation, reward, done, info = self.env.step(action)
+        profiler.record_time('step', time.perf_counter() - start)
+        if self.track_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            profiler.record_bytes('step.net', max(current - before, 0))
+            profiler.record_bytes('step.peak', max(peak - before, 0))
+
+        counters = profiler.counters
+        counters['steps'] += 1
+        counters['episodes'] += int(np.count_nonzero(done))
+        if self.report_every and counters['steps'] % self.report_every == 0:
+            self.report()
+        return observation, reward, done, info
+
+    def reset(self, *args, **kwargs):
+        # The vector envs take the mask of the lanes to reset.
+        start = time.perf_counter()
+        observation = self.env.reset(*args, **kwargs)
+        self.profiler.record_time('reset', time.perf_counter() - start)
+        self.profiler.counters['resets'] += 1
+        return observation
+
+    def render(self, mode='human', **kwargs):
+        start = time.perf_counter()
+        frame = self.env.render(mode, **kwargs)
+        self.profiler.record_time('render', time.perf_counter() - start)
+        self.profiler.counters['renders'] += 1
+        return frame
+
+    def snapshot(self):
+        snapshot = self.profiler.snapshot()
+        spec = getattr(self.env, 'spec', None)
+        snapshot['env_id'] = spec.id if spec is not None else type(self.env.unwrapped).__name__
+        return snapshot
+
+    def report(self):
+        if self.path is None and self.callback is None:
+            return
+        snapshot = self.snapshot()
+        if self.path is not None:
+            export(snapshot, self.path)
+        if self.callback is not None:
+            self.callback(snapshot)
+
+    def close(self):
+        if self.enabled:
+            self.report()
+        return self.env.close()
+
@@ -0,0 +1,269 @@
+"""
+Streams transitions to fixed-size, memory-mapped NumPy shards.
+
+A dataset is a directory holding one sub-directory per shard, with one .npy file
+per field (observations, actions, rewards, dones, heaven and, optionally,
+next_observations and timeouts), and an index.json listing the shards and how many
+rows of each are valid:
+
+    dataset/
+        index.json
+        shard_00000/observations.npy  actions.npy  rewards.npy  dones.npy  heaven.npy
+        shard_00001/...
+
+The .npy files have their full size from the start and are written through a
+memory map, so recording never grows a Python list; when a shard is full it is
+flushed and unmapped in a background thread and the next one is opened, which
+keeps the memory use flat however long the collection runs. `heaven` is +1 when
+heaven is on the right and -1 when it is on the left (see heaven_side).
+
+    recorder = ShardedRecorder.for_env('dataset', env)
+    recorder.add(obs, action, reward, done, heaven_side(env))   # or add_batch for N lanes
+    recorder.close()
+
+    for shard in load_shards('dataset'):     # read-only memory maps, nothing is loaded
+        shard['observations'], shard['rewards'], ...
+
+Opening a recorder on an existing dataset resumes it after the rows recorded by
+the last flush (flush is called when a shard fills up, every flush_every rows and
+on close).
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from gym import spaces
+
+
+INDEX_FILE = 'index.json'
+
+
+def heaven_side(env):
+    """+1 where heaven is on the right and -1 where it is on the left, for any gym_custom env (a scalar or [N])."""
+    env = env.unwrapped
+    if hasattr(env, 'heaven_position'):
+        return np.where(np.asarray(env.heaven_position) > np.asarray(env.hell_position), 1, -1).astype(np.int8)
+    # Heaven Hell: heaven is on the left in states 0 to 9 (see heaven_hell_core).
+    from gym_custom.envs.heaven_hell_core import NUM_LOCATIONS
+    return np.where(np.asarray(env.state) < NUM_LOCATIONS, -1, 1).astype(np.int8)
+
+
+def _space_field(space):
+    if isinstance(space, spaces.Discrete):
+        return (), np.int64
+    return space.shape, space.dtype
+
+
+def _spec(shape, dtype):
+    return {'shape': list(shape), 'dtype': np.dtype(dtype).str}
+
+
+class ShardedRecorder(object):
+
+    """
+    Records transitions into `directory`, shard_size rows per shard.
+
+    observation_shape/dtype and action_shape/dtype describe one transition (use
+    for_env to read them from an env). With next_observations=True the observation
+    following each action is stored as well, which keeps the last observation of
+    episodes that are reset automatically. With timeouts=True a timeouts field marks
+    the transitions that end an episode by truncation (dones stays False on them).
+    With flush_async=False the shards are flushed in the calling thread.
+    """
+
+    def __init__(self, directory, observation_shape, observation_dtype, action_shape, action_dtype,
+                 shard_size=1000000, next_observations=False, timeouts=False, flush_every=None,
+                 flush_async=True):
+        fields = {
+            'observations': _spec(observation_shape, observation_dtype),
+            'actions': _spec(action_shape, action_dtype),
+            'rewards': _spec((), np.float32),
+            'dones': _spec((), np.bool_),
+            'heaven': _spec((), np.int8),
+        }
+        if next_observations:
+            fields['next_observations'] = _spec(observation_shape, observation_dtype)
+        if timeouts:
+            fields['timeouts'] = _spec((), np.bool_)
+
+        self.directory = directory
+        self.flush_every = flush_every
+        self._executor = ThreadPoolExecutor(max_workers=1) if flush_async else None
+        self._pending = []
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.index = json.load(f)
+            if self.index['fields'] != fields:
+                raise ValueError('{} holds a dataset with other fields: {}'.format(directory, self.index['fields']))
+            self.shard_size = self.index['shard_size']
+        else:
+            self.index = {'shard_size': shard_size, 'fields': fields, 'shards': []}
+            self.shard_size = shard_size
+
+        self._arrays = None
+        self._count = 0
+        self._since_flush = 0
+        shards = self.index['shards']
+        if shards and shards[-1]['count'] < self.shard_size:
+            self._open_shard(shards[-1]['name'], mode='r+')
+            self._count = shards[-1]['count']
+        else:
+            self._new_shard()
+
+    @classmethod
+    def for_env(cls, directory, env, **kwargs):
+        """A recorder for the transitions of env (single or vector: one row per lane)."""
+        env = env.unwrapped
+        observation_space = getattr(env, 'single_observation_space', env.observation_space)
+        action_space = getattr(env, 'single_action_space', env.action_space)
+        observation_shape, observation_dtype = _space_field(observation_space)
+        action_shape, action_dtype = _space_field(action_space)
+        return cls(directory, observation_shape, observation_dtype, action_shape, action_dtype, **kwargs)
+
+    @property
+    def num_rows(self):
+        """Rows recorded so far, in all shards."""
+        return sum(shard['count'] for shard in self.index['shards'][:-1]) + self._count
+
+    def _open_shard(self, name, mode):
+        path = os.path.join(self.directory, name)
+        os.makedirs(path, exist_ok=True)
+        self._arrays = {}
+        for field, spec in self.index['fields'].items():
+            self._arrays[field] = np.lib.format.open_memmap(
+                os.path.join(path, field + '.npy'), mode=mode, dtype=np.dtype(spec['dtype']),
+                shape=(self.shard_size,) + tuple(spec['shape']) if mode == 'w+' else None
+            )
+
+    def _new_shard(self):
+        name = 'shard_{:05d}'.format(len(self.index['shards']))
+        self._open_shard(name, mode='w+')
+        self._count = 0
+        with self._lock:
+            self.index['shards'].append({'name': name, 'count': 0})
+
+    def add(self, observation, action, reward, done, heaven, next_observation=None, timeout=None):
+        """Records one transition."""
+        if self._count == self.shard_size:
+            self._roll()
+        arrays = self._arrays
+        row = self._count
+        arrays['observations'][row] = observation
+        arrays['actions'][row] = action
+        arrays['rewards'][row] = reward
+        arrays['dones'][row] = done
+        arrays['heaven'][row] = heaven
+        if next_observation is not None:
+            arrays['next_observations'][row] = next_observation
+        if timeout is not None:
+            arrays['timeouts'][row] = timeout
+        self._count = row + 1
+        self._after_write(1)
+
+    def add_batch(self, observations, actions, rewards, dones, heaven, next_observations=None, timeouts=None):
+        """Records one transition per lane: arrays of N rows (heaven may be a scalar)."""
+        batch = {'observations': observations, 'actions': actions, 'rewards': rewards, 'dones': dones,
+                 'heaven': heaven}
+        if next_observations is not None:
+            batch['next_observations'] = next_observations
+        if timeouts is not None:
+            batch['timeouts'] = timeouts
+        size = len(rewards)
+        start = 0
+        while start < size:
+            if self._count == self.shard_size:
+                self._roll()
+            stop = min(size, start + self.shard_size - self._count)
+            row = self._count
+            for field, values in batch.items():
+                values = np.asarray(values)
+                self._arrays[field][row:row + stop - start] = values[start:stop] if values.ndim else values
+            self._count = row + stop - start
+            start = stop
+        self._after_write(size)
+
+    def _after_write(self, num_rows):
+        if self.flush_every is not None:
+            self._since_flush += num_rows
+            if self._since_flush >= self.flush_every:
+                self.flush()
+
+    def _submit(self, function, *args):
+        if self._executor is None:
+            function(*args)
+        else:
+            self._pending = [future for future in self._pending if not future.done()]
+            self._pending.append(self._executor.submit(function, *args))
+
+    def _flush_arrays(self, arrays, shard, count):
+        for array in arrays.values():
+            array.flush()
+        with self._lock:
+            shard['count'] = max(shard['count'], count)
+            self._write_index()
+
+    def _write_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def _roll(self):
+        # The full shard is flushed (and unmapped once the flush drops the last
+        # reference to its arrays) while the next one fills.
+        self._submit(self._flush_arrays, self._arrays, self.index['shards'][-1], self._count)
+        self._new_shard()
+
+    def flush(self, wait=False):
+        """Writes the rows recorded so far to disk and to the index."""
+        self._since_flush = 0
+        self._submit(self._flush_arrays, self._arrays, self.index['shards'][-1], self._count)
+        if wait:
+            self.wait()
+
+    def wait(self):
+        """Waits for the background flushes to finish (and raises their errors)."""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        if self._arrays is None:
+            return
+        self.flush(wait=True)
+        self._arrays = None
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_shards(directory):
+    """
+    The recorded shards of a dataset, as dicts of field -> read-only memory-mapped
+    array of the valid rows. Nothing is read until the arrays are accessed.
+    """
+    with open(os.path.join(directory, INDEX_FILE)) as f:
+        index = json.load(f)
+    shards = []
+    for shard in index['shards']:
+        if shard['count'] == 0:
+            continue
+        path = os.path.join(directory, shard['name'])
+        shards.append({
+            field: np.load(os.path.join(path, field + '.npy'), mmap_mode='r')[:shard['count']]
+            for field in index['fields']
+        })
+    return shards
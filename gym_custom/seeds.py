@@ -0,0 +1,27 @@
+"""
+Independent seeds for lanes and workers, derived from one root seed.
+
+seed + i gives every env its own generator but the streams come from one counter
+and reseeding a run with seed + 1 shifts them all by one lane. SeedSequence.spawn
+derives statistically independent children instead, and a child can spawn again,
+so a run is reproducible from the root seed at every level:
+
+    worker_sequences = spawn(seed, num_workers)         # one per process
+    lane_seeds = spawn_seeds(worker_sequences[i], num_envs)
+    for env, lane_seed in zip(envs, lane_seeds):
+        env.seed(lane_seed)                             # gym's seeding.np_random
+"""
+
+import numpy as np
+
+
+def spawn(seed, num):
+    """num child SeedSequences of seed (an int, a SeedSequence, or None for fresh entropy)."""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(num)
+
+
+def spawn_seeds(seed, num):
+    """num independent 32-bit seeds derived from seed, for env.seed and np.random.RandomState."""
+    return [int(child.generate_state(1)[0]) for child in spawn(seed, num)]
@@ -0,0 +1,510 @@
+"""
+Subprocess vector env for the gym_custom envs.
+
+K worker processes each host a slice of the envs. Actions, observations, rewards
+and dones live in shared-memory arrays that the parent and the workers both map, so
+a batch step only sends a one-word command to every worker and waits for a one-word
+reply; nothing is pickled per observation.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import traceback
+from collections import deque
+from multiprocessing.connection import wait
+
+import numpy as np
+
+import gym
+from gym import spaces
+from gym.wrappers import TimeLimit
+
+from gym_custom.seeds import spawn_seeds
+
+
+def _make_env(env_id, env_kwargs, num_envs, max_episode_steps):
+    """
+    A single env, or one vector env of num_envs lanes when num_envs is not None; the
+    vector env truncates its episodes and resets its lanes within step itself.
+    """
+    if num_envs is not None:
+        return gym.make(env_id, num_envs=num_envs, max_episode_steps=max_episode_steps, auto_reset=True,
+                        **env_kwargs)
+    env = gym.make(env_id, **env_kwargs)
+    if max_episode_steps is not None:
+        env = TimeLimit(env, max_episode_steps=max_episode_steps)
+    return env
+
+
+def _is_vector_env(env):
+    return hasattr(env.unwrapped, 'single_observation_space')
+
+
+class _SharedArray(object):
+
+    """A NumPy array in a multiprocessing.RawArray; picklable for worker processes."""
+
+    def __init__(self, context, shape, dtype):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.raw = context.RawArray('b', max(1, int(np.prod(self.shape)) * self.dtype.itemsize))
+
+    def numpy(self):
+        return np.frombuffer(self.raw, dtype=self.dtype, count=int(np.prod(self.shape))).reshape(self.shape)
+
+
+def _worker(env_id, env_kwargs, start, stop, vectorized, max_episode_steps, profile, pipe, parent_pipe, shared):
+    parent_pipe.close()
+    if 'first_lane' in env_kwargs:
+        env_kwargs = dict(env_kwargs, first_lane=env_kwargs['first_lane'] + start)
+    actions, observations, rewards, dones, terminals, truncations, final_observations = \
+        [array.numpy() for array in shared]
+    if vectorized:
+        envs = [_make_env(env_id, env_kwargs, stop - start, max_episode_steps)]
+    else:
+        envs = [_make_env(env_id, env_kwargs, None, max_episode_steps) for _ in range(start, stop)]
+    if profile:
+        from gym_custom.profiling import ProfiledEnv
+        envs = [ProfiledEnv(env) for env in envs]
+
+    def step(ids):
+        if vectorized:
+            obs, reward, done, info = envs[0].step(actions[start:stop])
+            rewards[start:stop] = reward
+            dones[start:stop] = done
+            terminals[start:stop] = info['terminal']
+            truncations[start:stop] = info['truncated']
+            final_observations[start:stop] = info['final_observation']
+            observations[start:stop] = obs
+            return
+        for i in ids:
+            env = envs[i - start]
+            obs, reward, done, info = env.step(actions[i])
+            # Some envs return the same info dict on every step, so only trust the key on a done step.
+            truncated = done and bool(info.get('TimeLimit.truncated', False))
+            final_observations[i] = obs
+            if done:
+                obs = env.reset()
+            observations[i] = obs
+            rewards[i] = reward
+            dones[i] = done
+            terminals[i] = done and not truncated
+            truncations[i] = truncated
+
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == 'step':
+                step(range(start, stop))
+                pipe.send((True, None))
+            elif command == 'step_ids':
+                # AsyncEnvPool: step some of the envs and reply with their ids.
+                step(data)
+                pipe.send((True, data))
+            elif command == 'reset':
+                if vectorized:
+                    observations[start:stop] = envs[0].reset()
+                else:
+                    for i, env in enumerate(envs, start):
+                        observations[i] = env.reset()
+                pipe.send((True, None))
+            elif command == 'seed':
+                if vectorized:
+                    envs[0].seed(data[0])
+                else:
+                    for env, seed in zip(envs, data):
+                        env.seed(seed)
+                pipe.send((True, None))
+            elif command == 'profile':
+                from gym_custom.profiling import merge_snapshots
+                pipe.send((True, merge_snapshots([env.snapshot() for env in envs]) if profile else None))
+            elif command == 'close':
+                pipe.send((True, None))
+                break
+            else:
+                raise RuntimeError('Unknown command {!r}'.format(command))
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        pipe.send((False, traceback.format_exc()))
+    finally:
+        for env in envs:
+            env.close()
+        pipe.close()
+
+
+class SharedMemoryVecEnv(gym.Env):
+
+    """
+    Runs num_envs copies of env_id in num_workers processes (default: one per CPU,
+    at most one per env).
+
+    step takes actions of shape [num_envs, ...] and returns observations of shape
+    [num_envs, ...], rewards and dones of shape [num_envs] and an info as the vector
+    envs' (see BatchedEnv): 'terminal' and 'truncated' tell episodes that ended from
+    those cut by max_episode_steps, and 'final_observation' holds the observations
+    the step produced. Envs that are done are reset by their worker within the same
+    step, so the returned observation of such an env is the first one of its next
+    episode.
+
+    Ids of vector envs (such as pomdp-mountain-car-vec-v0) are split into one vector
+    env of num_envs / num_workers lanes per worker. For pomdp-mountain-car-mixed-vec-v0
+    every worker's env continues the lane layout of the whole batch, which
+    variants and lane_variant describe, and info['variant'] holds lane_variant. max_episode_steps wraps every
+    single env with a TimeLimit, as required for pomdp-mountain-car-episodic-v0, and
+    is passed on to the vector envs, which truncate their lanes themselves.
+
+    The arrays returned by step and reset are copies unless zero_copy=True, in which
+    case they are read-only views of the shared buffers and are overwritten by the
+    next step/reset.
+
+    With profile=True every worker wraps its envs in gym_custom.profiling.ProfiledEnv;
+    profile_snapshot() collects and merges their snapshots.
+    """
+
+    def __init__(self, env_id, num_envs, num_workers=None, env_kwargs=None, max_episode_steps=None,
+                 zero_copy=False, context=None, profile=False):
+        env_kwargs = dict(env_kwargs or {})
+        num_workers = min(num_workers or os.cpu_count() or 1, num_envs)
+        self.env_id = env_id
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+        self.zero_copy = zero_copy
+        self.closed = True  # until the workers are started
+
+        probe = _make_env(env_id, env_kwargs, None, None)
+        vectorized = _is_vector_env(probe)
+        self.lane_variant = None
+        if vectorized and hasattr(probe.unwrapped, 'lane_layout'):
+            # Mixed-variant envs: lane i of the batch runs the same variant whatever its worker.
+            env_kwargs.setdefault('first_lane', 0)
+            self.variants = probe.unwrapped.variants
+            self.lane_variant = probe.unwrapped.lane_layout(num_envs, env_kwargs['first_lane'])
+            self.lane_variant.flags.writeable = False
+        if vectorized:
+            single_action_space = probe.unwrapped.single_action_space
+            single_observation_space = probe.unwrapped.single_observation_space
+            probe_obs = np.asarray(probe.reset())[0]
+        else:
+            single_action_space = probe.action_space
+            single_observation_space = probe.observation_space
+            probe_obs = np.asarray(probe.reset())
+        probe.close()
+
+        self.single_action_space = single_action_space
+        self.single_observation_space = single_observation_space
+        if isinstance(single_action_space, spaces.Discrete):
+            self.action_space = spaces.MultiDiscrete([single_action_space.n] * num_envs)
+        else:
+            self.action_space = spaces.Box(
+                low=np.broadcast_to(single_action_space.low, (num_envs,) + single_action_space.shape),
+                high=np.broadcast_to(single_action_space.high, (num_envs,) + single_action_space.shape),
+                dtype=single_action_space.dtype
+            )
+        self.observation_space = spaces.Box(
+            low=np.broadcast_to(single_observation_space.low, (num_envs,) + probe_obs.shape),
+            high=np.broadcast_to(single_observation_space.high, (num_envs,) + probe_obs.shape),
+            dtype=single_observation_space.dtype
+        )
+
+        context = multiprocessing.get_context(context)
+        action_dtype = np.int64 if isinstance(single_action_space, spaces.Discrete) else single_action_space.dtype
+        shared = [
+            _SharedArray(context, (num_envs,) + single_action_space.shape, action_dtype),
+            _SharedArray(context, (num_envs,) + probe_obs.shape, probe_obs.dtype),
+            _SharedArray(context, (num_envs,), np.float64),
+            _SharedArray(context, (num_envs,), np.bool_),
+            _SharedArray(context, (num_envs,), np.bool_),
+            _SharedArray(context, (num_envs,), np.bool_),
+            _SharedArray(context, (num_envs,) + probe_obs.shape, probe_obs.dtype),
+        ]
+        (self._actions, self._observations, self._rewards, self._dones, self._terminals, self._truncations,
+         self._final_observations) = [array.numpy() for array in shared]
+
+        self._slices = []
+        self._pipes = []
+        self._processes = []
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            pipe, worker_pipe = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(env_id, env_kwargs, int(start), int(stop), vectorized, max_episode_steps, profile,
+                      worker_pipe, pipe, shared),
+                daemon=True
+            )
+            process.start()
+            worker_pipe.close()
+            self._slices.append((int(start), int(stop)))
+            self._pipes.append(pipe)
+            self._processes.append(process)
+
+        self._vectorized = vectorized
+        self._waiting = False
+        self.closed = False
+
+    def _send(self, command, data=None):
+        for pipe in self._pipes:
+            pipe.send((command, data))
+
+    def _wait(self):
+        payloads = []
+        errors = []
+        for pipe in self._pipes:
+            ok, payload = pipe.recv()
+            if ok:
+                payloads.append(payload)
+            else:
+                errors.append(payload)
+        if errors:
+            self.close(terminate=True)
+            raise RuntimeError('Error in gym_custom worker:\n' + errors[0])
+        return payloads
+
+    def _output(self, array):
+        if self.zero_copy:
+            view = array.view()
+            view.flags.writeable = False
+            return view
+        return array.copy()
+
+    def seed(self, seed=None):
+        """Seeds every env (every worker's vector env) with its own child of SeedSequence(seed)."""
+        seeds = [None] * self.num_envs if seed is None else spawn_seeds(seed, self.num_envs)
+        for pipe, (start, stop) in zip(self._pipes, self._slices):
+            pipe.send(('seed', seeds[start:stop]))
+        self._wait()
+        return seeds
+
+    def profile_snapshot(self):
+        """The merged profiles of all workers (None unless profile=True), see gym_custom.profiling."""
+        self._send('profile')
+        snapshots = self._wait()
+        if snapshots[0] is None:
+            return None
+        from gym_custom.profiling import merge_snapshots
+        snapshot = merge_snapshots(snapshots)
+        snapshot['env_id'] = self.env_id
+        return snapshot
+
+    def reset(self):
+        self._send('reset')
+        self._wait()
+        return self._output(self._observations)
+
+    def step_async(self, actions):
+        self._actions[...] = np.asarray(actions).reshape(self._actions.shape)
+        self._send('step')
+        self._waiting = True
+
+    def _info(self, env_ids=slice(None)):
+        info = {
+            'terminal': self._output(self._terminals[env_ids]),
+            'truncated': self._output(self._truncations[env_ids]),
+            'final_observation': self._output(self._final_observations[env_ids]),
+        }
+        if self.lane_variant is not None:
+            info['variant'] = self.lane_variant[env_ids]
+        return info
+
+    def step_wait(self):
+        self._wait()
+        self._waiting = False
+        return (self._output(self._observations), self._output(self._rewards), self._output(self._dones),
+                self._info())
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self, terminate=False):
+        if self.closed:
+            return
+        self.closed = True
+        if not terminate:
+            try:
+                if self._waiting:
+                    self._wait()
+                self._send('close')
+                for pipe in self._pipes:
+                    pipe.recv()
+            except (EOFError, OSError, RuntimeError):
+                terminate = True
+        for process in self._processes:
+            if terminate and process.is_alive():
+                process.terminate()
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close(terminate=True)
+
+
+class AsyncEnvPool(SharedMemoryVecEnv):
+
+    """
+    A SharedMemoryVecEnv whose envs are stepped independently, so that a slow worker
+    only delays its own envs:
+
+        pool = AsyncEnvPool('pomdp-mountain-car-v0', num_envs=64, batch_size=16)
+        pool.async_reset()
+        while True:
+            obs, rewards, dones, info = pool.recv()     # the first 16 envs ready
+            pool.send(policy(obs), info['env_id'])
+
+    send(actions, env_ids) starts a step of the given envs and returns at once; recv
+    returns the results of the first batch_size envs whose step has finished, as
+    arrays of batch_size rows, with their ids in info['env_id'] (and the other info
+    entries of SharedMemoryVecEnv for those envs). An env can be sent
+    again once recv has returned it; idle_ids and running_ids list the envs that
+    can be sent and those that cannot yet. Done envs are reset within their step, as in
+    SharedMemoryVecEnv. await pool.recv_async() is the asyncio version of recv.
+
+    The envs of a worker hosting a vector env (for the *-vec-v0 ids) are stepped
+    together, so send must give either all or none of them.
+    """
+
+    def __init__(self, env_id, num_envs, batch_size=None, **kwargs):
+        super().__init__(env_id, num_envs, **kwargs)
+        self.batch_size = batch_size or num_envs
+        self._bounds = np.array([start for start, _ in self._slices] + [num_envs])
+        # Steps sent to each worker and not received yet; envs that can be sent;
+        # envs whose results recv has not returned yet, in the order they finished.
+        self._pending = [0] * self.num_workers
+        self._idle = np.ones(num_envs, dtype=bool)
+        self._ready = deque()
+
+    @property
+    def idle_ids(self):
+        """Ids of the envs that can be sent: recv has returned them and they were not sent since."""
+        return np.flatnonzero(self._idle)
+
+    @property
+    def running_ids(self):
+        """Ids of the envs sent (or reset by async_reset) that recv has not returned yet."""
+        return np.flatnonzero(~self._idle)
+
+    def send(self, actions, env_ids=None):
+        """Starts a step of the envs env_ids (default: all) with actions of shape [len(env_ids), ...]."""
+        env_ids = np.arange(self.num_envs) if env_ids is None else np.asarray(env_ids, dtype=np.intp).reshape(-1)
+        if not self._idle[env_ids].all():
+            raise ValueError('envs {} have not been returned by recv yet'.format(env_ids[~self._idle[env_ids]]))
+        workers = np.searchsorted(self._bounds, env_ids, side='right') - 1
+        batches = [(worker, env_ids[workers == worker]) for worker in np.unique(workers)]
+        if self._vectorized:
+            for worker, ids in batches:
+                start, stop = self._slices[worker]
+                if len(ids) != stop - start:
+                    raise ValueError('the envs {} to {} of worker {} are stepped together'.format(
+                        start, stop - 1, worker))
+
+        self._actions[env_ids] = np.asarray(actions).reshape((len(env_ids),) + self._actions.shape[1:])
+        self._idle[env_ids] = False
+        for worker, ids in batches:
+            self._pipes[worker].send(('step_ids', ids))
+            self._pending[worker] += 1
+
+    def _batch_size(self, batch_size):
+        batch_size = batch_size or self.batch_size
+        available = int(np.count_nonzero(~self._idle))
+        if available == 0:
+            raise RuntimeError('recv without any env sent')
+        return min(batch_size, available)
+
+    def _collect(self, timeout=None):
+        """Moves the envs of the workers that replied within timeout to the ready queue."""
+        busy = [pipe for pipe, pending in zip(self._pipes, self._pending) if pending]
+        for pipe in wait(busy, timeout):
+            ok, payload = pipe.recv()
+            if not ok:
+                self.close(terminate=True)
+                raise RuntimeError('Error in gym_custom worker:\n' + payload)
+            self._pending[self._pipes.index(pipe)] -= 1
+            self._ready.extend(payload)
+
+    def _pop(self, batch_size):
+        env_ids = np.array([self._ready.popleft() for _ in range(batch_size)], dtype=np.intp)
+        self._idle[env_ids] = True
+        info = self._info(env_ids)
+        info['env_id'] = env_ids
+        return self._observations[env_ids], self._rewards[env_ids], self._dones[env_ids], info
+
+    def recv(self, batch_size=None):
+        """(observations, rewards, dones, info) of the first batch_size (default: self.batch_size) envs ready."""
+        batch_size = self._batch_size(batch_size)
+        while len(self._ready) < batch_size:
+            self._collect()
+        return self._pop(batch_size)
+
+    async def recv_async(self, batch_size=None):
+        """recv for asyncio: waits for the workers without blocking the event loop."""
+        batch_size = self._batch_size(batch_size)
+        loop = asyncio.get_running_loop()
+        while len(self._ready) < batch_size:
+            await self._replied(loop)
+            self._collect(timeout=0)
+        return self._pop(batch_size)
+
+    async def _replied(self, loop):
+        replied = loop.create_future()
+
+        def on_reply():
+            if not replied.done():
+                replied.set_result(None)
+
+        fds = [pipe.fileno() for pipe, pending in zip(self._pipes, self._pending) if pending]
+        added = []
+        try:
+            for fd in fds:
+                loop.add_reader(fd, on_reply)
+                added.append(fd)
+        except NotImplementedError:
+            # Event loops without add_reader (the proactor loop on Windows): wait in a thread.
+            for fd in added:
+                loop.remove_reader(fd)
+            busy = [pipe for pipe, pending in zip(self._pipes, self._pending) if pending]
+            await loop.run_in_executor(None, wait, busy)
+            return
+        try:
+            await replied
+        finally:
+            for fd in added:
+                loop.remove_reader(fd)
+
+    def _drain(self):
+        while any(self._pending):
+            self._collect()
+        self._ready.clear()
+        self._idle[:] = True
+
+    def reset(self):
+        """Resets every env (waiting for the steps in flight) and returns all observations; all envs can be sent."""
+        self._drain()
+        return super().reset()
+
+    def async_reset(self):
+        """Resets every env; recv then returns their first observations, batch_size at a time."""
+        self._drain()
+        super().reset()
+        self._rewards[:] = 0.0
+        self._dones[:] = False
+        self._terminals[:] = False
+        self._truncations[:] = False
+        self._final_observations[:] = self._observations
+        self._idle[:] = False
+        self._ready.extend(range(self.num_envs))
+
+    def step_async(self, actions):
+        self._drain()
+        super().step_async(actions)
+
+    def close(self, terminate=False):
+        if not self.closed and not terminate:
+            try:
+                self._drain()
+            except (EOFError, OSError, RuntimeError):
+                terminate = True
+        super().close(terminate=terminate)
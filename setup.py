@@ -2,5 +2,9 @@ from setuptools import setup
 
 setup(name='gym_custom',
       version='0.0.1',
-      install_requires=['gym']  # And any other dependencies foo needs
-)
\ No newline at end of file
+      install_requires=['gym'],  # And any other dependencies foo needs
+      extras_require={'numba': ['numba']},  # compiled kernels, see gym_custom/backend.py
+      entry_points={
+          'console_scripts': ['gym-custom-generate=gym_custom.generate:main'],
+      },
+)
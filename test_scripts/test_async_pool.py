@@ -0,0 +1,56 @@
+import asyncio
+
+import numpy as np
+
+from gym_custom.vector import AsyncEnvPool
+
+# Every env sent comes back exactly once, in batches of batch_size, and can then be sent again.
+pool = AsyncEnvPool('pomdp-mountain-car-v0', num_envs=12, batch_size=5, num_workers=3)
+pool.async_reset()
+counts = np.zeros(12, dtype=int)
+assert len(pool.idle_ids) == 0 and len(pool.running_ids) == 12
+for _ in range(100):
+    obs, rewards, dones, info = pool.recv()
+    assert obs.shape == (5, 3) and len(set(info['env_id'])) == 5
+    assert np.array_equal(pool.idle_ids, np.sort(info['env_id'])) and len(pool.running_ids) == 7
+    counts[info['env_id']] += 1
+    pool.send(np.ones((5, 1), dtype=np.float32), info['env_id'])
+try:
+    pool.send(np.ones((1, 1)), pool.running_ids[:1])
+    raise AssertionError('a running env was sent again')
+except ValueError as error:
+    print('send of a running env:', error)
+assert counts.sum() == 500 and counts.min() > 0, 'envs returned unevenly: {}'.format(counts)
+print('per env', counts)
+pool.close()
+
+# Vector ids: the lanes of a worker are stepped together.
+pool = AsyncEnvPool('heaven-hell-onehot-ls-vec-v0', num_envs=8, batch_size=4, num_workers=2)
+obs = pool.reset()
+pool.send(np.zeros(8, dtype=np.int64))
+obs, rewards, dones, info = pool.recv()
+assert sorted(info['env_id'].tolist()) in ([0, 1, 2, 3], [4, 5, 6, 7]), 'lanes of different workers mixed'
+assert obs.shape == (4, 110)
+print('vector lanes', sorted(info['env_id'].tolist()), obs.shape)
+try:
+    pool.send(np.zeros(2, dtype=np.int64), info['env_id'][:2])
+    raise AssertionError('part of a worker was sent')
+except ValueError as error:
+    print('partial worker:', error)
+pool.close()
+
+
+async def consume(pool, steps):
+    pool.async_reset()
+    total = 0
+    for _ in range(steps):
+        obs, _, _, info = await pool.recv_async()
+        pool.send(np.ones((len(obs), 1), dtype=np.float32), info['env_id'])
+        total += len(obs)
+    return total
+
+pool = AsyncEnvPool('pomdp-mountain-car-opt-lower-v0', num_envs=8, batch_size=2, num_workers=4)
+steps = asyncio.run(consume(pool, 200))
+assert steps == 400, 'recv_async returned {} steps'.format(steps)
+print('asyncio steps', steps)
+pool.close()
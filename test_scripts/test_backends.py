@@ -0,0 +1,73 @@
+import importlib.util
+import os
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+
+# The NumPy and Numba backends give the same trajectories, bit for bit: every env is run in a
+# process per backend (chosen with GYM_CUSTOM_BACKEND) from the same seeds and actions.
+if importlib.util.find_spec('numba') is None:
+    print('numba is not installed, skipped')
+    raise SystemExit
+
+RUN = '''
+import pickle, sys
+import gym
+import numpy as np
+from gym_custom import backend
+
+CASES = [
+    ('pomdp-mountain-car-v0', {}),
+    ('pomdp-mountain-car-easy-v0', {}),
+    ('pomdp-mountain-car-episodic-v0', {}),
+    ('pomdp-mountain-car-episodic-easy-v0', {}),
+    ('pomdp-mountain-car-opt-lower-v0', {}),
+    ('pomdp-mountain-car-opt-lower-v0', {'crossing': 'exact', 'history_length': 4}),
+    ('continuous-heaven-hell-opt-lower-v0', {}),
+    ('continuous-heaven-hell-opt-lower-v0', {'crossing': 'exact'}),
+    ('pomdp-mountain-car-vec-v0', {'num_envs': 16}),
+    ('pomdp-mountain-car-vec-v0', {'num_envs': 16, 'variant': 'episodic-easy', 'auto_reset': True}),
+    ('pomdp-mountain-car-opt-lower-vec-v0', {'num_envs': 16}),
+    ('pomdp-mountain-car-opt-lower-vec-v0', {'num_envs': 16, 'crossing': 'exact'}),
+    ('pomdp-mountain-car-mixed-vec-v0', {'num_envs': 16}),
+]
+trajectories = {'backend': backend.NAME}
+for env_id, kwargs in CASES:
+    env = gym.make('gym_custom:' + env_id, **kwargs)
+    env.seed(0)
+    rng = np.random.RandomState(0)
+    low, high = (-1.5, 1.5) if 'opt-lower' in env_id else (-20.0, 20.0)
+    steps = [env.reset()]
+    for t in range(300):
+        actions = rng.uniform(low, high, size=env.action_space.shape).astype(env.action_space.dtype)
+        obs, rewards, dones, info = env.step(actions)
+        steps.append((obs, rewards, dones, {key: value for key, value in info.items() if key != 'episode'}))
+        if np.ndim(dones) == 0 and dones:
+            steps.append(env.reset())
+        elif np.ndim(dones) and dones.any() and not kwargs.get('auto_reset'):
+            steps.append(env.reset(dones))
+    trajectories[env_id + ' ' + str(kwargs)] = steps
+sys.stdout.buffer.write(pickle.dumps(trajectories))
+'''
+
+
+def same(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, (tuple, list)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    a, b = np.asarray(a), np.asarray(b)
+    return a.dtype == b.dtype and np.array_equal(a, b)
+
+
+runs = {}
+for name in ['numpy', 'numba']:
+    environment = dict(os.environ, GYM_CUSTOM_BACKEND=name)
+    runs[name] = pickle.loads(subprocess.check_output([sys.executable, '-c', RUN], env=environment))
+    assert runs[name].pop('backend') == name, 'GYM_CUSTOM_BACKEND={} did not select that backend'.format(name)
+assert runs['numpy'].keys() == runs['numba'].keys()
+for case in runs['numpy']:
+    assert same(runs['numpy'][case], runs['numba'][case]), '{}: the backends differ'.format(case)
+    print(case, True)
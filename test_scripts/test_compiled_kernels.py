@@ -0,0 +1,83 @@
+import importlib.util
+import os
+
+import numpy as np
+
+# The compiled kernels of pomdp_mountain_car_core return what its NumPy kernels return, bit for bit,
+# on random batches: lane parameters as scalars and as arrays, and positions on the edges of the
+# flags and of the priest zone.
+if importlib.util.find_spec('numba') is None:
+    print('numba is not installed, skipped')
+    raise SystemExit
+os.environ['GYM_CUSTOM_BACKEND'] = 'numba'
+
+from gym_custom.envs import pomdp_mountain_car_compiled as compiled
+from gym_custom.envs import pomdp_mountain_car_core as core
+
+assert sorted(core.NUMPY_KERNELS) == ['advance', 'lower_level_observation', 'lower_level_observation_exact',
+                                      'priest_direction', 'reward_done'], sorted(core.NUMPY_KERNELS)
+for name in core.NUMPY_KERNELS:
+    assert getattr(core, name) is getattr(compiled, name), '{} is not the compiled kernel'.format(name)
+kernels = core.NUMPY_KERNELS
+
+
+def same(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return a.dtype == b.dtype and a.shape == b.shape and np.array_equal(a, b)
+
+
+def batch(rng, n, per_lane):
+    right_flag = rng.uniform(0.5, 1.1, n) if per_lane else 1.0
+    left_flag = -rng.uniform(0.5, 1.1, n) if per_lane else -1.0
+    heaven_on_right = rng.randint(2, size=n) == 0
+    heaven = np.where(heaven_on_right, right_flag, left_flag)
+    hell = np.where(heaven_on_right, left_flag, right_flag)
+    priest_position = rng.uniform(-0.5, 0.5, n) if per_lane else 0.5
+    priest_delta = rng.uniform(0.05, 0.2, n) if per_lane else 0.1
+    position = rng.uniform(-1.3, 1.3, n)
+    # Lanes exactly on the flags and on the edges of the priest zone.
+    k = n // 8
+    position[:k] = heaven[:k]
+    position[k:2 * k] = hell[k:2 * k]
+    position[2 * k:3 * k] = np.broadcast_to(priest_position + priest_delta, n)[2 * k:3 * k]
+    position[3 * k:4 * k] = np.broadcast_to(priest_position - priest_delta, n)[3 * k:4 * k]
+    return position, heaven, hell, priest_position, priest_delta
+
+
+rng = np.random.RandomState(0)
+n = 1000
+for trial in range(20):
+    per_lane = trial % 2 == 1
+    position, heaven, hell, priest_position, priest_delta = batch(rng, n, per_lane)
+
+    velocity = rng.uniform(-0.1, 0.1, n)
+    force = rng.uniform(-2.0, 2.0, n)
+    power = rng.uniform(0.001, 0.002, n) if per_lane else 0.0015
+    max_speed = rng.uniform(0.05, 0.09, n) if per_lane else 0.07
+    results = []
+    for advance in [kernels['advance'], compiled.advance]:
+        p, v = position.copy(), velocity.copy()
+        advance(p, v, force, power, max_speed, -1.2, 0.6)
+        results.append((p, v))
+    assert same(results[0][0], results[1][0]) and same(results[0][1], results[1][1]), 'advance differs'
+
+    for reward_scale, terminates in [(1.0, True), (10.0, False)]:
+        expected = kernels['reward_done'](position, heaven, hell, reward_scale, terminates)
+        actual = compiled.reward_done(position, heaven, hell, reward_scale, terminates)
+        assert same(expected[0], actual[0]) and same(expected[1], actual[1]), 'reward_done differs'
+
+    expected = kernels['priest_direction'](position, heaven, hell, priest_position, priest_delta)
+    actual = compiled.priest_direction(position, heaven, hell, priest_position, priest_delta)
+    assert same(expected, actual), 'priest_direction differs'
+
+    prev_position = rng.uniform(-1.3, 1.3, n)
+    for name in ['lower_level_observation', 'lower_level_observation_exact']:
+        for num_points in [3, 10]:
+            steps = core.lower_level_steps(num_points)
+            expected = np.empty((n, 2 * num_points))
+            actual = np.empty((n, 2 * num_points))
+            kernels[name](prev_position, position, heaven, hell, priest_position, priest_delta, steps, expected)
+            getattr(compiled, name)(prev_position, position, heaven, hell, priest_position, priest_delta, steps,
+                                    actual)
+            assert same(expected, actual), '{} with {} points differs'.format(name, num_points)
+print('kernels', True)
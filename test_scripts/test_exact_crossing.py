@@ -0,0 +1,66 @@
+import numpy as np
+
+from gym_custom import backend
+from gym_custom.envs.pomdp_mountain_car_core import LOWER_LEVEL_OBSERVATIONS, lower_level_steps
+
+# lower_level_observation_exact, for every K: a pass near the priest is never missed, the samples
+# with the direction set lie in the priest zone, the ends stay put, and the batched and single-env
+# paths agree. Run with GYM_CUSTOM_BACKEND=numba to check the compiled kernels.
+lower_level_observation_exact = LOWER_LEVEL_OBSERVATIONS['exact']
+sampled = LOWER_LEVEL_OBSERVATIONS['sampled']
+priest_position, priest_delta = 0.5, 0.1
+low, high = priest_position - priest_delta, priest_position + priest_delta
+n = 2000
+rng = np.random.RandomState(0)
+a = rng.uniform(-1.5, 1.5, n)
+b = rng.uniform(-1.5, 1.5, n)
+# Short passes that fall between two samples, ends on the bounds, and standing still.
+a[:200] = rng.uniform(0.3, low, 200)
+b[:200] = rng.uniform(high, 0.7, 200)
+a[200:300], b[200:300] = b[:100], a[:100]
+a[300:320] = low
+b[320:340] = high
+b[340:360] = a[340:360]
+a[360:380] = b[360:380] = rng.uniform(low, high, 20)
+heaven_position = np.where(rng.rand(n) < 0.5, 1.0, -1.0)
+hell_position = -heaven_position
+crosses = (np.minimum(a, b) <= high) & (np.maximum(a, b) >= low)
+print('backend', backend.NAME)
+
+for num_points in [3, 4, 5, 10, 17, 64]:
+    steps = lower_level_steps(num_points)
+    batched = np.empty((n, 2 * num_points))
+    lower_level_observation_exact(a, b, heaven_position, hell_position, priest_position, priest_delta, steps,
+                                  batched)
+    single = np.empty((n, 2 * num_points))
+    for i in range(n):
+        lower_level_observation_exact(a[i], b[i], heaven_position[i], hell_position[i], priest_position,
+                                      priest_delta, steps, single[i])
+    positions, directions = batched[:, 0::2], batched[:, 1::2]
+    flagged = directions != 0
+
+    found = np.array_equal(flagged.any(axis=1), crosses)
+    sign = np.all(directions[flagged] == np.repeat(heaven_position, num_points).reshape(n, -1)[flagged])
+    inside = np.all((positions[flagged] >= low) & (positions[flagged] <= high))
+    # The flagged samples are consecutive.
+    runs = np.all(np.diff(flagged.astype(int), axis=1).clip(0).sum(axis=1) + flagged[:, 0] <= 1)
+    ends = np.array_equal(positions[:, 0], a) and np.array_equal(positions[:, -1], b)
+    # Where sampling already catches the priest, it does too.
+    reference = np.empty((n, 2 * num_points))
+    sampled(a, b, heaven_position, hell_position, priest_position, priest_delta, steps, reference)
+    covers = np.all(flagged.any(axis=1) >= (reference[:, 1::2] != 0).any(axis=1))
+    agree = np.array_equal(single, batched)
+    assert found, 'K={}: a crossing was missed or invented'.format(num_points)
+    assert sign and inside and runs, 'K={}: wrong flagged samples'.format(num_points)
+    assert ends, 'K={}: the ends moved'.format(num_points)
+    assert covers, 'K={}: a sampled hit was not caught'.format(num_points)
+    assert agree, 'K={}: the single and batched paths differ'.format(num_points)
+    print(num_points, 'no miss', found, 'sign', sign, 'in zone', inside, 'one run', runs, 'ends', ends,
+          'covers sampled', covers, 'single == batched', agree)
+
+try:
+    lower_level_observation_exact(0.0, 1.0, 1.0, -1.0, priest_position, priest_delta, lower_level_steps(2),
+                                  np.empty(4))
+    raise AssertionError('K = 2 was accepted')
+except ValueError:
+    print('K = 2 refused', True)
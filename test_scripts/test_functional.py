@@ -0,0 +1,46 @@
+import gym
+import numpy as np
+from gym.utils import seeding
+
+from gym_custom.envs.pomdp_mountain_car_core import reset_functional, step_functional
+
+# From the state of a live env, step_functional gives exactly what the env's step returns, for
+# float32 actions sampled from the action space.
+for env_id in ['pomdp-mountain-car-v0', 'pomdp-mountain-car-easy-v0', 'pomdp-mountain-car-episodic-v0',
+               'pomdp-mountain-car-episodic-easy-v0', 'pomdp-mountain-car-opt-lower-v0']:
+    env = gym.make('gym_custom:' + env_id).unwrapped
+    env.seed(0)
+    env.action_space.seed(1)
+    obs = env.reset()
+    for t in range(20000):
+        action = env.action_space.sample()
+        states, observations, rewards, dones = env.step_functional(env.functional_state()[None], action[None])
+        obs, reward, done, _ = env.step(action)
+        assert np.array_equal(observations[0], obs), '{}: observations differ at step {}'.format(env_id, t)
+        assert rewards[0] == reward and dones[0] == done, '{}: rewards or dones differ at step {}'.format(env_id, t)
+        assert np.array_equal(states[0], env.functional_state()), '{}: states differ at step {}'.format(env_id, t)
+        if done:
+            obs = env.reset()
+    print(env_id, True)
+
+# reset_functional draws start states as reset does.
+env = gym.make('gym_custom:pomdp-mountain-car-v0').unwrapped
+env.seed(5)
+obs = env.reset()
+states, observations = reset_functional(seeding.np_random(5)[0])
+assert np.array_equal(observations[0], obs) and np.array_equal(states[0], env.functional_state()), \
+    'reset_functional differs from reset'
+print('reset_functional', True)
+
+# A planner expands one tree level of 1000 branches with one call, without touching the env.
+root = env.functional_state()
+states, observations, rewards, dones = env.step_functional(np.repeat(root[None], 1000, axis=0),
+                                                           np.linspace(-5, 5, 1000)[:, None])
+assert (states.shape, observations.shape, rewards.shape, dones.shape) == ((1000, 4), (1000, 3), (1000,), (1000,))
+assert np.array_equal(root, env.functional_state()), 'step_functional changed the env'
+
+# The module-level functions are those of the default variant, without an env.
+expanded = step_functional(np.repeat(root[None], 1000, axis=0), np.linspace(-5, 5, 1000)[:, None])
+assert all(np.array_equal(a, b) for a, b in zip(expanded, (states, observations, rewards, dones))), \
+    'the module-level step_functional differs from the env method'
+print('step_functional', True)
@@ -0,0 +1,57 @@
+import gym
+import numpy as np
+
+env = gym.make('gym_custom:heaven-hell-onehot-ls-vec-v0', num_envs=10000, memory_size=1)
+
+print(env.observation_space.shape)
+print(env.action_space.shape)
+
+obs = env.reset()
+episode_lengths = np.zeros(env.num_envs, dtype=int)
+returns = []
+for t in range(200):
+    actions = env.action_space.sample()
+    obs, rewards, dones, _ = env.step(actions)
+    episode_lengths += 1
+    if dones.any():
+        returns.extend(rewards[dones])
+        episode_lengths[dones] = 0
+        obs = env.reset(dones)
+print(len(returns), np.mean(returns))
+
+# Lane by lane against scalar envs with world='native' put in the states the lanes were reset to.
+from gym_custom.envs.heaven_hell_onehot_ls import HeavenHellOneHotLSEnv
+
+num_envs = 8
+env = gym.make('gym_custom:heaven-hell-onehot-ls-vec-v0', num_envs=num_envs, memory_size=4)
+scalars = [HeavenHellOneHotLSEnv(memory_size=4, world='native') for _ in range(num_envs)]
+env.seed(0)
+
+
+def start(i, obs):
+    scalar = scalars[i]
+    scalar.reset()
+    scalar.state = int(env.state[i])
+    scalar.history.reset(scalar._generate_obs(scalar.state))
+    assert np.array_equal(obs[i], scalar.history.flat()), 'reset observations differ in lane {}'.format(i)
+
+
+obs = env.reset()
+for i in range(num_envs):
+    start(i, obs)
+rng = np.random.RandomState(0)
+episodes = 0
+for t in range(300):
+    actions = rng.randint(4, size=num_envs)
+    obs, rewards, dones, _ = env.step(actions)
+    for i, scalar in enumerate(scalars):
+        scalar_obs, reward, done, _ = scalar.step(actions[i])
+        assert np.array_equal(obs[i], scalar_obs), 'observations differ in lane {} at step {}'.format(i, t)
+        assert rewards[i] == reward and dones[i] == done, 'rewards or dones differ in lane {} at step {}'.format(i, t)
+    if dones.any():
+        episodes += dones.sum()
+        obs = env.reset(dones)
+        for i in np.flatnonzero(dones):
+            start(i, obs)
+assert episodes > 0, 'no episode ended'
+print('lane by lane', True, episodes, 'episodes')
@@ -0,0 +1,75 @@
+import importlib.util
+
+import gym
+import numpy as np
+
+from gym_custom.envs import heaven_hell_core as core
+from gym_custom.envs.heaven_hell_onehot_ls import HeavenHellOneHotLSEnv
+
+# The tables of heaven_hell_core against POMDP-heavenhell-episodic-v0 of gym_pomdps, as gym_pomdps
+# reads them from its heavenhell .pomdp file: start distribution, transitions, expected rewards,
+# terminals and observations. The transitions out of the heaven and hell states are not compared,
+# since the episode is over by then. Then both worlds of HeavenHellOneHotLSEnv are run side by side.
+if importlib.util.find_spec('gym_pomdps') is None:
+    print('gym_pomdps is not installed, skipped')
+    raise SystemExit
+
+import gym_pomdps
+
+pomdp = gym.make('POMDP-heavenhell-episodic-v0').unwrapped
+T = np.asarray(pomdp.T)  # [S, A, S']
+O = np.asarray(pomdp.O)  # [S, A, S', O]
+R = np.asarray(pomdp.R)  # [S, A, S', O]
+ends = np.array([core.LEFT_END, core.RIGHT_END, core.LEFT_END + core.NUM_LOCATIONS,
+                 core.RIGHT_END + core.NUM_LOCATIONS])
+live = np.setdiff1d(np.arange(core.NUM_STATES), ends)
+
+assert T.shape == core.TRANSITIONS.shape and O.shape[:3] == T.shape and R.shape == O.shape, 'table shapes differ'
+assert np.allclose(np.asarray(pomdp.start), core.START), 'start distributions differ'
+assert np.allclose(T[live], core.TRANSITIONS[live]), 'transitions differ'
+expected_rewards = (T[..., None] * O * R).sum(axis=(2, 3))
+assert np.allclose(expected_rewards[live], core.REWARDS[live]), 'expected rewards differ'
+if hasattr(pomdp, 'D'):
+    assert np.array_equal(np.asarray(pomdp.D, dtype=bool)[live], core.TERMINALS[live]), 'terminals differ'
+
+# Observations are deterministic and depend on the next state only: two next states give the
+# same gym_pomdps observation exactly when they give the same one-hot observation here.
+observation_of = {}
+for s, a, s1 in zip(*np.nonzero(T[live])):
+    distribution = O[live[s], a, s1]
+    assert np.isclose(distribution.max(), 1.0), 'observation of state {} is not deterministic'.format(s1)
+    observation_of.setdefault(s1, set()).add(int(distribution.argmax()))
+assert all(len(observations) == 1 for observations in observation_of.values()), 'observations depend on (s, a)'
+states = sorted(observation_of)
+for i in states:
+    for j in states:
+        same = observation_of[i] == observation_of[j]
+        assert same == np.array_equal(core.OBSERVATIONS[i], core.OBSERVATIONS[j]), \
+            'states {} and {} are told apart differently'.format(i, j)
+print('tables', True)
+
+# Both worlds, from the same start state and with the same actions, give the same observations,
+# rewards and dones, up to and including the last observation of every episode.
+native = HeavenHellOneHotLSEnv(world='native')
+external = HeavenHellOneHotLSEnv(world='gym_pomdps')
+native.seed(0)
+external.seed(0)
+rng = np.random.RandomState(0)
+episodes = 0
+for episode in range(200):
+    obs = native.reset()
+    external_obs = external.reset()
+    while external.get_state() != native.get_state():
+        external_obs = external.reset()
+    assert np.array_equal(obs, external_obs), 'reset observations differ'
+    for t in range(100):
+        action = rng.randint(core.NUM_ACTIONS)
+        obs, reward, done, _ = native.step(action)
+        external_obs, external_reward, external_done, _ = external.step(action)
+        assert np.array_equal(obs, external_obs), 'observations differ in episode {}, step {}'.format(episode, t)
+        assert reward == external_reward and done == external_done, 'rewards or dones differ'
+        if done:
+            episodes += 1
+            break
+assert episodes > 0, 'no episode ended'
+print('trajectories', True, episodes, 'episodes')
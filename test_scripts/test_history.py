@@ -0,0 +1,115 @@
+import gym
+import numpy as np
+
+from gym_custom.history import History
+
+# History against a plain list of the last `length` observations, for one env and for a batch.
+
+
+class Reference(object):
+
+    def __init__(self, length, shape, num_envs, fill):
+        batch = () if num_envs is None else (num_envs,)
+        self.rows = [np.full(batch + shape, fill) for _ in range(length)]
+        self.num_envs = num_envs
+        self.fill = fill
+
+    def push(self, obs):
+        self.rows = self.rows[1:] + [np.array(obs, dtype=np.float64)]
+
+    def extend(self, observations):
+        for obs in (observations if self.num_envs is None else np.swapaxes(observations, 0, 1)):
+            self.push(obs)
+
+    def reset(self, first=None, mask=None):
+        mask = np.ones(self.num_envs, dtype=bool) if mask is None and self.num_envs else mask
+        for row in self.rows:
+            if mask is None:
+                row[...] = self.fill
+            else:
+                row[mask] = self.fill
+        if first is not None:
+            if mask is None:
+                self.rows[-1][...] = first
+            else:
+                first = np.asarray(first)
+                self.rows[-1][mask] = first[mask] if first.shape[:1] == (self.num_envs,) else first
+
+    def window(self, size=None):
+        rows = self.rows[len(self.rows) - (size or len(self.rows)):]
+        return np.stack(rows, axis=0 if self.num_envs is None else 1)
+
+
+for length in [1, 2, 3, 7]:
+    for num_envs in [None, 4]:
+        shape = (3,)
+        batch = () if num_envs is None else (num_envs,)
+        history = History(length, shape=shape, dtype=np.float64, num_envs=num_envs, fill=-1.0)
+        reference = Reference(length, shape, num_envs, -1.0)
+        rng = np.random.RandomState(length)
+        ok = True
+        cached = {}
+        for t in range(200):
+            operation = rng.randint(4)
+            if operation == 0:
+                obs = rng.randn(*batch + shape)
+                history.push(obs)
+                reference.push(obs)
+            elif operation == 1:
+                # Fewer, as many and more observations than the length.
+                count = rng.randint(1, 2 * length + 2)
+                observations = rng.randn(*(batch + (count,) + shape if num_envs else (count,) + shape))
+                history.extend(observations)
+                reference.extend(observations)
+            elif operation == 2 and num_envs is not None:
+                mask = rng.rand(num_envs) < 0.5
+                first = rng.randn(num_envs, *shape) if rng.rand() < 0.5 else rng.randn(int(mask.sum()), *shape)
+                history.reset(first, mask)
+                reference.reset(first, mask)
+            elif operation == 2 or operation == 3 and rng.rand() < 0.2:
+                first = rng.randn(*batch + shape)
+                history.reset(first)
+                reference.reset(first)
+            expected = reference.window()
+            window = history.window()
+            # The default window is cached per index, so after a wrap-around the same view
+            # must show the new observations.
+            ok &= cached.setdefault(history.index, window) is window
+            ok &= np.array_equal(window, expected) and not window.flags.writeable
+            ok &= np.array_equal(history.flat(), expected.reshape(batch + (-1,)))
+            for size in range(1, length + 1):
+                ok &= np.array_equal(history.window(size), reference.window(size))
+                ok &= np.array_equal(history.flat(size), reference.window(size).reshape(batch + (-1,)))
+            ok &= np.array_equal(history.newest(), reference.rows[-1])
+            copy = history.flat(copy=True)
+            ok &= copy.flags.writeable and not np.shares_memory(copy, history.buffer)
+        ok &= len(cached) == length
+        assert ok, 'History(length={}, num_envs={}) differs from the reference'.format(length, num_envs)
+        print('length', length, 'num_envs', num_envs, ok)
+
+for length, size in [(0, None), (3, 0), (3, 4)]:
+    try:
+        History(length).window(size)
+        raise AssertionError('length {}, size {} was accepted'.format(length, size))
+    except ValueError:
+        print('refused', length, size, True)
+
+# set_memory changes the length of the Heaven Hell history and its observation space.
+env = gym.make('gym_custom:heaven-hell-onehot-ls-v0', memory_size=10).unwrapped
+env.seed(0)
+obs = env.reset()
+obs_size = env.location_size + env.signal_size
+ok = obs.shape == env.observation_space.shape == (10 * obs_size,)
+env.set_memory(3)
+ok &= not env.ready
+obs = env.reset()
+ok &= obs.shape == env.observation_space.shape == (3 * obs_size,) and np.all(obs[:2 * obs_size] == -1)
+ok &= env.memory.shape == (3, obs_size) and np.array_equal(env.memory[-1], obs[2 * obs_size:])
+for t in range(4):
+    previous = env.memory.copy()
+    obs, _, done, _ = env.step(env.action_space.sample())
+    ok &= np.array_equal(env.memory[:2], previous[1:]) and np.array_equal(obs, env.memory.reshape(-1))
+    if done:
+        break
+assert ok, 'set_memory did not change the history'
+print('set_memory', ok)
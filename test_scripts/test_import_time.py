@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+# Budget for `import gym_custom` on top of `import gym`, in seconds.
+IMPORT_BUDGET = 0.05
+
+CHECK = '''
+import sys, time
+import gym
+start = time.perf_counter()
+import gym_custom
+elapsed = time.perf_counter() - start
+loaded = sorted(name for name in sys.modules if name.startswith('gym_custom.'))
+assert not loaded, loaded
+env = gym.make('pomdp-mountain-car-v0')
+env.reset()
+env.step(env.action_space.sample())
+assert 'gym.envs.classic_control.rendering' not in sys.modules
+assert 'gym_custom.envs.heaven_hell_core' not in sys.modules
+print(elapsed)
+'''
+
+timings = []
+for i in range(5):
+    output = subprocess.check_output([sys.executable, '-c', CHECK])
+    timings.append(float(output))
+print(timings)
+assert min(timings) < IMPORT_BUDGET, 'import gym_custom took {:.3f}s'.format(min(timings))
@@ -0,0 +1,98 @@
+import time
+
+import gym
+import numpy as np
+
+# Every lane of a vector env with per-lane parameters steps like a one-lane env made with
+# that lane's parameters, and parameter_sampler redraws the parameters of the lanes reset.
+
+
+def sampler(np_random, n):
+    right_flag = np_random.uniform(0.6, 1.1, size=n)
+    return {
+        'power': np_random.uniform(0.001, 0.002, size=n),
+        'max_speed': np_random.uniform(0.05, 0.09, size=n),
+        'max_action': np_random.uniform(0.5, 1.0, size=n),
+        'priest_position': np_random.uniform(0.3, 0.7, size=n),
+        'right_flag': right_flag,
+        'left_flag': -right_flag,
+    }
+
+
+CASES = [
+    ('pomdp-mountain-car-vec-v0', dict(variant='episodic'), lambda rng, n: rng.uniform(-2, 2, size=(n, 1))),
+    ('pomdp-mountain-car-vec-v0', dict(variant='easy'), lambda rng, n: rng.uniform(-2, 2, size=(n, 1))),
+    ('pomdp-mountain-car-opt-lower-vec-v0', dict(), lambda rng, n: rng.uniform(-1.2, 1.2, size=(n, 1))),
+    ('pomdp-mountain-car-opt-lower-vec-v0', dict(crossing='exact'), lambda rng, n: rng.uniform(-1.2, 1.2, size=(n, 1))),
+]
+NAMES = ['power', 'max_speed', 'min_action', 'max_action', 'priest_position', 'priest_delta', 'right_flag',
+         'left_flag']
+
+num_envs = 16
+for env_id, kwargs, sample in CASES:
+    env = gym.make('gym_custom:' + env_id, num_envs=num_envs, parameter_sampler=sampler, **kwargs)
+    env.seed(0)
+    env.reset()
+    lanes = []
+    for i in range(num_envs):
+        lane = gym.make('gym_custom:' + env_id, num_envs=1,
+                        parameters={name: getattr(env, name)[i] for name in NAMES}, **kwargs)
+        lane.seed(i)
+        lane.reset()
+        lane.position[:] = env.position[i]
+        lane.heaven_position[:] = env.heaven_position[i]
+        lane.hell_position[:] = env.hell_position[i]
+        lanes.append(lane)
+
+    rng = np.random.RandomState(0)
+    ok = np.array_equal(env.action_space.high[:, 0], env.max_action.astype(np.float32))
+    for t in range(200):
+        actions = sample(rng, num_envs)
+        obs, rewards, dones, _ = env.step(actions)
+        for i, lane in enumerate(lanes):
+            lane_obs, lane_rewards, lane_dones, _ = lane.step(actions[i:i + 1])
+            ok &= np.array_equal(obs[i:i + 1], lane_obs) and rewards[i] == lane_rewards[0]
+            ok &= dones[i] == lane_dones[0]
+        if dones.any():
+            break
+
+    # Resetting some lanes redraws their parameters and leaves the others alone.
+    mask = np.arange(num_envs) % 2 == 0
+    before = {name: getattr(env, name).copy() for name in NAMES}
+    env.reset(mask)
+    ok &= not np.any(env.power[mask] == before['power'][mask])
+    ok &= np.array_equal(env.power[~mask], before['power'][~mask])
+    ok &= np.array_equal(env.action_space.high[:, 0], env.max_action.astype(np.float32))
+    ok &= np.array_equal(env.heaven_position == env.right_flag, env.hell_position == env.left_flag)
+    assert ok, '{} {}: a lane differs from a one-lane env with its parameters'.format(env_id, kwargs)
+    print(env_id, kwargs, ok)
+
+# render draws every lane's flags where that lane has them.
+GREEN, RED, BLUE = (0, 255, 0), (255, 0, 0), (0, 0, 255)
+for parameters in [None, {'right_flag': [0.4, 0.7, 1.0, 1.1], 'left_flag': [-0.5, -0.8, -1.0, -1.1],
+                          'priest_position': [0.1, 0.3, 0.5, 0.2]}]:
+    env = gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=4, variant='easy', parameters=parameters)
+    env.seed(0)
+    env.reset()
+    frames = env.render('rgb_array')
+    rasterizer = env._rasterizer
+    for i, frame in enumerate(frames):
+        # Below the arrow at the top of the frame, so the blue pixels are the priest's flag.
+        flags = frame[frame.shape[0] // 3:]
+        for color, position in [(GREEN, env.heaven_position[i]), (RED, env.hell_position[i]),
+                                (BLUE, env.priest_position[i])]:
+            columns = np.flatnonzero(np.all(flags == color, axis=2).any(axis=0))
+            x = (position - rasterizer.min_position) * rasterizer.scale * rasterizer.zoom
+            assert len(columns) and abs(columns[0] - x) <= 1 and columns[-1] <= x + 26 * rasterizer.zoom, \
+                'lane {}: flag {} drawn at columns {}-{}, not at {:.1f}'.format(i, color, columns[:1], columns[-1:], x)
+    print('render', parameters is not None, True)
+
+# A randomized batch steps as fast as a homogeneous one.
+for kwargs in [dict(), dict(parameter_sampler=sampler)]:
+    env = gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=4096, **kwargs)
+    actions = np.ones((4096, 1))
+    env.step(actions)
+    start = time.perf_counter()
+    for t in range(500):
+        env.step(actions)
+    print('randomized' if kwargs else 'homogeneous', '{:.0f} steps/s'.format(500 * 4096 / (time.perf_counter() - start)))
@@ -0,0 +1,62 @@
+import gym
+import numpy as np
+
+from gym_custom import backend
+from gym_custom.envs.pomdp_mountain_car_core import LOWER_LEVEL_OBSERVATIONS, lower_level_steps
+
+# The positions of lower_level_observation are the values of np.linspace over the endpoints as float64,
+# for float64 and float32 endpoints, in the batched and the single-env paths.
+# Run with GYM_CUSTOM_BACKEND=numba to check the compiled kernels.
+lower_level_observation = LOWER_LEVEL_OBSERVATIONS['sampled']
+rng = np.random.RandomState(0)
+n = 1000
+print('backend', backend.NAME)
+for dtype in [np.float64, np.float32]:
+    ok = True
+    for num_points in [2, 3, 5, 10, 17, 64]:
+        steps = lower_level_steps(num_points)
+        a = rng.uniform(-1.5, 1.5, n).astype(dtype)
+        b = rng.uniform(-1.5, 1.5, n).astype(dtype)
+        b[:10] = a[:10]  # standing still
+        reference = np.array([np.linspace(x, y, num_points) for x, y in zip(a.astype(np.float64),
+                                                                           b.astype(np.float64))])
+        batched = np.empty((n, 2 * num_points))
+        lower_level_observation(a, b, np.ones(n), -np.ones(n), 0.5, 0.1, steps, batched)
+        single = np.empty((n, 2 * num_points))
+        for i in range(n):
+            lower_level_observation(a[i], b[i], 1.0, -1.0, 0.5, 0.1, steps, single[i])
+        ok &= np.array_equal(batched[:, 0::2], reference) and np.array_equal(single[:, 0::2], reference)
+    assert ok, '{} ends: the positions differ from np.linspace'.format(np.dtype(dtype).name)
+    print(np.dtype(dtype).name, ok)
+
+# The observations of the env are the float32 values of np.linspace over the float64 positions.
+env = gym.make('gym_custom:pomdp-mountain-car-opt-lower-vec-v0', num_envs=64)
+env.seed(0)
+env.reset()
+ok = True
+for t in range(100):
+    prev_position = env.position.copy()
+    actions = rng.uniform(-1.5, 1.5, size=(64, 1))
+    obs, _, dones, _ = env.step(actions)
+    reference = np.array([np.linspace(x, y, 10) for x, y in zip(prev_position, actions[:, 0])])
+    ok &= np.array_equal(obs[:, 0::2], reference.astype(np.float32))
+    if dones.any():
+        env.reset(dones)
+assert ok, 'the vector env observations differ from np.linspace'
+print('vector env', ok)
+
+# The same in the single env, whose actions are float32.
+env = gym.make('gym_custom:pomdp-mountain-car-opt-lower-v0')
+env.seed(0)
+env.action_space.seed(0)
+env.reset()
+ok = True
+for t in range(300):
+    prev_position = env.unwrapped.state
+    action = env.action_space.sample()
+    obs, _, done, _ = env.step(action)
+    ok &= np.array_equal(obs[0::2], np.linspace(float(prev_position), float(action[0]), 10).astype(np.float32))
+    if done:
+        env.reset()
+assert ok, 'the single env observations differ from np.linspace'
+print('single env', ok)
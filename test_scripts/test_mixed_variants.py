@@ -0,0 +1,112 @@
+import time
+
+import gym
+import numpy as np
+
+from gym_custom.envs.pomdp_mountain_car_core import VARIANTS
+from gym_custom.vector import SharedMemoryVecEnv
+
+# The lanes of each variant in pomdp-mountain-car-mixed-vec-v0 behave as the vector env of that
+# variant, with the observations padded to (position, velocity, direction).
+NAMES = ['default', 'easy', 'episodic', 'episodic-easy']
+MAX_EPISODE_STEPS = {'episodic': 200, 'episodic-easy': 15}
+
+
+def padded(obs):
+    return obs if obs.shape[1] == 3 else np.concatenate([np.zeros((len(obs), 2)), obs], axis=1)
+
+
+def copy_state(vec, mixed, lanes):
+    """Puts the lanes of the mixed env into the same states in vec."""
+    for name in ('position', 'heaven_position', 'hell_position'):
+        getattr(vec, name)[:] = getattr(mixed, name)[lanes]
+
+
+# A single variant: the same episodes as its vector env, from the same seed.
+for name in NAMES:
+    mixed = gym.make('gym_custom:pomdp-mountain-car-mixed-vec-v0', num_envs=64, variants=[name])
+    vec = gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=64, variant=name)
+    mixed.seed(0)
+    vec.seed(0)
+    assert np.array_equal(mixed.reset(), padded(vec.reset())), '{}: reset observations differ'.format(name)
+    rng = np.random.RandomState(0)
+    for t in range(300):
+        actions = rng.uniform(-20, 20, size=(64, 1))
+        obs, rewards, dones, info = mixed.step(actions)
+        vec_obs, vec_rewards, vec_dones, _ = vec.step(actions)
+        assert np.array_equal(obs, padded(vec_obs)), '{}: observations differ at step {}'.format(name, t)
+        assert np.array_equal(rewards, vec_rewards), '{}: rewards differ at step {}'.format(name, t)
+        assert np.array_equal(dones, vec_dones), '{}: dones differ at step {}'.format(name, t)
+        assert not info['variant'].any(), '{}: wrong variant index'.format(name)
+        if dones.any():
+            assert np.array_equal(mixed.reset(dones), padded(vec.reset(dones))), \
+                '{}: partial reset observations differ'.format(name)
+    print(name, True)
+
+# All four variants in turn, each compared with its own vector env started from the same states.
+num_envs = 64
+mixed = gym.make('gym_custom:pomdp-mountain-car-mixed-vec-v0', num_envs=num_envs,
+                 max_episode_steps=MAX_EPISODE_STEPS)
+mixed.seed(0)
+mixed.reset()
+assert mixed.variants == tuple(VARIANTS[name] for name in NAMES), 'variants out of order'
+groups = {}
+for index, name in enumerate(NAMES):
+    lanes = mixed.lane_variant == index
+    assert np.array_equal(np.flatnonzero(lanes), np.arange(index, num_envs, len(NAMES))), 'wrong lane layout'
+    vec = gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=int(lanes.sum()), variant=name,
+                   max_episode_steps=MAX_EPISODE_STEPS.get(name))
+    copy_state(vec, mixed, lanes)
+    groups[name] = (lanes, vec)
+
+rng = np.random.RandomState(0)
+truncated = 0
+for t in range(250):
+    actions = rng.uniform(-20, 20, size=(num_envs, 1))
+    obs, rewards, dones, info = mixed.step(actions)
+    for name, (lanes, vec) in groups.items():
+        vec_obs, vec_rewards, vec_dones, vec_info = vec.step(actions[lanes])
+        assert np.array_equal(obs[lanes], padded(vec_obs)), '{}: observations differ at step {}'.format(name, t)
+        assert np.array_equal(rewards[lanes], vec_rewards), '{}: rewards differ at step {}'.format(name, t)
+        assert np.array_equal(dones[lanes], vec_dones), '{}: dones differ at step {}'.format(name, t)
+        assert np.array_equal(info['truncated'][lanes], vec_info['truncated']), \
+            '{}: truncations differ at step {}'.format(name, t)
+    truncated += info['truncated'].sum()
+    if dones.any():
+        # Continue the finished lanes from the same new states in both.
+        mixed.reset(dones)
+        for name, (lanes, vec) in groups.items():
+            vec.reset(dones[lanes])
+            copy_state(vec, mixed, lanes)
+assert truncated > 0, 'no lane was truncated'
+print('mixed', True, truncated, 'truncated')
+
+# Split over workers, the lanes keep the layout of one mixed env of num_envs lanes: 3 lanes per
+# worker, so the second worker starts in the middle of the list of variants.
+single = gym.make('gym_custom:pomdp-mountain-car-mixed-vec-v0', num_envs=6)
+env = SharedMemoryVecEnv('pomdp-mountain-car-mixed-vec-v0', 6, num_workers=2)
+env.seed(0)
+assert env.variants == single.variants, 'workers report other variants'
+assert np.array_equal(env.lane_variant, single.lane_variant), 'workers lay out the lanes differently'
+obs = env.reset()
+rng = np.random.RandomState(0)
+for t in range(100):
+    # Only the lanes of the variants that observe position and velocity see anything but zeros there.
+    assert not obs[~single.full_observation, :2].any(), 'direction-only lanes observe position or velocity'
+    obs, _, _, info = env.step(rng.uniform(-20, 20, size=(6, 1)).astype(np.float32))
+    assert np.array_equal(info['variant'], single.lane_variant), 'wrong variants in info'
+assert obs[single.full_observation, :2].any(), 'full-observation lanes observe nothing'
+env.close()
+print('workers', True)
+
+# One mixed env against one vector env per variant.
+mixed = gym.make('gym_custom:pomdp-mountain-car-mixed-vec-v0', num_envs=4096)
+vecs = [gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=1024, variant=name) for name in NAMES]
+actions = np.ones((4096, 1))
+for name, run in [('mixed', lambda: mixed.step(actions)),
+                  ('separate', lambda: [vec.step(actions[:1024]) for vec in vecs])]:
+    run()
+    start = time.perf_counter()
+    for t in range(300):
+        run()
+    print(name, '{:.0f} steps/s'.format(300 * 4096 / (time.perf_counter() - start)))
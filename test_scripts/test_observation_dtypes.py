@@ -0,0 +1,90 @@
+import gym
+import numpy as np
+from gym.envs.registration import registry
+from gym.utils import seeding
+
+from gym_custom.vector import SharedMemoryVecEnv
+
+# Every env returns observations of the dtype and shape its observation_space declares, within its bounds.
+IDS = sorted(spec.id for spec in registry.all() if spec.entry_point.startswith('gym_custom.'))
+ZERO_COPY = ['pomdp-mountain-car-v0', 'pomdp-mountain-car-easy-v0', 'pomdp-mountain-car-opt-lower-v0',
+             'heaven-hell-onehot-ls-v0', 'heaven-hell-onehot-ls-vec-v0']
+
+
+def check(space, obs, name):
+    obs = np.asarray(obs)
+    assert obs.dtype == space.dtype, '{}: observations are {}, the space is {}'.format(name, obs.dtype, space.dtype)
+    assert obs.shape == space.shape, '{}: observations of shape {}, the space is {}'.format(name, obs.shape, space.shape)
+    assert space.contains(obs), '{}: observation outside the space'.format(name)
+
+
+def run(env, name, steps=300):
+    env.seed(0)
+    env.action_space.seed(0)
+    check(env.observation_space, env.reset(), name)
+    for t in range(steps):
+        obs, reward, done, _ = env.step(env.action_space.sample())
+        check(env.observation_space, obs, name)
+        if np.any(done):
+            check(env.observation_space, env.reset() if np.ndim(done) == 0 else env.reset(done), name)
+
+
+for env_id in IDS:
+    kwargs_list = [{}] + ([{'zero_copy': True}] if env_id in ZERO_COPY else [])
+    for kwargs in kwargs_list:
+        run(gym.make('gym_custom:' + env_id, **kwargs), '{} {}'.format(env_id, kwargs))
+        print(env_id, kwargs, True)
+
+# The functional API gives observations of the env's dtype.
+for env_id in ['pomdp-mountain-car-v0', 'pomdp-mountain-car-easy-v0', 'pomdp-mountain-car-opt-lower-v0']:
+    env = gym.make('gym_custom:' + env_id).unwrapped
+    states, observations = env.reset_functional(seeding.np_random(0)[0], 8)
+    assert observations.dtype == env.observation_space.dtype, '{}: reset_functional dtype'.format(env_id)
+    _, observations, _, _ = env.step_functional(states, np.zeros((8, 1)))
+    assert observations.dtype == env.observation_space.dtype, '{}: step_functional dtype'.format(env_id)
+    print(env_id, 'functional', True)
+
+# float16 and int8 give the same observations as float32 where they are exact, and are refused elsewhere.
+LOSSLESS = [
+    ('heaven-hell-onehot-ls-v0', {}),
+    ('heaven-hell-onehot-ls-vec-v0', {'num_envs': 16}),
+    ('pomdp-mountain-car-easy-v0', {}),
+    ('pomdp-mountain-car-episodic-easy-v0', {}),
+    ('pomdp-mountain-car-vec-v0', {'num_envs': 16, 'variant': 'easy'}),
+    ('pomdp-mountain-car-mixed-vec-v0', {'num_envs': 16, 'variants': ['easy', 'episodic-easy']}),
+]
+for env_id, kwargs in LOSSLESS:
+    for dtype in [np.float16, np.int8]:
+        env = gym.make('gym_custom:' + env_id, obs_dtype=dtype, **kwargs)
+        reference = gym.make('gym_custom:' + env_id, **kwargs)
+        name = '{} {}'.format(env_id, np.dtype(dtype).name)
+        run(env, name, 100)
+        for e in (env, reference):
+            e.seed(0)
+            e.action_space.seed(0)
+        assert np.array_equal(env.reset(), reference.reset()), '{}: reset observations differ'.format(name)
+        for t in range(100):
+            action = env.action_space.sample()
+            obs, _, done, _ = env.step(action)
+            reference_obs, _, _, _ = reference.step(action)
+            assert np.array_equal(obs.astype(np.float32), reference_obs), '{}: observations differ'.format(name)
+            if np.any(done):
+                assert np.array_equal(env.reset() if np.ndim(done) == 0 else env.reset(done),
+                                      reference.reset() if np.ndim(done) == 0 else reference.reset(done)), \
+                    '{}: reset observations differ'.format(name)
+        print(env_id, np.dtype(dtype).name, True)
+
+for env_id in ['pomdp-mountain-car-v0', 'pomdp-mountain-car-vec-v0', 'pomdp-mountain-car-opt-lower-v0',
+               'pomdp-mountain-car-mixed-vec-v0', 'continuous-heaven-hell-opt-lower-v0']:
+    try:
+        gym.make('gym_custom:' + env_id, obs_dtype=np.float16)
+        raise AssertionError('{}: float16 was accepted'.format(env_id))
+    except ValueError:
+        print(env_id, 'float16 refused', True)
+
+# The shared-memory buffers take the dtype of the envs.
+env = SharedMemoryVecEnv('pomdp-mountain-car-v0', 4, num_workers=2)
+obs = env.reset()
+assert obs.dtype == env.observation_space.dtype == np.float32, 'SharedMemoryVecEnv returns {}'.format(obs.dtype)
+print('SharedMemoryVecEnv', True)
+env.close()
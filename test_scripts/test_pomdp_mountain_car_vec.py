@@ -0,0 +1,106 @@
+import gym
+import numpy as np
+
+env = gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=1024)
+
+print(env.observation_space.shape)
+print(env.action_space.shape)
+print(env.action_space.high[0])
+
+obs = env.reset()
+episode_lengths = np.zeros(env.num_envs, dtype=int)
+finished = []
+for t in range(1000):
+    actions = env.action_space.sample()
+    obs, rewards, dones, _ = env.step(actions)
+    episode_lengths += 1
+    if dones.any():
+        finished.extend(episode_lengths[dones])
+        episode_lengths[dones] = 0
+        obs = env.reset(dones)
+print(len(finished), np.mean(finished))
+
+# Lane by lane against N scalar envs put in the same states: the same observations, rewards and dones.
+SCALAR_IDS = {'default': 'pomdp-mountain-car-v0', 'easy': 'pomdp-mountain-car-easy-v0',
+              'episodic': 'pomdp-mountain-car-episodic-v0', 'episodic-easy': 'pomdp-mountain-car-episodic-easy-v0',
+              'opt-lower': 'pomdp-mountain-car-opt-lower-v0'}
+num_envs = 8
+for variant, scalar_id in SCALAR_IDS.items():
+    opt_lower = variant == 'opt-lower'
+    if opt_lower:
+        env = gym.make('gym_custom:pomdp-mountain-car-opt-lower-vec-v0', num_envs=num_envs)
+    else:
+        env = gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=num_envs, variant=variant)
+    scalars = [gym.make('gym_custom:' + scalar_id).unwrapped for _ in range(num_envs)]
+    env.seed(0)
+
+    def start(i):
+        """Puts scalar env i in the state lane i was reset to, and returns its observation."""
+        scalar = scalars[i]
+        scalar.heaven_position = env.heaven_position[i]
+        scalar.hell_position = env.hell_position[i]
+        if opt_lower:
+            scalar.state = env.position[i]
+            scalar.history.reset((scalar.state, 0.0))
+            return scalar.history.flat(copy=True)
+        scalar.state = np.array([env.position[i], env.velocity[i], env.direction[i]])
+        return scalar._get_obs()
+
+    obs = env.reset()
+    assert all(np.array_equal(obs[i], start(i)) for i in range(num_envs)), 'reset observations differ'
+    rng = np.random.RandomState(0)
+    episodes = 0
+    for t in range(500):
+        # float32, the dtype of the action space.
+        if opt_lower:
+            actions = rng.uniform(-1.3, 1.3, size=(num_envs, 1)).astype(np.float32)
+        else:
+            actions = rng.uniform(-20, 20, size=(num_envs, 1)).astype(np.float32)
+        obs, rewards, dones, _ = env.step(actions)
+        for i, scalar in enumerate(scalars):
+            scalar_obs, reward, done, _ = scalar.step(actions[i])
+            assert np.array_equal(obs[i], scalar_obs), '{}: observations differ in lane {}'.format(variant, i)
+            assert rewards[i] == reward and dones[i] == done, '{}: rewards or dones differ in lane {}'.format(variant, i)
+        if dones.any():
+            episodes += dones.sum()
+            obs = env.reset(dones)
+            assert all(np.array_equal(obs[i], start(i)) for i in np.flatnonzero(dones)), 'reset observations differ'
+    print(variant, 'lane by lane', True, episodes, 'episodes')
+
+# The scalar envs give the same trajectories with and without zero_copy under float32 actions
+# sampled from their action space, and the same as a lane of the vector env.
+for variant, scalar_id in SCALAR_IDS.items():
+    if variant == 'opt-lower':
+        continue
+    envs = [gym.make('gym_custom:' + scalar_id, zero_copy=zero_copy).unwrapped for zero_copy in (False, True)]
+    vec = gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=1, variant=variant)
+    for env in envs:
+        env.seed(0)
+    envs[0].action_space.seed(0)
+    observations = [np.array(env.reset()) for env in envs]
+    assert np.array_equal(*observations), 'reset observations differ'
+    vec.reset()
+    vec.position[:], vec.velocity[:], vec.direction[:] = envs[0].state
+    vec.heaven_position[:], vec.hell_position[:] = envs[0].heaven_position, envs[0].hell_position
+    for t in range(1000):
+        action = envs[0].action_space.sample()
+        assert action.dtype == np.float32
+        results = [env.step(action) for env in envs]
+        vec_obs, vec_rewards, vec_dones, _ = vec.step(action[None])
+        assert np.array_equal(results[0][0], results[1][0]), '{}: zero_copy changes the observations'.format(variant)
+        assert results[0][1:3] == results[1][1:3], '{}: zero_copy changes the rewards or dones'.format(variant)
+        assert np.array_equal(results[0][0], vec_obs[0]), '{}: the vector env differs'.format(variant)
+        assert (results[0][1], results[0][2]) == (vec_rewards[0], vec_dones[0])
+        if results[0][2]:
+            observations = [np.array(env.reset()) for env in envs]
+            assert np.array_equal(*observations), 'reset observations differ'
+            vec.reset()
+            vec.position[:], vec.velocity[:], vec.direction[:] = envs[0].state
+            vec.heaven_position[:], vec.hell_position[:] = envs[0].heaven_position, envs[0].hell_position
+    print(variant, 'zero_copy and float32 actions', True)
+
+try:
+    gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=2).render('human')
+    raise AssertionError('render(human) was accepted')
+except ValueError:
+    print('render(human) refused', True)
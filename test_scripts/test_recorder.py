@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+
+import gym
+import numpy as np
+
+from gym_custom.recorder import ShardedRecorder, load_shards, heaven_side
+
+
+def concatenated(directory):
+    shards = load_shards(directory)
+    return {field: np.concatenate([shard[field] for shard in shards]) for field in shards[0]}
+
+
+def rows(start, stop):
+    """Transitions start to stop - 1, with every field derived from the row number."""
+    i = np.arange(start, stop)
+    return {'observations': np.stack([i, -i], axis=1).astype(np.float32), 'actions': (i % 4).astype(np.int64),
+            'rewards': (i / 10).astype(np.float32), 'dones': i % 3 == 0,
+            'heaven': np.where(i % 2 == 0, 1, -1).astype(np.int8), 'timeouts': i % 5 == 0}
+
+
+def record(recorder, start, stop, batch_size):
+    for begin in range(start, stop, batch_size):
+        batch = rows(begin, min(stop, begin + batch_size))
+        if batch_size == 1:
+            recorder.add(batch['observations'][0], batch['actions'][0], batch['rewards'][0], batch['dones'][0],
+                         batch['heaven'][0], timeout=batch['timeouts'][0])
+        else:
+            recorder.add_batch(batch['observations'], batch['actions'], batch['rewards'], batch['dones'],
+                               batch['heaven'], timeouts=batch['timeouts'])
+
+
+def same(data, start, stop):
+    expected = rows(start, stop)
+    return set(data) == set(expected) and all(np.array_equal(data[field], expected[field]) for field in expected)
+
+
+def open_recorder(directory, **kwargs):
+    return ShardedRecorder(directory, (2,), np.float32, (), np.int64, shard_size=7, timeouts=True, **kwargs)
+
+
+# Batches that straddle shard boundaries (and one larger than a shard), then single rows; load_shards
+# trims every shard to its count.
+for flush_async in [True, False]:
+    with tempfile.TemporaryDirectory() as directory:
+        with open_recorder(directory, flush_async=flush_async) as recorder:
+            record(recorder, 0, 20, 5)
+            record(recorder, 20, 30, 10)
+            record(recorder, 30, 33, 1)
+            ok = recorder.num_rows == 33
+        with open(os.path.join(directory, 'index.json')) as f:
+            index = json.load(f)
+        ok &= [shard['count'] for shard in index['shards']] == [7, 7, 7, 7, 5]
+        ok &= [len(shard['rewards']) for shard in load_shards(directory)] == [7, 7, 7, 7, 5]
+        ok &= np.load(os.path.join(directory, 'shard_00004', 'rewards.npy')).shape == (7,)
+        ok &= same(concatenated(directory), 0, 33)
+        assert ok, 'rows lost or misplaced across shards, flush_async={}'.format(flush_async)
+        print('rollover, flush_async={}'.format(flush_async), ok)
+
+# Reopening a dataset continues it after the last flushed row, in the last shard while it has room.
+with tempfile.TemporaryDirectory() as directory:
+    with open_recorder(directory) as recorder:
+        record(recorder, 0, 10, 4)
+    with open_recorder(directory) as recorder:
+        ok = recorder.num_rows == 10
+        record(recorder, 10, 25, 3)
+    with open_recorder(directory) as recorder:
+        record(recorder, 25, 28, 1)
+    ok &= [len(shard['rewards']) for shard in load_shards(directory)] == [7, 7, 7, 7]
+    with open_recorder(directory) as recorder:
+        record(recorder, 28, 30, 2)
+    ok &= [len(shard['rewards']) for shard in load_shards(directory)] == [7, 7, 7, 7, 2]
+    ok &= same(concatenated(directory), 0, 30)
+    assert ok, 'resuming from index.json lost or misplaced rows'
+    print('resume', ok)
+
+    # Rows added after the last flush are not in the index, and are recorded over on resume.
+    recorder = open_recorder(directory, flush_async=False)
+    record(recorder, 30, 33, 1)
+    recorder.flush()
+    record(recorder, 33, 35, 1)
+    del recorder  # as if the process died: never closed
+    with open_recorder(directory) as resumed:
+        ok = resumed.num_rows == 33
+    assert ok and same(concatenated(directory), 0, 33), 'rows after the last flush were kept'
+    print('resume after the last flush', True)
+
+    # Another observation dtype, or another set of fields, is refused.
+    for kwargs in [{'observation_dtype': np.float64}, {'next_observations': True}]:
+        arguments = dict(observation_shape=(2,), observation_dtype=np.float32, action_shape=(),
+                         action_dtype=np.int64, shard_size=7, timeouts=True)
+        arguments.update(kwargs)
+        try:
+            ShardedRecorder(directory, **arguments)
+            raise AssertionError('a dataset with other fields was reopened with {}'.format(kwargs))
+        except ValueError:
+            print('fields mismatch', kwargs, True)
+
+# flush_every writes the index while recording.
+with tempfile.TemporaryDirectory() as directory:
+    recorder = open_recorder(directory, flush_every=4, flush_async=False)
+    record(recorder, 0, 5, 1)
+    ok = [len(shard['rewards']) for shard in load_shards(directory)] == [4]
+    recorder.close()
+    assert ok and same(concatenated(directory), 0, 5), 'flush_every did not write the index'
+    print('flush_every', True)
+
+# A vector env, one row per lane, with next observations and a scalar heaven.
+with tempfile.TemporaryDirectory() as directory:
+    env = gym.make('gym_custom:pomdp-mountain-car-vec-v0', num_envs=6, auto_reset=True)
+    env.seed(0)
+    obs = env.reset()
+    observations, next_observations, heaven = [], [], []
+    with ShardedRecorder.for_env(directory, env, shard_size=8, next_observations=True) as recorder:
+        for t in range(5):
+            actions = np.full((6, 1), 1.0, dtype=np.float32)
+            next_obs, rewards, dones, info = env.step(actions)
+            recorder.add_batch(obs, actions, rewards, dones, heaven_side(env),
+                               next_observations=info['final_observation'])
+            observations.append(obs)
+            next_observations.append(info['final_observation'])
+            heaven.append(heaven_side(env))
+            obs = next_obs
+        recorder.add_batch(obs[:1], actions[:1], rewards[:1], dones[:1], 1)
+    data = concatenated(directory)
+    ok = np.array_equal(data['observations'][:30], np.concatenate(observations))
+    ok &= np.array_equal(data['next_observations'][:30], np.concatenate(next_observations))
+    ok &= np.array_equal(data['heaven'], np.append(np.concatenate(heaven), 1))
+    ok &= data['observations'].dtype == env.single_observation_space.dtype
+    assert ok, 'the rows of the vector env differ'
+    print('vector env', ok, [len(shard['rewards']) for shard in load_shards(directory)])
@@ -0,0 +1,33 @@
+import gym
+import numpy as np
+
+from gym_custom.seeds import spawn_seeds
+from gym_custom.vector import SharedMemoryVecEnv
+
+# Same seed, same episode start, for every registered id; envs never share a generator.
+for env_id in ['pomdp-mountain-car-v0', 'pomdp-mountain-car-opt-lower-v0', 'continuous-heaven-hell-opt-lower-v0',
+               'heaven-hell-onehot-ls-v0']:
+    starts = []
+    for seed in spawn_seeds(0, 2) * 2:
+        env = gym.make('gym_custom:' + env_id)
+        env.seed(seed)
+        starts.append(np.array(env.reset()))
+        # Draws from the global generator must not change what the env sees.
+        np.random.uniform(size=10)
+    assert np.array_equal(starts[0], starts[2]) and np.array_equal(starts[1], starts[3]), \
+        '{}: the same seed gave different starts'.format(env_id)
+    print(env_id, True)
+
+# Subprocess vector env: the same seed gives the same observations whatever happens in between.
+actions = np.random.RandomState(0).uniform(-1.2, 1.2, size=(20, 8, 1)).astype(np.float32)
+runs = []
+for _ in range(2):
+    env = SharedMemoryVecEnv('continuous-heaven-hell-opt-lower-v0', num_envs=8, num_workers=2)
+    env.seed(123)
+    obs = [env.reset()]
+    for action in actions:
+        obs.append(env.step(action)[0])
+    env.close()
+    runs.append(np.array(obs))
+assert np.array_equal(runs[0], runs[1]), 'SharedMemoryVecEnv: the same seed gave different observations'
+print('SharedMemoryVecEnv', True)
@@ -0,0 +1,45 @@
+import gym
+import numpy as np
+
+# With auto_reset the vector envs give the same episodes as resetting the done lanes by hand,
+# and max_episode_steps truncates like a TimeLimit on every lane.
+CASES = [
+    ('pomdp-mountain-car-vec-v0', dict(variant='episodic'), 200, lambda rng, n: rng.uniform(-10, 10, size=(n, 1))),
+    ('pomdp-mountain-car-vec-v0', dict(variant='episodic-easy'), 15, lambda rng, n: rng.uniform(-15, 15, size=(n, 1))),
+    ('pomdp-mountain-car-vec-v0', dict(), None, lambda rng, n: rng.uniform(-5, 5, size=(n, 1))),
+    ('pomdp-mountain-car-opt-lower-vec-v0', dict(), 50, lambda rng, n: rng.uniform(-1.2, 1.2, size=(n, 1))),
+    ('heaven-hell-onehot-ls-vec-v0', dict(), 100, lambda rng, n: rng.randint(4, size=n)),
+    ('heaven-hell-onehot-ls-vec-v0', dict(zero_copy=True), 100, lambda rng, n: rng.randint(4, size=n)),
+]
+
+num_envs = 64
+for env_id, kwargs, max_episode_steps, sample in CASES:
+    auto = gym.make('gym_custom:' + env_id, num_envs=num_envs, max_episode_steps=max_episode_steps,
+                    auto_reset=True, **kwargs)
+    manual = gym.make('gym_custom:' + env_id, num_envs=num_envs, **kwargs)
+    auto.seed(0)
+    manual.seed(0)
+    rng = np.random.RandomState(0)
+    obs_auto = auto.reset()
+    obs_manual = np.array(manual.reset())
+    ok = np.array_equal(obs_auto, obs_manual)
+    lengths = np.zeros(num_envs, dtype=int)
+    episodes = truncated = 0
+    for t in range(1000):
+        actions = sample(rng, num_envs)
+        obs_auto, rewards_auto, dones_auto, info = auto.step(actions)
+        obs_manual, rewards_manual, terminals, _ = manual.step(actions)
+        lengths += 1
+        timeouts = (lengths >= max_episode_steps) & ~terminals if max_episode_steps else np.zeros(num_envs, bool)
+        dones = terminals | timeouts
+        ok &= np.array_equal(info['final_observation'], obs_manual)
+        ok &= np.array_equal(rewards_auto, rewards_manual) and np.array_equal(dones_auto, dones)
+        ok &= np.array_equal(info['terminal'], terminals) and np.array_equal(info['truncated'], timeouts)
+        if dones.any():
+            obs_manual = manual.reset(dones)
+            lengths[dones] = 0
+        ok &= np.array_equal(obs_auto, obs_manual)
+        episodes += dones.sum()
+        truncated += timeouts.sum()
+    assert ok, '{} {}: auto_reset differs from resetting by hand'.format(env_id, kwargs)
+    print(env_id, kwargs, ok, episodes, 'episodes', truncated, 'truncated')
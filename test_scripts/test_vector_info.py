@@ -0,0 +1,90 @@
+import gym
+import numpy as np
+from gym.wrappers import TimeLimit
+
+from gym_custom.vector import SharedMemoryVecEnv
+
+# SharedMemoryVecEnv returns the same terminal/truncated flags and final observations as the
+# envs it runs, made in this process with the same seeds.
+CASES = [
+    # env_id, env_kwargs, num_workers, max_episode_steps
+    ('pomdp-mountain-car-v0', {}, 2, 40),
+    ('pomdp-mountain-car-episodic-v0', {}, 2, 30),
+    ('pomdp-mountain-car-vec-v0', {'variant': 'episodic'}, 2, 30),
+    ('pomdp-mountain-car-vec-v0', {}, 2, 40),
+    ('heaven-hell-onehot-ls-vec-v0', {}, 2, 20),
+    ('heaven-hell-onehot-ls-v0', {}, 2, 20),
+]
+num_envs = 8
+for env_id, env_kwargs, num_workers, max_episode_steps in CASES:
+    env = SharedMemoryVecEnv(env_id, num_envs, num_workers=num_workers, env_kwargs=env_kwargs,
+                             max_episode_steps=max_episode_steps)
+    seeds = env.seed(0)
+    vectorized = 'vec' in env_id
+    if vectorized:
+        lanes = num_envs // num_workers
+        references = [gym.make('gym_custom:' + env_id, num_envs=lanes, max_episode_steps=max_episode_steps,
+                               auto_reset=True, **env_kwargs) for _ in range(num_workers)]
+        for reference, start in zip(references, range(0, num_envs, lanes)):
+            reference.seed(seeds[start])
+    else:
+        references = [TimeLimit(gym.make('gym_custom:' + env_id, **env_kwargs), max_episode_steps)
+                      for _ in range(num_envs)]
+        for reference, seed in zip(references, seeds):
+            reference.seed(seed)
+
+    def reference_step(actions):
+        if vectorized:
+            results = [reference.step(actions[i * lanes:(i + 1) * lanes]) for i, reference in enumerate(references)]
+            return (np.concatenate([r[0] for r in results]), np.concatenate([r[2] for r in results]),
+                    {key: np.concatenate([r[3][key] for r in results])
+                     for key in ('terminal', 'truncated', 'final_observation')})
+        observations, dones, terminals, truncations, finals = [], [], [], [], []
+        for reference, action in zip(references, actions):
+            obs, _, done, info = reference.step(action)
+            truncated = done and info.get('TimeLimit.truncated', False)
+            finals.append(obs)
+            observations.append(reference.reset() if done else obs)
+            dones.append(done)
+            terminals.append(done and not truncated)
+            truncations.append(truncated)
+        return np.array(observations), np.array(dones), {'terminal': np.array(terminals),
+                                                         'truncated': np.array(truncations),
+                                                         'final_observation': np.array(finals)}
+
+    obs = env.reset()
+    if vectorized:
+        ok = np.array_equal(obs, np.concatenate([reference.reset() for reference in references]))
+    else:
+        ok = np.array_equal(obs, np.array([reference.reset() for reference in references]))
+    rng = np.random.RandomState(0)
+    terminal = truncated = 0
+    for t in range(200):
+        if 'heaven' in env_id:
+            actions = rng.randint(4, size=num_envs)
+        else:
+            actions = rng.uniform(-3, 6, size=(num_envs, 1)).astype(np.float32)
+        obs, _, dones, info = env.step(actions)
+        reference_obs, reference_dones, reference_info = reference_step(actions)
+        ok &= np.array_equal(obs, reference_obs) and np.array_equal(dones, reference_dones)
+        for key in ('terminal', 'truncated', 'final_observation'):
+            ok &= np.array_equal(info[key], reference_info[key])
+        ok &= np.array_equal(dones, info['terminal'] | info['truncated'])
+        terminal += info['terminal'].sum()
+        truncated += info['truncated'].sum()
+    env.close()
+    assert ok, '{} {}: SharedMemoryVecEnv differs from the envs it runs'.format(env_id, env_kwargs)
+    print(env_id, env_kwargs, ok, terminal, 'terminal', truncated, 'truncated')
+
+# A timeout is reported on its own step only, also by envs that reuse their info dict.
+env = SharedMemoryVecEnv('heaven-hell-onehot-ls-v0', 2, max_episode_steps=3)
+env.reset()
+timeouts = 0
+for t in range(10):
+    obs, _, dones, info = env.step(np.zeros(2, dtype=np.int64))
+    assert not (info['truncated'] & ~dones).any(), 'truncated without done at step {}'.format(t)
+    assert np.array_equal(dones, info['terminal'] | info['truncated'])
+    timeouts += info['truncated'].all()
+env.close()
+assert timeouts >= 2, 'expected at least two timeouts, got {}'.format(timeouts)
+print('truncated only on done steps', True)